@@ -21,6 +21,32 @@ def arg_parse():
                         required=False, help="middleware debug mode")
     parser.add_argument("--download_logs", '-dl', action='store_true',
                         required=False, help="download simulation log files")
+    parser.add_argument("--worker_num", '-w', type=int, default=64,
+                        required=False, help="max number of event handler worker threads")
+    parser.add_argument("--device_concurrency", '-dc', type=int, default=8,
+                        required=False, help="max number of concurrent event handlers per device")
+    parser.add_argument("--ssh_transport_num", '-st', type=int, default=2,
+                        required=False, help="number of ssh connections per device")
+    parser.add_argument("--ssh_channel_num", '-sc', type=int, default=8,
+                        required=False, help="max number of concurrent ssh commands per host")
+    parser.add_argument("--build_farm", '-bf', action='store_true',
+                        required=False, help="build the policy once per OS/arch group and distribute it to the other devices")
+    parser.add_argument("--full_sync", '-fs', action='store_true',
+                        required=False, help="ignore the remote manifest and upload all middleware files again")
+    parser.add_argument("--thing_host", '-th', action='store_true',
+                        required=False, help="run all things of a device in one thing host process")
+    parser.add_argument("--mqtt_async", '-ma', action='store_true',
+                        required=False, help="drive all mqtt clients from one asyncio event loop")
+    parser.add_argument("--event_table", '-et', action='store_true',
+                        required=False, help="evaluate with a columnar numpy event table and save it to the result directory")
+    parser.add_argument("--online_evaluate", '-oe', action='store_true',
+                        required=False, help="evaluate execute cycles while the simulation runs")
+    parser.add_argument("--early_stop_tolerance", '-es', type=float, default=None,
+                        required=False, help="end the simulation once the 95%% confidence interval of every scenario's cycle metrics is within this ratio of the mean")
+    parser.add_argument("--early_stop_min_time", '-esmin', type=float, default=0,
+                        required=False, help="minimum simulation time before early stop")
+    parser.add_argument("--early_stop_max_time", '-esmax', type=float, default=None,
+                        required=False, help="end the simulation at this time even if the metrics have not converged")
     arg_list, unknown = parser.parse_known_args()
 
     return arg_list
@@ -0,0 +1,49 @@
+from simulation_framework.tests.test_execute_cycle_matcher import old_find_execute_cycle, get_service_pattern, cycle_id_list
+
+from simulation_framework.core.simulation_evaluator import *
+import sys
+
+# 기존 sliding window 구현과 SoPExecuteCycleMatcher의 실행 사이클 탐색 시간을 비교한다.
+#   python -m simulation_framework.benchmarks.execute_cycle_matcher [event 수]
+
+
+def generate_log(is_super: bool, event_num: int, fail_rate: float = 0.01, seed: int = 0) -> Tuple[List[SoPServiceElement], List[SoPEvent]]:
+    rand = random.Random(seed)
+    if is_super:
+        service_list = [SoPServiceElement(name='s0', is_super=True, subservice_list=[SoPServiceElement(name=f'f{i}') for i in range(4)])]
+    else:
+        service_list = [SoPServiceElement(name=f'f{i}') for i in range(5)]
+    service_pattern = get_service_pattern(service_list)
+
+    event_list = []
+    while len(event_list) < event_num:
+        for service in service_pattern:
+            event_type = SoPEventType.SUPER_FUNCTION_EXECUTE if service.is_super else (
+                SoPEventType.SUB_FUNCTION_EXECUTE if is_super else SoPEventType.FUNCTION_EXECUTE)
+            error = SoPErrorType.FAIL if rand.random() < fail_rate else SoPErrorType.NO_ERROR
+            event_list.append(SoPEvent(event_type=event_type, service_element=service, timestamp=len(event_list), duration=1, error=error))
+    return service_pattern, event_list[:event_num]
+
+
+def main():
+    event_num = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    for is_super in [False, True]:
+        service_pattern, event_list = generate_log(is_super, event_num)
+
+        start_time = time.perf_counter()
+        old_result = old_find_execute_cycle(event_list, service_pattern)
+        old_duration = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        new_result = SoPExecuteCycleMatcher(service_pattern).match(event_list)
+        new_duration = time.perf_counter() - start_time
+
+        print(f'[{"super" if is_super else "local"}] events: {len(event_list)}, cycles: {len(new_result)}, '
+              f'same: {cycle_id_list(old_result) == cycle_id_list(new_result)}')
+        print(f'    sliding window: {old_duration:.4f}s')
+        print(f'    automaton     : {new_duration:.4f}s ({old_duration / max(new_duration, 1e-9):.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+from simulation_framework.tests.test_topic_router import make_event_handler
+
+from simulation_framework.core.event_handler import *
+import sys
+
+# 수신한 message stream을 기존 if/elif chain과 SoPEventHandler.on_recv_message로 각각 dispatch하여 시간을 비교한다.
+# handler는 호출 기록만 남기므로 decode, listener lag 기록, topic 분기 비용만 측정된다.
+#   python -m simulation_framework.benchmarks.topic_router [stream file]
+# stream 파일은 한 줄에 message 하나이며 'topic' 또는 'topic<TAB>payload' 형식이다.
+
+
+def old_on_recv_message(event_handler: SoPEventHandler, msg: mqtt.MQTTMessage):
+    # 기존 on_recv_message와 같이 매 분기마다 get_prefix()를 호출하여 topic에 포함되는지 확인한다.
+    topic, payload, timestamp = decode_MQTT_message(msg)
+    timestamp = get_current_time() - event_handler.simulation_start_time
+
+    topic_list = topic.split('/')
+    for protocol, handler_name in SoPEventHandler.TOPIC_HANDLER_TABLE:
+        prefix = protocol if isinstance(protocol, str) else protocol.get_prefix()
+        if prefix in topic:
+            return getattr(event_handler, handler_name)(msg, topic_list, payload, timestamp)
+
+    raise Exception(f'Unknown topic: {topic}')
+
+
+def load_stream(path: str) -> List[Tuple[str, str]]:
+    stream = []
+    for line in read_file(path):
+        if not line.strip():
+            continue
+        topic, _, payload = line.rstrip('\n').partition('\t')
+        stream.append((topic, payload if payload else '{}'))
+    return stream
+
+
+def generate_stream(message_num: int = 100000) -> List[Tuple[str, str]]:
+    # 실행 요청과 결과 위주의 stream
+    stream = []
+    for i in range(message_num):
+        thing_name = f'thing_{i % 300}'
+        function_name = f'function_{i % 50}'
+        middleware_name = f'middleware_{i % 11}'
+        if i % 100 == 0:
+            topic = 'SIM/FINISH'
+        elif i % 20 == 0:
+            topic = f'SM/RESULT/EXECUTE/{function_name}/{thing_name}/{middleware_name}/requester'
+        elif i % 2 == 0:
+            topic = f'MT/EXECUTE/{function_name}/{thing_name}'
+        else:
+            topic = f'TM/RESULT/EXECUTE/{function_name}/{thing_name}'
+        stream.append((topic, '{"scenario": "scenario_1", "error": 0}'))
+    return stream
+
+
+def main():
+    stream = load_stream(sys.argv[1]) if len(sys.argv) > 1 else generate_stream()
+    msg_list = [encode_MQTT_message(topic, payload) for topic, payload in stream]
+
+    old_event_handler, old_call_list = make_event_handler()
+    new_event_handler, new_call_list = make_event_handler()
+
+    start_time = time.perf_counter()
+    for msg in msg_list:
+        old_on_recv_message(old_event_handler, msg)
+    old_duration = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for msg in msg_list:
+        new_event_handler.on_recv_message(msg, recv_time=time.perf_counter())
+    new_duration = time.perf_counter() - start_time
+
+    mismatch_list = [(old, new) for old, new in zip(old_call_list, new_call_list) if old != new]
+    for (old_handler_name, topic), (new_handler_name, _) in mismatch_list[:10]:
+        print(f'Dispatch mismatch: {topic} - old: {old_handler_name}, new: {new_handler_name}')
+
+    print(f'messages: {len(msg_list)}, protocols: {len(SoPEventHandler.TOPIC_HANDLER_TABLE)}, same dispatch: {not mismatch_list and len(old_call_list) == len(new_call_list)}')
+    print(f'if/elif chain  : {old_duration:.4f}s ({old_duration / len(msg_list) * 1e6:.3f}us/msg)')
+    print(f'on_recv_message: {new_duration:.4f}s ({new_duration / len(msg_list) * 1e6:.3f}us/msg)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,14 @@
 from .config import *
 from .elements import *
+from .element_registry import *
 from .event_handler import *
+from .event_scheduler import *
+from .event_table import *
 from .mqtt_client import *
+from .online_evaluator import *
 from .simulation_generator import *
 from .simulation_executor import *
 from .simulation_evaluator import *
 from .ssh_client import *
+from .topic_router import *
+from .worker_pool import *
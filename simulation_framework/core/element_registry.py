@@ -0,0 +1,101 @@
+from simulation_framework.core.ssh_client import *
+from simulation_framework.core.mqtt_client import *
+
+
+class SoPElementRegistry:
+    '''
+    simulation tree의 element와 client들을 name, parent middleware, device 기준으로 hash index에 등록하여
+    event handler에서의 조회를 O(1)로 수행한다.
+    '''
+
+    def __init__(self, simulation_env: SoPMiddlewareElement = None) -> None:
+        self.middleware_table: Dict[str, SoPMiddlewareElement] = {}
+        self.thing_table: Dict[str, SoPThingElement] = {}
+        self.scenario_table: Dict[str, SoPScenarioElement] = {}
+        self.service_table: Dict[str, SoPServiceElement] = {}
+
+        # key: id(element), value: parent middleware
+        self.parent_table: Dict[int, SoPMiddlewareElement] = {}
+
+        # SoPDeviceElement는 hash가 불가능하므로 __eq__와 같은 기준의 tuple을 key로 사용한다.
+        self.ssh_client_table: Dict[tuple, SoPSSHClient] = {}
+        self.mqtt_client_table: Dict[int, SoPMQTTClient] = {}
+        self.mqtt_client_id_table: Dict[str, SoPMQTTClient] = {}
+
+        if simulation_env:
+            self.add_middleware_tree(simulation_env)
+
+    @staticmethod
+    def device_key(device: SoPDeviceElement) -> tuple:
+        return (device.host, device.user, device.ssh_port, device.password)
+
+    def add_middleware_tree(self, middleware: SoPMiddlewareElement, parent_middleware: SoPMiddlewareElement = None):
+        middleware_list: List[Tuple[SoPMiddlewareElement, SoPMiddlewareElement]] = []
+        element_list: List[Tuple[Union[SoPThingElement, SoPScenarioElement], SoPMiddlewareElement]] = []
+
+        def collect(middleware: SoPMiddlewareElement, parent_middleware: SoPMiddlewareElement):
+            middleware_list.append((middleware, parent_middleware))
+            element_list.extend([(thing, middleware) for thing in middleware.thing_list])
+            element_list.extend([(scenario, middleware) for scenario in middleware.scenario_list])
+            for child_middleware in middleware.child_middleware_list:
+                collect(child_middleware, middleware)
+
+        collect(middleware, parent_middleware)
+
+        # 기존 get_*_list_recursive와 같이 level이 높은 element가 먼저 등록되어, 이름이 같은 경우 우선한다.
+        for element, parent_middleware in sorted(middleware_list + element_list, key=lambda x: x[0].level, reverse=True):
+            self.add_element(element, parent_middleware)
+
+    def add_element(self, element: Union[SoPMiddlewareElement, SoPThingElement, SoPScenarioElement], parent_middleware: SoPMiddlewareElement = None):
+        self.parent_table[id(element)] = parent_middleware
+
+        if isinstance(element, SoPMiddlewareElement):
+            self.middleware_table.setdefault(element.name, element)
+        elif isinstance(element, SoPThingElement):
+            self.thing_table.setdefault(element.name, element)
+            for service in element.service_list:
+                self.service_table.setdefault(service.name, service)
+                self.parent_table[id(service)] = parent_middleware
+        elif isinstance(element, SoPScenarioElement):
+            self.scenario_table.setdefault(element.name, element)
+
+    def add_ssh_client(self, ssh_client: SoPSSHClient):
+        self.ssh_client_table.setdefault(self.device_key(ssh_client.device), ssh_client)
+
+    def remove_ssh_client(self, ssh_client: SoPSSHClient):
+        if self.ssh_client_table.get(self.device_key(ssh_client.device)) is ssh_client:
+            self.ssh_client_table.pop(self.device_key(ssh_client.device))
+
+    def add_mqtt_client(self, mqtt_client: SoPMQTTClient):
+        self.mqtt_client_table.setdefault(id(mqtt_client.middleware), mqtt_client)
+        self.mqtt_client_id_table.setdefault(mqtt_client.get_client_id(), mqtt_client)
+
+    def remove_mqtt_client(self, mqtt_client: SoPMQTTClient):
+        if self.mqtt_client_table.get(id(mqtt_client.middleware)) is mqtt_client:
+            self.mqtt_client_table.pop(id(mqtt_client.middleware))
+        if self.mqtt_client_id_table.get(mqtt_client.get_client_id()) is mqtt_client:
+            self.mqtt_client_id_table.pop(mqtt_client.get_client_id())
+
+    def find_middleware(self, name: str) -> SoPMiddlewareElement:
+        return self.middleware_table.get(name, None)
+
+    def find_thing(self, name: str) -> SoPThingElement:
+        return self.thing_table.get(name, None)
+
+    def find_scenario(self, name: str) -> SoPScenarioElement:
+        return self.scenario_table.get(name, None)
+
+    def find_service(self, name: str) -> SoPServiceElement:
+        return self.service_table.get(name, None)
+
+    def find_parent_middleware(self, element: Union[SoPMiddlewareElement, SoPScenarioElement, SoPThingElement, SoPServiceElement]) -> SoPMiddlewareElement:
+        return self.parent_table.get(id(element), None)
+
+    def find_ssh_client(self, device: SoPDeviceElement) -> SoPSSHClient:
+        return self.ssh_client_table.get(self.device_key(device), None)
+
+    def find_mqtt_client(self, middleware: SoPMiddlewareElement) -> SoPMQTTClient:
+        return self.mqtt_client_table.get(id(middleware), None)
+
+    def find_mqtt_client_by_client_id(self, client_id: str) -> SoPMQTTClient:
+        return self.mqtt_client_id_table.get(client_id, None)
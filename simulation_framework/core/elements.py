@@ -2,6 +2,10 @@ from simulation_framework.utils import *
 
 from queue import Queue
 
+# 모든 thing이 공유하는 generic thing 실행 파일
+THING_RUNNER_FILE_NAME = 'thing_runner.py'
+THING_RUNNER_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), THING_RUNNER_FILE_NAME)
+
 
 class SoPElementType(Enum):
     UNDEFINED = 'UNDEFINED'
@@ -205,6 +209,8 @@ class SoPDeviceElement(SoPElement):
         self.localserver_port = localserver_port
 
         self.available_port_list: List[int] = []
+        # SoPSSHClient.get_host_facts()로 조회한 home dir, OS, architecture 등의 정보
+        self.host_facts = None
 
     def __eq__(self, __o: object) -> bool:
         return self.host == __o.host and self.user == __o.user and self.ssh_port == __o.ssh_port and self.password == __o.password
@@ -356,10 +362,11 @@ sqlite3 $VALUE_LOG_DB < %s/ValueLogDBCreate'''
         self.super_scenario_num = super_scenario_num
 
         self.online = False
+        # 재시도 후에도 실행에 실패한 경우
+        self.run_fail = False
         self.binary_sended = False
 
         self.event_log: List[SoPEvent] = []
-        self.recv_queue: Queue = Queue()
 
     def load(self, data: dict):
         super().load(data)
@@ -421,8 +428,10 @@ sqlite3 $VALUE_LOG_DB < %s/ValueLogDBCreate'''
         self.websocket_ssl_port = websocket_ssl_port
         self.localserver_port = localserver_port
 
-    def middleware_cfg_file(self, simulation_env: 'SoPMiddlewareElement', remote_home_dir: str):
-        _, parent_middleware = find_element_recursive(simulation_env, self)
+    def middleware_cfg_file(self, simulation_env: 'SoPMiddlewareElement', remote_home_dir: str, element_tree_index: SoPElementTreeIndex = None):
+        if not element_tree_index:
+            element_tree_index = SoPElementTreeIndex(simulation_env)
+        _, parent_middleware = element_tree_index.find(self)
         parent_middleware: SoPMiddlewareElement
         if parent_middleware is None:
             parent_middleware_line = ''
@@ -478,60 +487,6 @@ sqlite3 $VALUE_LOG_DB < %s/ValueLogDBCreate'''
 
 class SoPServiceElement(SoPElement):
 
-    ERROR_TEMPLATE = '''\
-global thing_start_time
-global service_fail_flag
-
-%s
-
-if random.uniform(0, 1) < %f or service_fail_flag[f'{get_current_function_name()}']:
-    service_fail_flag[f'{get_current_function_name()}'] = True
-    raise Exception('fail error')
-'''
-
-    SUBFUNCTION_TEMPLATE = '''\
-results += [self.req(key, subfunction_name='%s', tag_list=%s, arg_list=(), service_type=SoPServiceType.FUNCTION, policy=SoPPolicy.%s)]'''
-
-    SERVICE_INSTANCE_TEMPLATE = '''\
-SoPFunction(func=%s, return_type=SoPType.STRING, tag_list=[%s], arg_list=[], exec_time=%.3f, timeout=%.3f, energy=%d)'''
-
-    SUPER_SERVICE_INSTANCE_TEMPLATE = '''\
-SoPSuperFunction(func=self.%s, return_type=SoPType.STRING, tag_list=[%s], arg_list=[], exec_time=%.3f, timeout=%.3f, energy=%d)'''
-
-    FUNCTION_TEMPLATE = '''\
-def %s() -> str:
-    SOPLOG_DEBUG(f'function {get_current_function_name()} run... return %d')
-    
-%s
-    
-    time.sleep(%.3f)
-    return "execute_time: %.3f, energy: %d"
-'''
-
-    SUPER_FUNCTION_TEMPLATE = '''\
-def %s(self, key) -> str:
-    SOPLOG_DEBUG(f'super function {get_current_function_name()} run...')
-    results = []
-
-%s
-
-    execute_time_sum = 0
-    energy_sum = 0
-    if results:
-        for result in results:
-            for subresult in result:
-                if subresult['return_value'] is None:
-                    continue
-                execute_time = float(subresult['return_value'].split(",")[0].split(": ")[1])
-                energy = int(subresult['return_value'].split(",")[1].split(": ")[1])
-                execute_time_sum += execute_time
-                energy_sum += energy
-
-        return f"execute_time: {execute_time_sum}, energy: {energy_sum}"
-    else:
-        raise Exception('super execute fail...')
-'''
-
     def __init__(self, name: str = '', level: int = -1, element_type: SoPElementType = None,
                  tag_list: List[str] = [], is_super: bool = False, energy: float = 0, execute_time: float = 0, return_value: int = 0,
                  subservice_list: List['SoPServiceElement'] = []) -> None:
@@ -545,23 +500,8 @@ def %s(self, key) -> str:
 
         self.subservice_list = subservice_list
 
-    def tag_code(self) -> str:
-        tag_code = ', '.join([f'SoPTag("{tag}")' for tag in self.tag_list])
-        return tag_code
-
-    def error_code(self, fail_rate: float, is_super: bool) -> str:
-        error_code = self.ERROR_TEMPLATE % ('''\
-if thing_start_time == 0:
-    thing_start_time = get_current_time()''' if not is_super else '''\
-if thing_start_time == 0:
-    thing_start_time += 1
-elif thing_start_time == 1:
-    thing_start_time = get_current_time()''', fail_rate)
-
-        return error_code.rstrip()
-
-    def reqline_code(self) -> str:
-        reqline_code_list = []
+    def subrequest_list(self) -> List[dict]:
+        subrequest_list = []
         for subfunction in self.subservice_list:
             picked_tag_list = random.sample(subfunction.tag_list, random.randint(
                 1, len(subfunction.tag_list)))
@@ -573,43 +513,20 @@ elif thing_start_time == 1:
             # TODO: policy(ALL, SINGLE) 비율을 조정할 수 있도록 수정하면 좋을 것 같다. (현재는 1:1로 고정)
             policy = random.choice(['SINGLE'])
 
-            reqline_code_list.append(self.SUBFUNCTION_TEMPLATE % (subfunction.name,
-                                                                  picked_tag_list,
-                                                                  policy))
-        return '\n'.join(reqline_code_list).rstrip()
-
-    def service_instance_code(self) -> str:
-        tag_code = self.tag_code()
-        if not self.is_super:
-            service_instance_code = self.SERVICE_INSTANCE_TEMPLATE % (self.name,
-                                                                      tag_code,
-                                                                      self.execute_time,
-                                                                      600,
-                                                                      self.energy)
-        else:
-            service_instance_code = self.SUPER_SERVICE_INSTANCE_TEMPLATE % (self.name,
-                                                                            self.tag_code(),
-                                                                            self.execute_time,
-                                                                            600,
-                                                                            self.energy)
-        return service_instance_code
-
-    def service_code(self, fail_rate: float, is_super: bool) -> str:
-        error_code = append_indent(self.error_code(
-            fail_rate, is_super))
-        if not self.is_super:
-            service_code = self.FUNCTION_TEMPLATE % (self.name,
-                                                     self.return_value,
-                                                     error_code,
-                                                     self.execute_time,
-                                                     self.execute_time,
-                                                     self.energy)
-        else:
-            # NOTE: in case of super service, error_code is not used.
-            reqline_code = append_indent(self.reqline_code())
-            service_code = self.SUPER_FUNCTION_TEMPLATE % (self.name,
-                                                           reqline_code)
-        return service_code
+            subrequest_list.append(dict(subfunction_name=subfunction.name,
+                                        tag_list=picked_tag_list,
+                                        policy=policy))
+        return subrequest_list
+
+    def service_spec(self) -> dict:
+        service_spec = dict(name=self.name,
+                            tag_list=self.tag_list,
+                            execute_time=self.execute_time,
+                            energy=self.energy,
+                            return_value=self.return_value)
+        if self.is_super:
+            service_spec['subrequest_list'] = self.subrequest_list()
+        return service_spec
 
     def load(self, data: dict) -> 'SoPServiceElement':
         super().load(data)
@@ -640,118 +557,6 @@ elif thing_start_time == 1:
 
 class SoPThingElement(SoPElement):
 
-    THING_TEMPLATE = '''\
-from big_thing_py.big_thing import *
-
-import time
-import random
-import argparse
-
-thing_start_time = 0
-service_fail_flag = %s
-
-%s
-
-def arg_parse():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--name", '-n', action='store', type=str,
-                        required=False, default='%s', help="thing name")
-    parser.add_argument("--host", '-ip', action='store', type=str,
-                        required=False, default='%s', help="host name")
-    parser.add_argument("--port", '-p', action='store', type=int,
-                        required=False, default=%d, help="port")
-    parser.add_argument("--alive_cycle", '-ac', action='store', type=int,
-                        required=False, default=%.3f, help="refresh_cycle")
-    parser.add_argument("--refresh_cycle", '-rc', action='store', type=int,
-                        required=False, default=%.3f, help="refresh_cycle")
-    parser.add_argument("--append_mac", '-am', action='%s',                         # store_true, store_false
-                        required=False, help="append mac address to thing name")
-    parser.add_argument("--retry_register", action='store_true',
-                        required=False, help="retry register feature enable")
-    args, unknown = parser.parse_known_args()
-    return args
-
-
-def main():
-    args = arg_parse()
-    function_list = \\
-        [%s]
-    value_list = []
-    thing = SoPBigThing(name=args.name, service_list=function_list + value_list,
-                        alive_cycle=args.alive_cycle, is_super=False, is_parallel=%s, ip=args.host, port=args.port,
-                        ssl_ca_path=None, ssl_enable=None, append_mac_address=False, log_name='%s', log_mode=SoPPrintMode.ABBR,
-                        retry_register=args.retry_register)
-    thing.setup(avahi_enable=False)
-    thing.run()
-
-
-if __name__ == '__main__':
-    main()
-'''
-    SUPER_THING_TEMPLATE = '''\
-from big_thing_py.super_thing import *
-
-import argparse
-
-thing_start_time = 0
-
-
-class SoPBasicSuperThing(SoPSuperThing):
-
-    def __init__(self, name: str, service_list: List[SoPService] = ..., alive_cycle: float = 600, is_super: bool = False, is_parallel: bool = True,
-                 ip: str = None, port: int = None, ssl_ca_path: str = None, ssl_enable: bool = False, log_name: str = None, log_enable: bool = True, log_mode: SoPPrintMode = SoPPrintMode.ABBR, append_mac_address: bool = True,
-                 refresh_cycle: float = 10, retry_register: bool = False):
-        value_list = []
-        function_list = \\
-            [%s]
-
-        service_list = value_list + function_list
-        super().__init__(name, service_list, alive_cycle, is_super, is_parallel, ip, port,
-                         ssl_ca_path, ssl_enable, log_name, log_enable, log_mode, append_mac_address, refresh_cycle, retry_register)
-
-%s
-
-def arg_parse():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--name", '-n', action='store', type=str,
-                        required=False, default='%s', help="thing name")
-    parser.add_argument("--host", '-ip', action='store', type=str,
-                        required=False, default='%s', help="host name")
-    parser.add_argument("--port", '-p', action='store', type=int,
-                        required=False, default=%d, help="port")
-    parser.add_argument("--alive_cycle", '-ac', action='store', type=int,
-                        required=False, default=%.3f, help="alive cycle")
-    parser.add_argument("--refresh_cycle", '-rc', action='store', type=int,
-                        required=False, default=%.3f, help="refresh cycle")
-    parser.add_argument("--auto_scan", '-as', action='%s',
-                        required=False, help="middleware auto scan enable")
-    parser.add_argument("--log", action='store_true',
-                        required=False, help="log enable")
-    parser.add_argument("--log_mode", action='store',
-                        required=False, default=SoPPrintMode.FULL, help="log mode")
-    parser.add_argument("--append_mac", '-am', action='store_true',                         # store_true, store_false
-                        required=False, help="append mac address to thing name")
-    parser.add_argument("--retry_register", action='store_true',
-                        required=False, help="retry register feature enable")
-    args, unknown = parser.parse_known_args()
-
-    return args
-
-
-def generate_thing(args):
-    super_thing = SoPBasicSuperThing(name=args.name, ip=args.host, port=args.port, is_super=True, is_parallel=%s, ssl_ca_path=None, ssl_enable=None,
-                                     alive_cycle=args.alive_cycle, refresh_cycle=args.refresh_cycle, append_mac_address=False, log_name='%s', log_mode=SoPPrintMode.ABBR,
-                                     retry_register=args.retry_register)
-    return super_thing
-
-
-if __name__ == '__main__':
-    args = arg_parse()
-    thing = generate_thing(args)
-    thing.setup(avahi_enable=args.auto_scan)
-    thing.run()
-'''
-
     def __init__(self, name: str = '', level: int = -1, element_type: SoPElementType = None,
                  service_list: List['SoPServiceElement'] = [], is_super: bool = False, is_parallel: bool = False, alive_cycle: float = 0,
                  device: SoPDeviceElement = None,
@@ -772,10 +577,11 @@ if __name__ == '__main__':
 
         self.middleware_client_name: str = ''
         self.registered: bool = False
+        # 재시도 후에도 실행 또는 등록에 실패한 경우
+        self.run_fail: bool = False
         self.pid: int = 0
 
         self.event_log: List[SoPEvent] = []
-        self.recv_queue: Queue = Queue()
 
     def load(self, data: dict):
         super().load(data)
@@ -810,40 +616,17 @@ if __name__ == '__main__':
     def event(self, event_type: SoPEventType, timestamp: float = 0.0, **kwargs) -> SoPEvent:
         return super().event(event_type, timestamp, **kwargs)
 
-    def thing_code(self):
-
-        if not self.is_super:
-            whole_service_code = ''.join(
-                [service.service_code(self.fail_rate, self.is_super) + '\n' for service in self.service_list])
-            whole_service_instance_code = ', \n\t\t'.join(
-                [service.service_instance_code() for service in self.service_list])
-            thing_code = self.THING_TEMPLATE % ({service.name: False for service in self.service_list},
-                                                whole_service_code,
-                                                self.name,
-                                                'localhost',
-                                                1883,
-                                                60,
-                                                60,
-                                                'store_true',
-                                                whole_service_instance_code,
-                                                self.is_parallel,
-                                                f'./log/{self.name}.log')
-        else:
-            whole_service_code = append_indent(''.join(
-                [service.service_code(self.fail_rate, self.is_super) + '\n' for service in self.service_list]))
-            whole_service_instance_code = ', \n\t\t'.join(
-                [service.service_instance_code() for service in self.service_list])
-            thing_code = self.SUPER_THING_TEMPLATE % (whole_service_instance_code,
-                                                      whole_service_code,
-                                                      self.name,
-                                                      'localhost',
-                                                      1883,
-                                                      60,
-                                                      60,
-                                                      'store_true',
-                                                      self.is_parallel,
-                                                      f'./log/{self.name}.log')
-        return thing_code
+    def thing_spec(self) -> dict:
+        # thing_runner.py가 읽어 실행하는 spec. service 동작은 runner에 구현되어 있다.
+        return dict(name=self.name,
+                    is_super=self.is_super,
+                    is_parallel=self.is_parallel,
+                    fail_rate=self.fail_rate,
+                    service_list=[service.service_spec() for service in self.service_list])
+
+    def remote_thing_runner_path(self) -> str:
+        # thing_runner.py는 device별로 base_thing, super_thing 폴더의 상위 폴더에 하나만 존재한다.
+        return os.path.join(os.path.dirname(os.path.dirname(self.remote_thing_file_path)), THING_RUNNER_FILE_NAME)
 
     def find_service_by_name(self, service_name: str) -> SoPServiceElement:
         for service in self.service_list:
@@ -873,7 +656,6 @@ class SoPScenarioElement(SoPElement):
         self.service_check = False
 
         self.event_log: List[SoPEvent] = []
-        self.recv_queue: Queue = Queue()
 
         # FIXME: 제대로 구현하기
         self.cycle_count = 0
@@ -1,12 +1,18 @@
 
 from simulation_framework.core.ssh_client import *
 from simulation_framework.core.mqtt_client import *
+from simulation_framework.core.topic_router import *
+from simulation_framework.core.element_registry import *
+from simulation_framework.core.event_scheduler import *
+from simulation_framework.core.online_evaluator import *
 
 
 class SoPEventHandler:
 
     def __init__(self, simulation_env: SoPMiddlewareElement = None, event_log: List[SoPEvent] = [], timeout: float = 5.0, mqtt_debug: bool = False, middleware_debug: bool = False, running_time: float = None,
-                 download_logs: bool = False) -> None:
+                 download_logs: bool = False, worker_num: int = 64, device_concurrency: int = 8, max_retry: int = 3,
+                 ssh_transport_num: int = 2, ssh_channel_num: int = 8, thing_host: bool = False, mqtt_async: bool = False,
+                 online_evaluate: bool = False, early_stop_tolerance: float = None, early_stop_min_time: float = 0, early_stop_max_time: float = None) -> None:
         self.simulation_env = simulation_env
         self.middleware_list: List[SoPMiddlewareElement] = get_middleware_list_recursive(
             self.simulation_env)
@@ -15,34 +21,72 @@ class SoPEventHandler:
         self.scenario_list: List[SoPScenarioElement] = get_scenario_list_recursive(
             self.simulation_env)
         self.device_list: List[SoPDeviceElement] = []
+        self.element_registry = SoPElementRegistry(self.simulation_env)
 
         self.mqtt_client_list: List[SoPMQTTClient] = []
+        # 모든 mqtt client가 수신한 message를 하나의 queue로 모은다.
+        self.recv_message_queue: Queue = Queue()
         self.ssh_client_list: List[SoPSSHClient] = []
 
         self.event_listener_event = Event()
         # self.event_listener_lock = Lock()
         self.event_listener_thread: SoPThread = SoPThread(
             name='event_listener', target=self.event_listener, args=(self.event_listener_event, ))
+        # mqtt_async인 경우 listener thread와 client별 network thread 대신 하나의 event loop에서 message를 처리한다.
+        self.mqtt_client_manager = SoPMQTTClientManager(on_message=self.on_recv_message) if mqtt_async else None
+        self.worker_pool = SoPWorkerPool(worker_num=worker_num, device_concurrency=device_concurrency)
+        self.event_scheduler = SoPEventScheduler(dispatch=self.event_trigger,
+                                                 get_time_origin=lambda: self.simulation_start_time,
+                                                 worker_pool=self.worker_pool)
+        self.retry_policy = SoPRetryPolicy(max_retry=max_retry)
 
         # simulator와 같은 인스턴스를 공유한다.
         self.simulation_start_time = 0
         self.simulation_duration = 0
         self.event_log: List[SoPEvent] = event_log
+        # message를 수신한 시점부터 listener가 dispatch하기까지 걸린 시간
+        self.listener_lag_stat = SoPLatencyStat()
+        # key: middleware name, value: 마지막 refresh 요청부터 모든 응답을 받기까지 걸린 시간
+        self.refresh_latency_table: Dict[str, float] = {}
         self.timeout = timeout
         self.running_time = running_time
+        # event가 기록되거나 result를 받을 때마다 scenario별 metric을 갱신한다.
+        # early stop은 online evaluator의 누적 metric으로 수렴 여부를 판단한다.
+        self.online_evaluator = SoPOnlineEvaluator(self.simulation_env, running_time) if online_evaluate or early_stop_tolerance else None
+
+        # scenario별 cycle metric의 신뢰구간이 tolerance 안으로 들어오면 running_time 전에 END를 실행한다.
+        self.early_stop_tolerance = early_stop_tolerance
+        self.early_stop_min_time = early_stop_min_time
+        self.early_stop_max_time = early_stop_max_time
+        self.early_stop_event = Event()
+        self.early_stop_thread: SoPThread = SoPThread(
+            name='early_stop_monitor', target=self.early_stop_monitor, args=(self.early_stop_event, ))
 
         self.mqtt_debug = mqtt_debug
         self.middleware_debug = middleware_debug
 
         self.download_logs = download_logs
+        self.ssh_transport_num = ssh_transport_num
+        self.ssh_channel_num = ssh_channel_num
+
+        # thing host mode에서는 device별로 하나의 thing_runner.py process가 여러 thing을 실행한다.
+        # key: (id(ssh_client), thing root 경로), value: thing host의 pid
+        self.thing_host = thing_host
+        self.thing_host_table: Dict[Tuple[int, str], str] = {}
+        self.thing_host_lock = Lock()
 
         self.download_log_file_thread_queue = Queue()
 
+        self.topic_router: SoPTopicRouter = self.init_topic_router()
+        self.expect_table = SoPExpectTable()
+
     def add_mqtt_client(self, mqtt_client: SoPMQTTClient):
         self.mqtt_client_list.append(mqtt_client)
+        self.element_registry.add_mqtt_client(mqtt_client)
 
     def add_ssh_client(self, ssh_client: SoPSSHClient):
         self.ssh_client_list.append(ssh_client)
+        self.element_registry.add_ssh_client(ssh_client)
 
     def update_middleware_thing_device_list(self):
         device_list: List[SoPDeviceElement] = [
@@ -62,7 +106,7 @@ class SoPEventHandler:
     def init_ssh_client_list(self):
 
         def task(device: SoPDeviceElement):
-            ssh_client = SoPSSHClient(device)
+            ssh_client = SoPSSHClient(device, transport_num=self.ssh_transport_num, channel_num=self.ssh_channel_num)
             ssh_client.connect(use_ssh_config=False)
 
             # 따로 명세되어있지 않고 local network에 있는 경우 사용 가능한 port를 찾는다.
@@ -98,94 +142,51 @@ class SoPEventHandler:
                 for picked_port in picked_port_list:
                     middleware.device.available_port_list.remove(picked_port)
 
-            mqtt_client = SoPMQTTClient(middleware, debug=self.mqtt_debug)
+            mqtt_client = SoPMQTTClient(middleware, debug=self.mqtt_debug,
+                                        recv_message_queue=self.recv_message_queue,
+                                        manager=self.mqtt_client_manager)
             self.add_mqtt_client(mqtt_client)
 
     def find_ssh_client(self, element: Union[SoPMiddlewareElement, SoPThingElement]) -> SoPSSHClient:
-        for ssh_client in self.ssh_client_list:
-            if ssh_client.device == element.device:
-                return ssh_client
-        else:
-            return None
+        return self.element_registry.find_ssh_client(element.device)
 
     def find_mqtt_client(self, middleware: SoPMiddlewareElement) -> SoPMQTTClient:
-        for mqtt_client in self.mqtt_client_list:
-            if mqtt_client.middleware == middleware:
-                return mqtt_client
-        else:
-            return None
+        return self.element_registry.find_mqtt_client(middleware)
 
     def find_mqtt_client_by_client_id(self, client_id: str) -> SoPMQTTClient:
-        for mqtt_client in self.mqtt_client_list:
-            if mqtt_client.get_client_id() == client_id:
-                return mqtt_client
-        else:
-            return None
+        return self.element_registry.find_mqtt_client_by_client_id(client_id)
 
     def find_middleware(self, target_middleware_name: str) -> SoPMiddlewareElement:
-        for middleware in self.middleware_list:
-            if middleware.name == target_middleware_name:
-                return middleware
-        else:
-            return None
+        return self.element_registry.find_middleware(target_middleware_name)
 
     def find_scenario(self, target_scenario_name: str) -> SoPScenarioElement:
-        for scenario in self.scenario_list:
-            if scenario.name == target_scenario_name:
-                return scenario
-        else:
-            return None
+        return self.element_registry.find_scenario(target_scenario_name)
 
     def find_thing(self, target_thing_name: str) -> SoPThingElement:
-        for thing in self.thing_list:
-            if thing.name == target_thing_name:
-                return thing
-        else:
-            return None
+        return self.element_registry.find_thing(target_thing_name)
 
     def find_service(self, target_service_name: str) -> SoPServiceElement:
-        for thing in self.thing_list:
-            for service in thing.service_list:
-                if service.name == target_service_name:
-                    return service
-        else:
-            return None
+        return self.element_registry.find_service(target_service_name)
 
     def find_element_middleware(self, element: Union[SoPMiddlewareElement, SoPScenarioElement, SoPThingElement, SoPServiceElement, str]) -> SoPMiddlewareElement:
         if not element:
             raise ValueError('element is None')
 
-        if not isinstance(element, str):
-            element_name = element.name
-        else:
-            element_name = element
+        if isinstance(element, str):
+            element = self.find_thing(element) or self.find_scenario(element) or self.find_middleware(element) or self.find_service(element)
 
-        for middleware in self.middleware_list:
-            if isinstance(element, SoPMiddlewareElement):
-                for child_middleware in middleware.child_middleware_list:
-                    if child_middleware.name == element_name:
-                        return middleware
-            elif isinstance(element, SoPScenarioElement):
-                for scenario in middleware.scenario_list:
-                    if scenario.name == element_name:
-                        return middleware
-            elif isinstance(element, SoPThingElement):
-                for thing in middleware.thing_list:
-                    if thing.name == element_name:
-                        return middleware
-            elif isinstance(element, SoPServiceElement):
-                for thing in middleware.thing_list:
-                    for service in thing.service_list:
-                        if service.name == element_name:
-                            return middleware
-        else:
-            return None
+        return self.element_registry.find_parent_middleware(element)
 
     def event_listener_start(self):
-        self.event_listener_thread.start()
+        if self.mqtt_client_manager:
+            self.mqtt_client_manager.start()
+        else:
+            self.event_listener_thread.start()
 
     def event_listener_stop(self):
         self.event_listener_event.set()
+        if self.mqtt_client_manager:
+            self.mqtt_client_manager.stop()
 
     def download_log_file(self):
 
@@ -193,7 +194,7 @@ class SoPEventHandler:
             ssh_client = self.find_ssh_client(middleware)
             ssh_client.open_sftp()
 
-            remote_home_dir = ssh_client.send_command('cd ~ && pwd')[0]
+            remote_home_dir = ssh_client.get_remote_home_dir()
             target_middleware_log_path = os.path.join(
                 target_simulation_log_path, f'middleware.level{middleware.level}.{middleware.name}')
 
@@ -243,24 +244,55 @@ class SoPEventHandler:
 
     def event_trigger(self, event: SoPEvent):
         # wait until timestamp is reached
+        # event_scheduler를 통해 실행되는 경우 이미 시각에 도달한 상태이다.
         if event.timestamp == None:
             raise Exception('timestamp is not defined')
-        while get_current_time() - self.simulation_start_time < event.timestamp:
-            time.sleep(THREAD_TIME_OUT)
+        remaining_time = self.simulation_start_time + event.timestamp - get_current_time()
+        if remaining_time > 0:
+            time.sleep(remaining_time)
 
         if event.event_type == SoPEventType.DELAY:
             SOPTEST_LOG_DEBUG(
                 f'Delay {event.delay} Sec start...', SoPTestLogLevel.INFO, 'yellow')
-            self.event_log.append(event)
+            self.add_event(event)
             time.sleep(event.delay)
         elif event.event_type == SoPEventType.START:
             self.simulation_start_time = get_current_time()
+            if self.online_evaluator:
+                self.online_evaluator.start(self.simulation_start_time)
+            if self.early_stop_tolerance:
+                self.early_stop_thread.start()
             SOPTEST_LOG_DEBUG(
                 f'Simulation Start', SoPTestLogLevel.PASS, 'yellow')
         elif event.event_type == SoPEventType.END:
+            self.early_stop_event.set()
             self.simulation_duration = get_current_time() - self.simulation_start_time
             SOPTEST_LOG_DEBUG(
                 f'Simulation End. duration: {self.simulation_duration:.3f} sec', SoPTestLogLevel.PASS, 'yellow')
+            listener_lag = self.get_listener_lag()
+            SOPTEST_LOG_DEBUG(
+                f'Listener lag. avg: {listener_lag["avg"] * 1000:.3f} ms, p99: {listener_lag["p99"] * 1000:.3f} ms, max: {listener_lag["max"] * 1000:.3f} ms, message: {listener_lag["count"]}', SoPTestLogLevel.INFO)
+            event_lateness = self.event_scheduler.get_lateness()
+            SOPTEST_LOG_DEBUG(
+                f'Event lateness. avg: {event_lateness["avg"] * 1000:.3f} ms, p99: {event_lateness["p99"] * 1000:.3f} ms, max: {event_lateness["max"] * 1000:.3f} ms, event: {event_lateness["count"]}', SoPTestLogLevel.INFO)
+            SOPTEST_LOG_DEBUG(
+                f'Worker pool. queue depth: {self.worker_pool.get_queue_depth()}, active worker: {self.worker_pool.get_active_worker_num()}', SoPTestLogLevel.INFO)
+            if self.mqtt_client_manager:
+                SOPTEST_LOG_DEBUG(
+                    f'MQTT event loop. pending message: {self.mqtt_client_manager.get_pending_message_num()}, read pause: {self.mqtt_client_manager.pause_num}, subscribe packet: {self.mqtt_client_manager.subscribe_packet_num}, reconnect: {self.mqtt_client_manager.reconnect_num}', SoPTestLogLevel.INFO)
+            for ssh_client in self.ssh_client_list:
+                command_latency = ssh_client.get_command_latency()
+                SOPTEST_LOG_DEBUG(
+                    f'SSH command RTT. {ssh_client.device.host} avg: {command_latency["avg"] * 1000:.3f} ms, p99: {command_latency["p99"] * 1000:.3f} ms, max: {command_latency["max"] * 1000:.3f} ms, command: {command_latency["count"]}', SoPTestLogLevel.INFO)
+            for task_type, task_latency in self.worker_pool.get_task_latency().items():
+                SOPTEST_LOG_DEBUG(
+                    f'Handler latency. {task_type} avg: {task_latency["avg"]:.3f} sec, p99: {task_latency["p99"]:.3f} sec, max: {task_latency["max"]:.3f} sec, count: {task_latency["count"]}', SoPTestLogLevel.INFO)
+            for thing_host_status in self.get_thing_host_status():
+                SOPTEST_LOG_DEBUG(
+                    f'Thing host. {thing_host_status["host"]} pid: {thing_host_status["pid"]}, max rss: {thing_host_status["max_rss"] / 1024:.1f} MB, cpu time: {thing_host_status["cpu_time"]:.3f} sec, thread: {thing_host_status["thread_num"]}, thing: {len(thing_host_status["thing_list"])}', SoPTestLogLevel.INFO)
+                for thing_status in thing_host_status['thing_list']:
+                    SOPTEST_LOG_DEBUG(
+                        f'    thing: {thing_status["name"]} alive: {thing_status["alive"]}, registered: {thing_status["registered"]}, cpu time: {thing_status["cpu_time"]:.3f} sec, thread: {thing_status["thread_num"]}', SoPTestLogLevel.INFO)
 
             # NOTE: 시뮬레이션이 끝날 때 시나리오를 stop하면 안된다. 끝나는 시점에서 그대로의 시나리오 state를 알아야 한다.
             # for middleware in self.middleware_list:
@@ -272,6 +304,11 @@ class SoPEventHandler:
                          service_check=True, scenario_check=True)
 
             self.event_listener_stop()
+            if self.online_evaluator:
+                self.online_evaluator.finish(self.simulation_duration)
+                online_summary = self.online_evaluator.summary()
+                SOPTEST_LOG_DEBUG(
+                    f'Online evaluation. acceptance ratio: {online_summary["acceptance_ratio"] * 100:.2f}%, cycle: {online_summary["cycle_num"]}, cycle success ratio: {online_summary["cycle_success_ratio"] * 100:.2f}%, avg latency: {online_summary["avg_latency"]:.3f}, avg energy: {online_summary["avg_energy"]:.3f}', SoPTestLogLevel.INFO)
             self.kill_all_simulation_instance()
             # if self.download_logs:
             #     self.download_log_file(
@@ -284,43 +321,41 @@ class SoPEventHandler:
                 parent_middleware = self.find_element_middleware(
                     target_element)
                 if parent_middleware:
-                    while not parent_middleware.online:
-                        time.sleep(THREAD_TIME_OUT)
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.run_middleware, args=(target_element, 10, )).start()
+                    self.wait_middleware_online(parent_middleware)
+                self.event_scheduler.submit(self.run_middleware, target_element, 10,
+                                            device_key=SoPElementRegistry.device_key(target_element.device), task_type=event.event_type.value)
                 self.subscribe_scenario_finish_topic(middleware=target_element)
             elif event.event_type == SoPEventType.MIDDLEWARE_KILL:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.kill_middleware, args=(target_element, )).start()
+                self.event_scheduler.submit(self.kill_middleware, target_element,
+                                            device_key=SoPElementRegistry.device_key(target_element.device), task_type=event.event_type.value)
             elif event.event_type == SoPEventType.THING_RUN:
-                while not self.check_middleware_online(target_element):
-                    time.sleep(THREAD_TIME_OUT)
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.run_thing, args=(target_element, 30, )).start()
+                self.wait_middleware_online(self.find_element_middleware(target_element))
+                self.event_scheduler.submit(self.run_thing, target_element, 30,
+                                            device_key=SoPElementRegistry.device_key(target_element.device), task_type=event.event_type.value)
             elif event.event_type == SoPEventType.THING_KILL:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.kill_thing, args=(target_element, )).start()
+                self.event_scheduler.submit(self.kill_thing, target_element,
+                                            device_key=SoPElementRegistry.device_key(target_element.device), task_type=event.event_type.value)
             elif event.event_type == SoPEventType.THING_UNREGISTER:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.unregister_thing, args=(target_element, )).start()
+                self.event_scheduler.submit(self.unregister_thing, target_element,
+                                            device_key=SoPElementRegistry.device_key(target_element.device), task_type=event.event_type.value)
             elif event.event_type == SoPEventType.SCENARIO_VERIFY:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.verify_scenario, args=(target_element, self.timeout, )).start()
+                self.event_scheduler.submit(self.verify_scenario, target_element, self.timeout,
+                                            task_type=event.event_type.value)
             elif event.event_type == SoPEventType.SCENARIO_ADD:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.add_scenario, args=(target_element, self.timeout, )).start()
+                self.event_scheduler.submit(self.add_scenario, target_element, self.timeout,
+                                            task_type=event.event_type.value)
             elif event.event_type == SoPEventType.SCENARIO_RUN:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.run_scenario, args=(target_element, self.timeout, )).start()
+                self.event_scheduler.submit(self.run_scenario, target_element, self.timeout,
+                                            task_type=event.event_type.value)
             elif event.event_type == SoPEventType.SCENARIO_STOP:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.stop_scenario, args=(target_element, self.timeout, )).start()
+                self.event_scheduler.submit(self.stop_scenario, target_element, self.timeout,
+                                            task_type=event.event_type.value)
             elif event.event_type == SoPEventType.SCENARIO_UPDATE:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.update_scenario, args=(target_element, self.timeout, )).start()
+                self.event_scheduler.submit(self.update_scenario, target_element, self.timeout,
+                                            task_type=event.event_type.value)
             elif event.event_type == SoPEventType.SCENARIO_DELETE:
-                SoPThread(name=f'{event.event_type.value}_{event.element.name}',
-                          target=self.delete_scenario, args=(target_element, self.timeout, )).start()
+                self.event_scheduler.submit(self.delete_scenario, target_element, self.timeout,
+                                            task_type=event.event_type.value)
             elif event.event_type == SoPEventType.REFRESH:
                 self.refresh(timeout=self.timeout,
                              service_check=True, scenario_check=True)
@@ -341,18 +376,35 @@ class SoPEventHandler:
             #                         SoPEventType.THING_UNREGISTER]:
             #     time.sleep(0.1)
 
-    def event_listener(self, stop_event: Event):
-        recv_msg = None
+    def early_stop_monitor(self, stop_event: Event, check_interval: float = 1.0):
+        while not stop_event.wait(check_interval):
+            elapsed_time = get_current_time() - self.simulation_start_time
+            if elapsed_time < self.early_stop_min_time:
+                continue
+
+            convergence_error = self.online_evaluator.convergence_error()
+            if convergence_error <= self.early_stop_tolerance:
+                SOPTEST_LOG_DEBUG(
+                    f'Metrics converged at {elapsed_time:.3f} sec. (error: {convergence_error * 100:.2f}%, tolerance: {self.early_stop_tolerance * 100:.2f}%)', SoPTestLogLevel.PASS, 'yellow')
+            elif self.early_stop_max_time and elapsed_time >= self.early_stop_max_time:
+                SOPTEST_LOG_DEBUG(
+                    f'Metrics not converged until max time {self.early_stop_max_time:.3f} sec. (error: {convergence_error * 100:.2f}%, tolerance: {self.early_stop_tolerance * 100:.2f}%)', SoPTestLogLevel.WARN)
+            else:
+                continue
+
+            self.event_scheduler.preempt(SoPEventType.END, elapsed_time)
+            return
 
+    def event_listener(self, stop_event: Event):
         try:
-            while not stop_event.wait(THREAD_TIME_OUT / 100):
-                for mqtt_client in self.mqtt_client_list:
-                    try:
-                        recv_msg = mqtt_client.recv_message_queue.get(
-                            timeout=THREAD_TIME_OUT / 100)
-                        self.on_recv_message(recv_msg)
-                    except Empty:
-                        recv_msg = None
+            while not stop_event.is_set():
+                # message가 도착하면 바로 깨어나며, timeout은 stop_event를 확인하는 주기로만 사용된다.
+                try:
+                    recv_msg, recv_time = self.recv_message_queue.get(
+                        timeout=0.1)
+                except Empty:
+                    continue
+                self.on_recv_message(recv_msg, recv_time)
 
         except Exception as e:
             stop_event.set()
@@ -376,15 +428,20 @@ class SoPEventHandler:
     def subscribe_scenario_finish_topic(self, middleware: SoPMiddlewareElement):
         mqtt_client = self.find_mqtt_client(middleware)
         while not mqtt_client.is_run:
+            if middleware.run_fail:
+                return
             time.sleep(THREAD_TIME_OUT)
         mqtt_client.subscribe('SIM/FINISH')
 
-    def run_middleware(self, middleware: SoPMiddlewareElement, timeout: float = 5):
+    def wait_middleware_online(self, middleware: SoPMiddlewareElement) -> bool:
+        # middleware 실행이 최종적으로 실패한 경우 더 기다리지 않는다.
+        while not middleware.online:
+            if middleware.run_fail:
+                return False
+            time.sleep(THREAD_TIME_OUT)
+        return True
 
-        def check_parent_middleware_online(parent_middleware: SoPMiddlewareElement):
-            if parent_middleware:
-                while not parent_middleware.online:
-                    time.sleep(THREAD_TIME_OUT)
+    def run_middleware(self, middleware: SoPMiddlewareElement, timeout: float = 5):
 
         def middleware_run_command(middleware: SoPMiddlewareElement, remote_home_dir: str):
             log_file_path = ''
@@ -432,37 +489,44 @@ class SoPEventHandler:
                     f'[TIMEOUT] Running middleware {middleware.name} was failed...', SoPTestLogLevel.FAIL)
                 return False
 
+        def try_run_middleware() -> bool:
+            remote_home_dir = ssh_client.get_remote_home_dir()
+            self.run_mosquitto(middleware, ssh_client, remote_home_dir)
+            self.init_middleware(middleware, ssh_client, remote_home_dir)
+            mqtt_client.run()
+            ssh_client.send_command(middleware_run_command(
+                middleware=middleware, remote_home_dir=remote_home_dir), ignore_result=True)
+
+            return check_online_with_timeout(mqtt_client, timeout=timeout, check_interval=0.5)
+
         ssh_client = self.find_ssh_client(middleware)
         mqtt_client = self.find_mqtt_client(middleware)
         parent_middleware = self.find_element_middleware(middleware)
 
         SOPTEST_LOG_DEBUG(
             f'Wait for middleware {middleware.name} online', SoPTestLogLevel.INFO, 'yellow')
-        check_parent_middleware_online(parent_middleware)
-
-        remote_home_dir = ssh_client.send_command('cd ~ && pwd')[0]
-        self.run_mosquitto(middleware, ssh_client, remote_home_dir)
-        self.init_middleware(middleware, ssh_client, remote_home_dir)
-        mqtt_client.run()
-        ssh_client.send_command(middleware_run_command(
-            middleware=middleware, remote_home_dir=remote_home_dir), ignore_result=True)
+        if parent_middleware and not self.wait_middleware_online(parent_middleware):
+            SOPTEST_LOG_DEBUG(
+                f'Parent middleware {parent_middleware.name} of {middleware.name} was failed to run', SoPTestLogLevel.FAIL)
+            middleware.run_fail = True
+            return False
 
-        if not check_online_with_timeout(mqtt_client, timeout=timeout, check_interval=0.5):
-            self.kill_middleware(middleware)
-            self.run_middleware(middleware, timeout=timeout)
+        middleware.run_fail = not self.retry_policy.run(try_run_middleware,
+                                                        on_fail=lambda: self.kill_middleware(middleware),
+                                                        label=f'Run middleware {middleware.name}')
+        return not middleware.run_fail
 
     def kill_middleware(self, middleware: SoPMiddlewareElement):
         ssh_client = self.find_ssh_client(middleware)
         pid_list = self.get_element_proc_pid(ssh_client, middleware)
 
+        kill_command_list = []
         if pid_list['middleware_pid_list']:
-            for middleware_pid in pid_list['middleware_pid_list']:
-                if middleware_pid:
-                    ssh_client.send_command(f'kill -9 {middleware_pid}')
+            kill_command_list.extend([f'kill -9 {middleware_pid}' for middleware_pid in pid_list['middleware_pid_list'] if middleware_pid])
         if pid_list['mosquitto_pid_list']:
-            for mosquitto_pid in pid_list['mosquitto_pid_list']:
-                if mosquitto_pid:
-                    ssh_client.send_command(f'kill -9 {mosquitto_pid}')
+            kill_command_list.extend([f'kill -9 {mosquitto_pid}' for mosquitto_pid in pid_list['mosquitto_pid_list'] if mosquitto_pid])
+        if kill_command_list:
+            ssh_client.send_command_batch(kill_command_list)
 
     ####  thing   #############################################################################################################
 
@@ -499,15 +563,17 @@ class SoPEventHandler:
             return False
 
     def subscribe_thing_topic(self, thing: SoPThingElement, mqtt_client: SoPMQTTClient):
+        # thing의 모든 service topic을 모아 한번에 subscribe한다.
+        topic_list = []
         for service in thing.service_list:
-            mqtt_client.subscribe([SoPProtocolType.Base.MT_EXECUTE.value % (service.name, thing.name, thing.middleware_client_name, '#'),
-                                   (SoPProtocolType.Base.MT_EXECUTE.value % (
-                                       service.name, thing.name, '', '')).rstrip('/'),
-                                   SoPProtocolType.Base.TM_RESULT_EXECUTE.value % (
+            topic_list.extend([SoPProtocolType.Base.MT_EXECUTE.value % (service.name, thing.name, thing.middleware_client_name, '#'),
+                               (SoPProtocolType.Base.MT_EXECUTE.value % (
+                                   service.name, thing.name, '', '')).rstrip('/'),
+                               SoPProtocolType.Base.TM_RESULT_EXECUTE.value % (
                 service.name, thing.name, '+', '#'),
                 (SoPProtocolType.Base.TM_RESULT_EXECUTE.value % (service.name, thing.name, '', '')).rstrip('/')])
             if thing.is_super:
-                mqtt_client.subscribe([
+                topic_list.extend([
                     SoPProtocolType.Super.MS_EXECUTE.value % (
                         service.name, thing.name, thing.middleware_client_name, '#'),
                     SoPProtocolType.Super.SM_EXECUTE.value % (
@@ -524,6 +590,7 @@ class SoPEventHandler:
                         '+', '+', '+', '#'),
                     SoPProtocolType.Super.SM_RESULT_SCHEDULE.value % (
                         service.name, thing.name, thing.middleware_client_name, '#')])
+        mqtt_client.subscribe(topic_list)
         # for value in self._value_list:
         #     mqtt_client.subscribe([SoPProtocolType.Default.TM_VALUE_PUBLISH.value % (thing.name, value['name']),
         #                                         SoPProtocolType.Default.TM_VALUE_PUBLISH_OLD.value % (thing.name, value['name'])])
@@ -535,111 +602,191 @@ class SoPEventHandler:
         ssh_client = self.find_ssh_client(thing)
         mqtt_client = self.find_mqtt_client(middleware)
 
+        if not self.wait_middleware_online(middleware):
+            SOPTEST_LOG_DEBUG(
+                f'Middleware {middleware.name} of thing {thing.name} was failed to run', SoPTestLogLevel.FAIL)
+            thing.run_fail = True
+            return False
+
         target_topic_list = [SoPProtocolType.Base.TM_REGISTER.value % thing.name,
                              SoPProtocolType.Base.TM_UNREGISTER.value % thing.name,
                              SoPProtocolType.Base.MT_RESULT_REGISTER.value % thing.name,
                              SoPProtocolType.Base.MT_RESULT_UNREGISTER.value % thing.name]
         mqtt_client.subscribe(target_topic_list)
 
-        result = ssh_client.send_command('cd ~ && pwd')
-        thing_cd_command = f'cd {os.path.dirname(thing.remote_thing_file_path)}'
-        thing_run_command = f'{thing_cd_command}; python {thing.remote_thing_file_path.replace("~", result[0])} -n {thing.name} -ip {mqtt_client.host if not thing.is_super else "localhost"} -p {mqtt_client.port} -ac {thing.alive_cycle} --retry_register > /dev/null 2>&1 & echo $!'
-        # print(thing_run_command.split('>')[0].strip())
-        result = ssh_client.send_command(thing_run_command)
-        thing.pid = result[0]
-
-        if self.check_thing_register(thing, timeout=timeout):
-            # SOPTEST_LOG_DEBUG(
-            #     f' Thing Register is complete. Thing: {thing.name}, Middleware: {middelware.name}', SoPTestLogLevel.PASS)
-            self.subscribe_thing_topic(thing, mqtt_client)
-            thing.registered = True
-            return True
-        else:
-            thing.registered = False
-            self.kill_thing(thing)
-            self.run_thing(thing, timeout=timeout)
+        def try_run_thing() -> bool:
+            remote_home_dir = ssh_client.get_remote_home_dir()
+            if self.thing_host:
+                thing.pid = self.run_thing_host(ssh_client, thing)
+                self.send_thing_host_command(ssh_client, thing,
+                                             f'RUN {thing.name} {thing.remote_thing_file_path.replace("~", remote_home_dir)} {mqtt_client.host if not thing.is_super else "localhost"} {mqtt_client.port} {thing.alive_cycle}')
+                return check_thing_register()
+
+            thing_cd_command = f'cd {os.path.dirname(thing.remote_thing_file_path)}'
+            thing_run_command = f'{thing_cd_command}; python {thing.remote_thing_runner_path().replace("~", remote_home_dir)} -f {thing.remote_thing_file_path.replace("~", remote_home_dir)} -n {thing.name} -ip {mqtt_client.host if not thing.is_super else "localhost"} -p {mqtt_client.port} -ac {thing.alive_cycle} --retry_register > /dev/null 2>&1 & echo $!'
+            # print(thing_run_command.split('>')[0].strip())
+            result = ssh_client.send_command(thing_run_command)
+            thing.pid = result[0]
+
+            return check_thing_register()
+
+        def check_thing_register() -> bool:
+            if self.check_thing_register(thing, timeout=timeout):
+                # SOPTEST_LOG_DEBUG(
+                #     f' Thing Register is complete. Thing: {thing.name}, Middleware: {middelware.name}', SoPTestLogLevel.PASS)
+                self.subscribe_thing_topic(thing, mqtt_client)
+                thing.registered = True
+                return True
+            else:
+                thing.registered = False
+                return False
+
+        thing.run_fail = not self.retry_policy.run(try_run_thing,
+                                                   on_fail=lambda: self.kill_thing(thing),
+                                                   label=f'Run thing {thing.name}')
+        return not thing.run_fail
 
     def unregister_thing(self, thing: SoPThingElement):
         SOPTEST_LOG_DEBUG(
             f'Unregister Thing {thing.name}...', SoPTestLogLevel.INFO, color='yellow')
         ssh_client = self.find_ssh_client(thing)
+        if self.thing_host:
+            self.send_thing_host_command(ssh_client, thing, f'UNREGISTER {thing.name}')
+            return
         ssh_client.send_command(f'kill -2 {thing.pid}')
 
     def kill_thing(self, thing: SoPThingElement):
         SOPTEST_LOG_DEBUG(
             f'Kill Thing {thing.name}...', SoPTestLogLevel.INFO, color='yellow')
         ssh_client = self.find_ssh_client(thing)
+        if self.thing_host:
+            self.send_thing_host_command(ssh_client, thing, f'KILL {thing.name}')
+            return
         ssh_client.send_command(f'kill -9 {thing.pid}')
 
-    ####  scenario   #############################################################################################################
+    def thing_host_path(self, thing: SoPThingElement) -> Tuple[str, str]:
+        # thing host의 control fifo와 status 파일은 thing_runner.py와 같은 폴더에 위치한다.
+        thing_root_path = os.path.dirname(thing.remote_thing_runner_path())
+        return os.path.join(thing_root_path, 'thing_host.fifo'), os.path.join(thing_root_path, 'thing_host_status.json')
+
+    def run_thing_host(self, ssh_client: SoPSSHClient, thing: SoPThingElement) -> str:
+        # device의 thing root 경로별로 thing host를 한번만 실행한다.
+        thing_root_path = os.path.dirname(thing.remote_thing_runner_path())
+        with self.thing_host_lock:
+            thing_host_key = (id(ssh_client), thing_root_path)
+            if thing_host_key in self.thing_host_table:
+                return self.thing_host_table[thing_host_key]
+
+            fifo_path, status_path = self.thing_host_path(thing)
+            # batch의 각 command는 subshell에서 실행되므로 cd는 thing host를 실행하는 command와 함께 보낸다.
+            result = ssh_client.send_command_batch([f'rm -f {fifo_path} && mkfifo {fifo_path}',
+                                                    f'cd {thing_root_path} && python {thing.remote_thing_runner_path()} --host_mode --fifo {fifo_path} --status {status_path} > /dev/null 2>&1 & echo $!'],
+                                                   stop_on_error=True)
+            if not result[-1].success():
+                raise Exception(f'Failed to run thing host on {ssh_client.device.host}')
+
+            pid = result[-1].output[0]
+            self.thing_host_table[thing_host_key] = pid
+            SOPTEST_LOG_DEBUG(
+                f'Thing host is running on {ssh_client.device.host} (pid: {pid})', SoPTestLogLevel.PASS)
+            return pid
 
-    def refresh(self, timeout: float, service_check: bool = False, scenario_check: bool = False):
+    def send_thing_host_command(self, ssh_client: SoPSSHClient, thing: SoPThingElement, command: str) -> bool:
+        fifo_path, _ = self.thing_host_path(thing)
+        # thing host가 죽어 fifo를 읽는 쪽이 없으면 write가 block되므로 timeout을 둔다.
+        result = ssh_client.send_command_batch([f'timeout 5 sh -c \'echo "{command}" > {fifo_path}\''])
+        return result[0].success()
 
-        def task(middleware: SoPMiddlewareElement):
-            SOPTEST_LOG_DEBUG(
-                f'Refresh Start... middleware: {middleware.name}', SoPTestLogLevel.INFO)
+    def get_thing_host_status(self, timeout: float = 3) -> List[dict]:
+        thing_host_status_list = []
+        for thing in self.thing_list:
+            ssh_client = self.find_ssh_client(thing)
+            thing_host_key = (id(ssh_client), os.path.dirname(thing.remote_thing_runner_path()))
+            if thing_host_key not in self.thing_host_table or any([status['key'] == thing_host_key for status in thing_host_status_list]):
+                continue
 
-            if service_check:
-                whole_service_info = self.get_whole_service_list_info(
-                    middleware, timeout=timeout)
-                if whole_service_info is False:
-                    return False
-            if scenario_check:
-                whole_scenario_info_list: List[SoPScenarioInfo] = self.get_whole_scenario_info(
-                    middleware, timeout=timeout)
-                if whole_scenario_info_list is False:
-                    return False
+            fifo_path, status_path = self.thing_host_path(thing)
+            result = ssh_client.send_command_batch([f'rm -f {status_path}',
+                                                    f'timeout 5 sh -c \'echo "STATUS" > {fifo_path}\'',
+                                                    f'for i in $(seq {int(timeout * 10)}); do [ -f {status_path} ] && break; sleep 0.1; done; cat {status_path}'])
+            try:
+                thing_host_status = json.loads(''.join(result[-1].output))
+            except (ValueError, IndexError):
+                continue
+            thing_host_status_list.append(dict(key=thing_host_key, host=ssh_client.device.host, **thing_host_status))
 
+        return thing_host_status_list
+
+    ####  scenario   #############################################################################################################
+
+    def refresh(self, timeout: float, service_check: bool = False, scenario_check: bool = False):
+
+        def on_refresh_result(middleware: SoPMiddlewareElement, whole_service_info: List[dict], whole_scenario_info_list: List[SoPScenarioInfo]):
             # scenario service validation check
-            whole_service_name_info = [service['name']
-                                       for service in whole_service_info]
-            for scenario in middleware.scenario_list:
-                target_scenario_service_name_list = [
-                    service.name for service in scenario.service_list]
+            if service_check:
+                whole_service_name_info = [service['name']
+                                           for service in whole_service_info]
+                for scenario in middleware.scenario_list:
+                    target_scenario_service_name_list = [
+                        service.name for service in scenario.service_list]
 
-                if set(target_scenario_service_name_list).issubset(set(whole_service_name_info)):
-                    for thing in middleware.thing_list:
-                        thing: SoPThingElement
-                        mqtt_client = self.find_mqtt_client(middleware)
-                        self.subscribe_thing_topic(thing, mqtt_client)
-                        thing.registered = True
+                    if set(target_scenario_service_name_list).issubset(set(whole_service_name_info)):
+                        for thing in middleware.thing_list:
+                            thing: SoPThingElement
+                            mqtt_client = self.find_mqtt_client(middleware)
+                            self.subscribe_thing_topic(thing, mqtt_client)
+                            thing.registered = True
 
-                    scenario.service_check = True
-                else:
-                    SOPTEST_LOG_DEBUG(
-                        f'Service check Fail... level: {middleware.level}, middleware: {middleware.name}, scenario: {scenario.name}', SoPTestLogLevel.WARN)
-                    # scenario.service_check = False
+                        scenario.service_check = True
+                    else:
+                        SOPTEST_LOG_DEBUG(
+                            f'Service check Fail... level: {middleware.level}, middleware: {middleware.name}, scenario: {scenario.name}', SoPTestLogLevel.WARN)
+                        # scenario.service_check = False
 
             # scenario add check
-            for scenario in middleware.scenario_list:
-                for scenario_info in whole_scenario_info_list:
-                    scenario_info: SoPScenarioInfo
-                    if scenario.name == scenario_info.name:
-                        scenario.schedule_success = True
-                        scenario.schedule_timeout = False
-                        scenario.state = scenario_info.state
-                        break
-                else:
-                    SOPTEST_LOG_DEBUG(
-                        f'Scenario {scenario.name} is not in scenario list of {middleware.name}...', SoPTestLogLevel.WARN)
+            if scenario_check:
+                for scenario in middleware.scenario_list:
+                    for scenario_info in whole_scenario_info_list:
+                        scenario_info: SoPScenarioInfo
+                        if scenario.name == scenario_info.name:
+                            scenario.schedule_success = True
+                            scenario.schedule_timeout = False
+                            scenario.state = scenario_info.state
+                            break
+                    else:
+                        SOPTEST_LOG_DEBUG(
+                            f'Scenario {scenario.name} is not in scenario list of {middleware.name}...', SoPTestLogLevel.WARN)
 
             SOPTEST_LOG_DEBUG(
-                f'Refresh Success! middleware: {middleware.name}', SoPTestLogLevel.INFO)
+                f'Refresh Success! middleware: {middleware.name}, latency: {self.refresh_latency_table[middleware.name]:0.4f}', SoPTestLogLevel.INFO)
 
-        pool_map(task, self.middleware_list)
+        SOPTEST_LOG_DEBUG(
+            f'Refresh Start... middleware: {len(self.middleware_list)}', SoPTestLogLevel.INFO)
+        self.request_whole_info(self.middleware_list, timeout=timeout, service_check=service_check,
+                                scenario_check=scenario_check, callback=on_refresh_result)
+
+        refresh_latency = latency_summary(list(self.refresh_latency_table.values()))
+        SOPTEST_LOG_DEBUG(
+            f'Refresh latency. avg: {refresh_latency["avg"]:0.4f}, p99: {refresh_latency["p99"]:0.4f}, max: {refresh_latency["max"]:0.4f}, middleware: {refresh_latency["count"]}', SoPTestLogLevel.INFO)
 
         return True
 
     def thing_register_wait(self):
-        while not all([thing.registered for thing in self.thing_list]):
+        # 재시도 후에도 실패한 thing은 기다리지 않는다.
+        while not all([thing.registered or thing.run_fail for thing in self.thing_list]):
             time.sleep(THREAD_TIME_OUT)
+        fail_thing_list = [thing for thing in self.thing_list if thing.run_fail and not thing.registered]
+        if fail_thing_list:
+            SOPTEST_LOG_DEBUG(
+                f'{len(fail_thing_list)} thing was failed to register: {", ".join([thing.name for thing in fail_thing_list])}', SoPTestLogLevel.FAIL)
         SOPTEST_LOG_DEBUG(
             f'All thing register is complete!...', SoPTestLogLevel.INFO)
 
         return True
 
     def scenario_add_check(self, timeout: float):
-        while not all([scenario.schedule_success for scenario in self.scenario_list]):
+        # 실행에 실패한 middleware의 scenario는 기다리지 않는다.
+        while not all([scenario.schedule_success or self.find_element_middleware(scenario).run_fail for scenario in self.scenario_list]):
             time.sleep(THREAD_TIME_OUT)
         SOPTEST_LOG_DEBUG(
             f'All scenario Add is complete!...', SoPTestLogLevel.INFO)
@@ -647,12 +794,8 @@ class SoPEventHandler:
         return True
 
     def scenario_run_check(self, timeout: float):
-        for middleware in self.middleware_list:
-            whole_scenario_info_list: List[SoPScenarioInfo] = self.get_whole_scenario_info(
-                middleware, timeout=timeout)
-            if whole_scenario_info_list is False:
-                return False
 
+        def on_scenario_run_check_result(middleware: SoPMiddlewareElement, whole_service_info: List[dict], whole_scenario_info_list: List[SoPScenarioInfo]):
             # scenario run check
             for scenario in middleware.scenario_list:
                 for scenario_info in whole_scenario_info_list:
@@ -672,7 +815,8 @@ class SoPEventHandler:
             SOPTEST_LOG_DEBUG(
                 f'Scenario Run Check Success! middleware: {middleware.name}', SoPTestLogLevel.PASS)
 
-        return True
+        return self.request_whole_info(self.middleware_list, timeout=timeout, scenario_check=True,
+                                       callback=on_scenario_run_check_result)
 
     def verify_scenario(self, scenario: SoPScenarioElement, timeout: float = 5):
         middleware = self.find_element_middleware(scenario)
@@ -858,6 +1002,98 @@ class SoPEventHandler:
                 f'{SoPElementType.SCENARIO.value} {scenario.name} {SoPElementActionType.SCENARIO_DELETE.value} failed...', SoPTestLogLevel.FAIL)
         return self
 
+    def send_whole_info_request(self, middleware: SoPMiddlewareElement, target_protocol: SoPProtocolType, request_name: str) -> Future:
+        mqtt_client = self.find_mqtt_client(middleware)
+        if not mqtt_client.is_run:
+            mqtt_client.run()
+
+        client_id = f'{mqtt_client.get_client_id()}_{request_name}@{middleware.name}'
+        target_topic = target_protocol.value % client_id
+        mqtt_client.subscribe(target_topic)
+        # 응답을 놓치지 않도록 publish 전에 future를 등록한다.
+        future = self.expect_table.expect(middleware, target_topic)
+        mqtt_client.publish(SoPProtocolType.WebClient.EM_REFRESH.value % client_id, '{}', retain=False)
+
+        return future
+
+    def request_whole_info(self, middleware_list: List[SoPMiddlewareElement], timeout: float, service_check: bool = False, scenario_check: bool = False,
+                           callback: Callable[[SoPMiddlewareElement, List[dict], List[SoPScenarioInfo]], Any] = None) -> bool:
+        # 모든 middleware에 service list, scenario list 요청을 한번에 보내고, 하나의 deadline 안에서 도착하는 순서대로 응답을 처리한다.
+        # 한 middleware의 응답이 모두 도착하면 callback(middleware, whole_service_info, whole_scenario_info_list)을 호출한다.
+        start_time = get_current_time()
+        deadline = start_time + timeout
+
+        future_table: Dict[Future, Tuple[SoPMiddlewareElement, str]] = {}
+        result_table: Dict[int, Dict[str, list]] = {}
+        request_num = int(service_check) + int(scenario_check)
+        for middleware in middleware_list:
+            result_table[id(middleware)] = {}
+            if service_check:
+                future = self.send_whole_info_request(
+                    middleware, SoPProtocolType.WebClient.ME_RESULT_SERVICE_LIST, 'get_whole_service_list_info')
+                future_table[future] = (middleware, 'service')
+            if scenario_check:
+                future = self.send_whole_info_request(
+                    middleware, SoPProtocolType.WebClient.ME_RESULT_SCENARIO_LIST, 'get_whole_scenario_info')
+                future_table[future] = (middleware, 'scenario')
+
+        success = True
+        try:
+            for future in as_completed(list(future_table.keys()), timeout=max(deadline - get_current_time(), 0)):
+                middleware, request_type = future_table[future]
+                if future.cancelled():
+                    continue
+
+                _, payload, _ = decode_MQTT_message(future.result())
+                if request_type == 'service':
+                    whole_info = self.parse_whole_service_list_info(payload)
+                else:
+                    whole_info = self.parse_whole_scenario_info(payload)
+                if whole_info is False:
+                    SOPTEST_LOG_DEBUG(
+                        f'Get whole {request_type} info of {middleware.name} failed -> invalid payload...', SoPTestLogLevel.FAIL)
+                    success = False
+                    continue
+
+                result = result_table[id(middleware)]
+                result[request_type] = whole_info
+                if len(result) == request_num:
+                    self.refresh_latency_table[middleware.name] = get_current_time() - start_time
+                    if callback:
+                        callback(middleware, result.get('service', []), result.get('scenario', []))
+        except FutureTimeoutError:
+            for future, (middleware, request_type) in future_table.items():
+                if not future.done():
+                    self.expect_table.cancel(middleware, future)
+                    SOPTEST_LOG_DEBUG(
+                        f'Get whole {request_type} info of {middleware.name} failed -> MQTT timeout...', SoPTestLogLevel.FAIL)
+            success = False
+
+        return success
+
+    def parse_whole_scenario_info(self, payload: dict) -> Union[List[SoPScenarioInfo], bool]:
+        if not isinstance(payload, dict):
+            return False
+
+        return [SoPScenarioInfo(id=scenario_info['id'],
+                                name=scenario_info['name'],
+                                state=SoPScenarioState.get(
+                                    scenario_info['state']),
+                                code=scenario_info['contents'],
+                                schedule_info=scenario_info['scheduleInfo']) for scenario_info in payload['scenarios']]
+
+    def parse_whole_service_list_info(self, payload: dict) -> Union[List[dict], bool]:
+        if not isinstance(payload, dict):
+            return False
+
+        whole_service_info = []
+        for service in payload['services']:
+            if service['hierarchy'] == 'local' or service['hierarchy'] == 'parent':
+                for thing in service['things']:
+                    for service in thing['functions']:
+                        whole_service_info.append(service)
+        return whole_service_info
+
     def get_whole_scenario_info(self, middleware: SoPMiddlewareElement, timeout: float) -> Union[List[SoPScenarioInfo], bool]:
         mqtt_client = self.find_mqtt_client(middleware)
 
@@ -871,12 +1107,7 @@ class SoPEventHandler:
             timeout=timeout)
 
         if payload is not None:
-            return [SoPScenarioInfo(id=scenario_info['id'],
-                                    name=scenario_info['name'],
-                                    state=SoPScenarioState.get(
-                                        scenario_info['state']),
-                                    code=scenario_info['contents'],
-                                    schedule_info=scenario_info['scheduleInfo']) for scenario_info in payload['scenarios']]
+            return self.parse_whole_scenario_info(payload)
         else:
             SOPTEST_LOG_DEBUG(
                 f'Get whole scenario info of {middleware.name} failed -> MQTT timeout...', SoPTestLogLevel.FAIL)
@@ -895,13 +1126,7 @@ class SoPEventHandler:
             timeout=timeout)
 
         if payload is not None:
-            whole_service_info = []
-            for service in payload['services']:
-                if service['hierarchy'] == 'local' or service['hierarchy'] == 'parent':
-                    for thing in service['things']:
-                        for service in thing['functions']:
-                            whole_service_info.append(service)
-            return whole_service_info
+            return self.parse_whole_service_list_info(payload)
         else:
             SOPTEST_LOG_DEBUG(
                 f'Get whole service list info of {middleware.name} failed -> MQTT timeout...', SoPTestLogLevel.FAIL)
@@ -909,21 +1134,29 @@ class SoPEventHandler:
 
     #### kill ##########################################################################################################################
 
-    def get_proc_pid(self, ssh_client: SoPSSHClient, proc_name: str, port: int = None) -> Union[List[int], bool]:
-        result: List[str] = ssh_client.send_command(
-            f"lsof -i :{port} | grep {proc_name[:9]}")
-        pid_list = list(set([line.split()[1] for line in result]))
+    def get_proc_pid_command(self, proc_name: str, port: int = None) -> str:
+        return f"lsof -i :{port} | grep {proc_name[:9]}"
+
+    def parse_proc_pid(self, result: List[str]) -> Union[List[int], bool]:
+        pid_list = list(set([line.split()[1] for line in result if line.strip()]))
         if len(pid_list) == 0:
             return False
         elif len(pid_list) == 1:
             return pid_list
 
+    def get_proc_pid(self, ssh_client: SoPSSHClient, proc_name: str, port: int = None) -> Union[List[int], bool]:
+        result: List[str] = ssh_client.send_command(
+            self.get_proc_pid_command(proc_name, port))
+        return self.parse_proc_pid(result)
+
     def get_element_proc_pid(self, ssh_client: SoPSSHClient, element: SoPElement) -> List[int]:
         if isinstance(element, SoPMiddlewareElement):
-            middleware_pid_list = self.get_proc_pid(
-                ssh_client, 'sopiot_middleware', element.mqtt_port)
-            mosquitto_pid_list = self.get_proc_pid(
-                ssh_client, 'mosquitto', element.mqtt_port)
+            # middleware와 mosquitto의 pid를 한번의 batch로 조회한다.
+            middleware_pid_result, mosquitto_pid_result = ssh_client.send_command_batch([
+                self.get_proc_pid_command('sopiot_middleware', element.mqtt_port),
+                self.get_proc_pid_command('mosquitto', element.mqtt_port)])
+            middleware_pid_list = self.parse_proc_pid(middleware_pid_result.output)
+            mosquitto_pid_list = self.parse_proc_pid(mosquitto_pid_result.output)
             return dict(middleware_pid_list=middleware_pid_list, mosquitto_pid_list=mosquitto_pid_list)
         elif isinstance(element, SoPThingElement):
             middleware = self.find_element_middleware(element)
@@ -936,8 +1169,8 @@ class SoPEventHandler:
                           SoPTestLogLevel.INFO, 'red')
         for middleware in self.middleware_list:
             ssh_client = self.find_ssh_client(middleware)
-            ssh_client.send_command('pidof sopiot_middleware | xargs kill -9')
-            ssh_client.send_command('pidof mosquitto | xargs kill -9')
+            ssh_client.send_command_batch(['pidof sopiot_middleware | xargs kill -9',
+                                           'pidof mosquitto | xargs kill -9'])
 
     def kill_all_thing(self):
         SOPTEST_LOG_DEBUG(f'Kill all python instance...',
@@ -947,18 +1180,20 @@ class SoPEventHandler:
 
         for ssh_client in self.ssh_client_list:
             result = ssh_client.send_command(
-                f"ps -ef | grep python | grep _thing_ | grep -v grep | awk '{{print $2}}'")
+                f"ps -ef | grep python | grep -e _thing_ -e {THING_RUNNER_FILE_NAME} | grep -v grep | awk '{{print $2}}'")
 
-            for pid in result:
-                if pid == self_pid:
-                    continue
-                result = ssh_client.send_command(f'kill -9 {pid}')
+            kill_command_list = [f'kill -9 {pid}' for pid in result if pid and pid != str(self_pid)]
+            if kill_command_list:
+                ssh_client.send_command_batch(kill_command_list)
+
+        self.thing_host_table.clear()
 
     def kill_all_ssh_client(self):
         SOPTEST_LOG_DEBUG(f'Kill all ssh client...',
                           SoPTestLogLevel.INFO, 'red')
         for ssh_client in self.ssh_client_list:
             ssh_client.disconnect()
+            self.element_registry.remove_ssh_client(ssh_client)
             del ssh_client
 
     def kill_all_mqtt_client(self):
@@ -966,6 +1201,7 @@ class SoPEventHandler:
                           SoPTestLogLevel.INFO, 'red')
         for mqtt_client in self.mqtt_client_list:
             mqtt_client.stop()
+            self.element_registry.remove_mqtt_client(mqtt_client)
             del mqtt_client
 
     def kill_all_simulation_instance(self):
@@ -977,6 +1213,8 @@ class SoPEventHandler:
         self.kill_all_thing()
 
     def wrapup(self):
+        self.event_scheduler.stop()
+        self.expect_table.cancel_all()
         self.kill_all_ssh_client()
         self.kill_all_mqtt_client()
 
@@ -984,35 +1222,30 @@ class SoPEventHandler:
         pass  # 아무 작업도 하지 않음
 
     def remove_all_remote_simulation_file(self):
-        finished_ssh_client_list = []
+        # device별로 삭제할 경로를 모아 한번의 batch로 삭제한다.
+        remove_path_table: Dict[int, Tuple[SoPSSHClient, List[str]]] = {}
+
         for middleware in self.middleware_list:
             ssh_client = self.find_ssh_client(middleware)
-            remote_home_dir = ssh_client.send_command('cd ~ && pwd')[0]
-            if ssh_client in finished_ssh_client_list:
-                continue
-            ssh_client.send_command(
-                f'rm -r {middleware.remote_middleware_config_path}')
-            ssh_client.send_command(
-                f'rm -r {middleware.remote_middleware_config_path}')
-            ssh_client.send_command(
-                f'rm -r {remote_home_dir}/simulation_log')
-            finished_ssh_client_list.append(ssh_client)
-
-        finished_ssh_client_list = []
+            remote_home_dir = ssh_client.get_remote_home_dir()
+            _, remove_path_list = remove_path_table.setdefault(id(ssh_client), (ssh_client, []))
+            remove_path_list.extend([middleware.remote_middleware_config_path,
+                                     f'{remote_home_dir}/simulation_log'])
+
         for thing in self.thing_list:
             ssh_client = self.find_ssh_client(thing)
-            if ssh_client in finished_ssh_client_list:
-                continue
-            ssh_client.send_command(
-                f'rm -r {os.path.dirname(thing.remote_thing_file_path)}')
-            ssh_client.send_command(
-                f'rm -r {os.path.dirname(os.path.dirname(thing.remote_thing_file_path))}')
-            finished_ssh_client_list.append(ssh_client)
+            _, remove_path_list = remove_path_table.setdefault(id(ssh_client), (ssh_client, []))
+            remove_path_list.extend([os.path.dirname(thing.remote_thing_file_path),
+                                     os.path.dirname(os.path.dirname(thing.remote_thing_file_path))])
+
+        for ssh_client, remove_path_list in remove_path_table.values():
+            ssh_client.send_command_batch(
+                [f'rm -r {remove_path}' for remove_path in dict.fromkeys(remove_path_list)])
 
     #### expect ##########################################################################################################################
 
-    def expect(self, element: SoPElement, target_topic: str = None, auto_subscribe: bool = True, auto_unsubscribe: bool = False, timeout: int = 5) -> Union[Tuple[str, dict], str]:
-        cur_time = get_current_time()
+    def expect(self, element: SoPElement, target_topic: str = None, auto_subscribe: bool = True, auto_unsubscribe: bool = False, timeout: int = 5,
+               future: Future = None) -> Union[Tuple[str, dict], str]:
         if isinstance(element, SoPMiddlewareElement):
             target_middleware = element
         else:
@@ -1029,26 +1262,16 @@ class SoPEventHandler:
             if auto_subscribe:
                 mqtt_client.subscribe(target_topic)
 
-            while True:
-                if get_current_time() - cur_time > timeout:
-                    raise Empty('Timeout')
+            # 메시지를 보내기 전에 future를 미리 등록한 경우 (publish_and_expect, command_and_expect) 그 future를 기다린다.
+            if not future:
+                future = self.expect_table.expect(element, target_topic)
 
-                topic, payload, timestamp = decode_MQTT_message(
-                    element.recv_queue.get(timeout=timeout))
-
-                if target_topic:
-                    topic_slice = topic.split('/')
-                    target_topic_slice = target_topic.split('/')
-                    for i in range(len(target_topic_slice)):
-                        if target_topic_slice[i] not in ['#', '+'] and target_topic_slice[i] != topic_slice[i]:
-                            break
-                    else:
-                        return topic, payload, timestamp
-                else:
-                    element.recv_queue.put(
-                        encode_MQTT_message(topic, payload, timestamp))
-        except Empty as e:
+            return decode_MQTT_message(future.result(timeout=timeout))
+        except (FutureTimeoutError, CancelledError) as e:
             # SOPLOG_DEBUG(f'SoPMQTTClient Timeout for {target_topic}', 'red')
+            if not self.expect_table.cancel(element, future) and future.done() and not future.cancelled():
+                # timeout과 동시에 메시지가 도착한 경우
+                return decode_MQTT_message(future.result())
             return None, None, None
         except Exception as e:
             raise e
@@ -1071,12 +1294,13 @@ class SoPEventHandler:
 
         if auto_subscribe:
             mqtt_client.subscribe(target_topic)
+        future = self.expect_table.expect(element, target_topic)
         trigger_topic, trigger_payload, timestamp = decode_MQTT_message(
             trigger_msg, mode=str)
         mqtt_client.publish(trigger_topic, trigger_payload, retain=False)
 
         ret = self.expect(element, target_topic,
-                          auto_subscribe, auto_unsubscribe, timeout)
+                          False, auto_unsubscribe, timeout, future=future)
         return ret
 
     def command_and_expect(self, element: SoPElement, trigger_command: Union[List[str], str] = None, target_topic: str = None,
@@ -1095,13 +1319,14 @@ class SoPEventHandler:
 
         if auto_subscribe:
             mqtt_client.subscribe(target_topic)
+        future = self.expect_table.expect(element, target_topic)
         if isinstance(trigger_command, list):
             for command in trigger_command:
                 ssh_client.send_command(command)
         else:
             ssh_client.send_command(trigger_command)
         ret = self.expect(element, target_topic,
-                          auto_subscribe, auto_unsubscribe, timeout)
+                          False, auto_unsubscribe, timeout, future=future)
         return ret
 
     def check_middleware_online(self, thing: SoPThingElement):
@@ -1110,450 +1335,530 @@ class SoPEventHandler:
 
     #### on_recv_message ##########################################################################################################################
 
-    def on_recv_message(self, msg: mqtt.MQTTMessage):
+    # NOTE: 등록 순서는 기존 if/elif chain의 순서를 따른다. 같은 prefix를 가지는 경우 먼저 등록된 handler가 사용된다.
+    TOPIC_HANDLER_TABLE: List[Tuple[Union[SoPProtocolType, str], str]] = [
+        (SoPProtocolType.WebClient.ME_RESULT_SCENARIO_LIST, 'on_recv_scenario_list_result'),
+        (SoPProtocolType.WebClient.ME_RESULT_SERVICE_LIST, 'on_recv_service_list_result'),
+        (SoPProtocolType.Base.TM_REGISTER, 'on_recv_thing_register'),
+        (SoPProtocolType.Base.MT_RESULT_REGISTER, 'on_recv_thing_register_result'),
+        (SoPProtocolType.Base.TM_UNREGISTER, 'on_recv_thing_unregister'),
+        (SoPProtocolType.Base.MT_RESULT_UNREGISTER, 'on_recv_thing_unregister_result'),
+        (SoPProtocolType.Base.MT_EXECUTE, 'on_recv_function_execute'),
+        (SoPProtocolType.Base.TM_RESULT_EXECUTE, 'on_recv_function_execute_result'),
+        (SoPProtocolType.WebClient.EM_VERIFY_SCENARIO, 'on_recv_scenario_verify'),
+        (SoPProtocolType.WebClient.ME_RESULT_VERIFY_SCENARIO, 'on_recv_scenario_verify_result'),
+        (SoPProtocolType.WebClient.EM_ADD_SCENARIO, 'on_recv_scenario_add'),
+        (SoPProtocolType.WebClient.ME_RESULT_ADD_SCENARIO, 'on_recv_scenario_add_result'),
+        (SoPProtocolType.WebClient.EM_RUN_SCENARIO, 'on_recv_scenario_run'),
+        (SoPProtocolType.WebClient.ME_RESULT_RUN_SCENARIO, 'on_recv_scenario_run_result'),
+        (SoPProtocolType.WebClient.EM_STOP_SCENARIO, 'on_recv_scenario_stop'),
+        (SoPProtocolType.WebClient.ME_RESULT_STOP_SCENARIO, 'on_recv_scenario_stop_result'),
+        (SoPProtocolType.WebClient.EM_UPDATE_SCENARIO, 'on_recv_scenario_update'),
+        (SoPProtocolType.WebClient.ME_RESULT_UPDATE_SCENARIO, 'on_recv_scenario_update_result'),
+        (SoPProtocolType.WebClient.EM_DELETE_SCENARIO, 'on_recv_scenario_delete'),
+        (SoPProtocolType.WebClient.ME_RESULT_DELETE_SCENARIO, 'on_recv_scenario_delete_result'),
+        (SoPProtocolType.Super.MS_SCHEDULE, 'on_recv_super_schedule'),
+        (SoPProtocolType.Super.SM_SCHEDULE, 'on_recv_sub_schedule'),
+        (SoPProtocolType.Super.MS_RESULT_SCHEDULE, 'on_recv_sub_schedule_result'),
+        (SoPProtocolType.Super.SM_RESULT_SCHEDULE, 'on_recv_super_schedule_result'),
+        (SoPProtocolType.Super.MS_EXECUTE, 'on_recv_super_execute'),
+        (SoPProtocolType.Super.SM_EXECUTE, 'on_recv_sub_execute'),
+        (SoPProtocolType.Super.MS_RESULT_EXECUTE, 'on_recv_sub_execute_result'),
+        (SoPProtocolType.Super.SM_RESULT_EXECUTE, 'on_recv_super_execute_result'),
+        ('SIM/FINISH', 'on_recv_simulation_finish'),
+    ]
+
+    def add_event(self, event: SoPEvent):
+        self.event_log.append(event)
+        if self.online_evaluator:
+            self.online_evaluator.on_event_add(event)
+
+    def finish_event(self, event: SoPEvent, prev_duration: float):
+        if self.online_evaluator:
+            self.online_evaluator.on_event_finish(event, prev_duration)
+
+    def init_topic_router(self) -> SoPTopicRouter:
+        topic_router = SoPTopicRouter()
+        for protocol, handler_name in self.TOPIC_HANDLER_TABLE:
+            topic_router.register(protocol, getattr(self, handler_name))
+
+        return topic_router
+
+    def get_listener_lag(self) -> dict:
+        return self.listener_lag_stat.summary()
+
+    def on_recv_message(self, msg: mqtt.MQTTMessage, recv_time: float = None):
         topic, payload, timestamp = decode_MQTT_message(msg)
-        timestamp = get_current_time() - self.simulation_start_time
 
-        return_type = SoPType.get(payload.get('return_type', None))
-        return_value = payload.get('return_value', None)
-        error_type = SoPErrorType.get(payload.get('error', None))
+        # recv_time은 _on_message에서 기록한 monotonic clock 값이다.
+        # wall clock 기준의 수신 시각은 현재 시각에서 listener lag만큼 뺀 값으로 계산한다.
+        dispatch_time = time.perf_counter()
+        listener_lag = dispatch_time - recv_time if recv_time is not None else 0
+        self.listener_lag_stat.add(listener_lag)
+        timestamp = get_current_time() - listener_lag - self.simulation_start_time
+
+        topic_list = topic.split('/')
+        handler = self.topic_router.route(topic_list)
+        if not handler:
+            raise Exception(f'Unknown topic: {topic}')
+
+        return handler(msg, topic_list, payload, timestamp)
+
+        # elif SoPProtocolType.Default.TM_VALUE_PUBLISH.get_prefix() in topic:
+        #     pass
+        # elif SoPProtocolType.Default.TM_VALUE_PUBLISH_OLD.get_prefix() in topic:
+        #     pass
 
+    def get_payload_scenario_name(self, payload: dict) -> str:
         # FIXME: change it to 'scenario' after middleware updated
         scenario_name = payload.get('name', None)
         scenario_name = payload.get(
             'scenario', None) if not scenario_name else scenario_name
+        return scenario_name
 
-        if SoPProtocolType.WebClient.ME_RESULT_SCENARIO_LIST.get_prefix() in topic:
-            client_id = topic.split('/')[3]
-
-            if 'get_whole_scenario_info' in client_id:
-                middleware_name = client_id.split('@')[1]
-
-                middleware = self.find_middleware(middleware_name)
-                middleware.recv_queue.put(msg)
-        elif SoPProtocolType.WebClient.ME_RESULT_SERVICE_LIST.get_prefix() in topic:
-            client_id = topic.split('/')[3]
-
-            if 'get_whole_service_list_info' in client_id:
-                middleware_name = client_id.split('@')[1]
-
-                middleware = self.find_middleware(middleware_name)
-                middleware.recv_queue.put(msg)
-            elif 'check_online' in client_id:
-                middleware_name = client_id.split('@')[1]
-
-                middleware = self.find_middleware(middleware_name)
-                middleware.recv_queue.put(msg)
-        elif SoPProtocolType.Base.TM_REGISTER.get_prefix() in topic:
-            thing_name = topic.split('/')[2]
-
-            thing = self.find_thing(thing_name)
-            middleware = self.find_element_middleware(thing)
-            thing.recv_queue.put(msg)
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.THING_REGISTER, middleware_element=middleware, thing_element=thing, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.Base.MT_RESULT_REGISTER.get_prefix() in topic:
-            thing_name = topic.split('/')[3]
-
-            thing = self.find_thing(thing_name)
-            middleware = self.find_element_middleware(thing)
-            thing.registered = True
-            thing.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.thing_element == thing and event.event_type == SoPEventType.THING_REGISTER:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-
-                    progress = [thing.registered for thing in self.thing_list].count(
-                        True) / len(self.thing_list)
-                    color = 'red' if event.error == SoPErrorType.FAIL else 'green'
-                    SOPTEST_LOG_DEBUG(
-                        f'[REGISTER] thing: {thing_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO, progress=progress, color=color)
-                    break
-        elif SoPProtocolType.Base.TM_UNREGISTER.get_prefix() in topic:
-            thing_name = topic.split('/')[2]
-
-            thing = self.find_thing(thing_name)
-            middleware = self.find_element_middleware(thing)
-            thing.recv_queue.put(msg)
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.THING_UNREGISTER, middleware_element=middleware, thing_element=thing, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.Base.MT_RESULT_UNREGISTER.get_prefix() in topic:
-            thing_name = topic.split('/')[3]
-
-            thing = self.find_thing(thing_name)
-            middleware = self.find_element_middleware(thing)
-            thing.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.thing_element == thing and event.event_type == SoPEventType.THING_UNREGISTER:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    SOPTEST_LOG_DEBUG(
-                        f'[UNREGISTER] thing: {thing_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
-                    break
-        elif SoPProtocolType.Base.MT_EXECUTE.get_prefix() in topic:
-            function_name = topic.split('/')[2]
-            thing_name = topic.split('/')[3]
-
-            thing = self.find_thing(thing_name)
-            middleware = self.find_element_middleware(thing)
-            scenario = self.find_scenario(scenario_name)
-            service = thing.find_service_by_name(function_name)
-
-            if len(topic.split('/')) > 4:
-                # middleware_name = topic.split('/')[4]
-                # Request_ID = RequesterMiddlewareName_SuperThing@SuperFunction@SubrequestOrder
-                request_ID = topic.split('/')[5]
-
-                requester_middleware_name = request_ID.split('@')[0]
-                super_thing_name = request_ID.split('@')[1]
-                super_function_name = request_ID.split('@')[2]
-                # subrequest_order = request_ID.split('@')[3]
-            else:
-                super_thing_name = None
-                super_function_name = None
-                requester_middleware_name = None
+    def on_recv_scenario_list_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        client_id = topic_list[3]
 
-            if requester_middleware_name is not None:
-                event_type = SoPEventType.SUB_FUNCTION_EXECUTE
-            else:
-                event_type = SoPEventType.FUNCTION_EXECUTE
-            self.event_log.append(SoPEvent(
-                event_type=event_type, middleware_element=middleware, thing_element=thing, service_element=service, scenario_element=scenario,
-                timestamp=timestamp, duration=0, requester_middleware_name=requester_middleware_name, super_thing_name=super_thing_name, super_function_name=super_function_name))
-        elif SoPProtocolType.Base.TM_RESULT_EXECUTE.get_prefix() in topic:
-            function_name = topic.split('/')[3]
-            thing_name = topic.split('/')[4]
-
-            thing = self.find_thing(thing_name)
-            middleware = self.find_element_middleware(thing)
-            scenario = self.find_scenario(scenario_name)
-            service = thing.find_service_by_name(function_name)
-
-            if len(topic.split('/')) > 5:
-                # middleware_name = topic.split('/')[5]
-                request_ID = topic.split('/')[6]
-
-                requester_middleware_name = request_ID.split('@')[0]
-                super_thing_name = request_ID.split('@')[1]
-                super_function_name = request_ID.split('@')[2]
-                # subrequest_order = request_ID.split('@')[3]
-            else:
-                super_thing_name = None
-                super_function_name = None
-                requester_middleware_name = None
-
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.thing_element == thing and event.service_element == service and event.scenario_element == scenario and event.requester_middleware_name == requester_middleware_name and event.event_type in [SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE]:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    event.return_type = return_type
-                    event.return_value = return_value
-                    event.requester_middleware_name = requester_middleware_name
-
-                    passed_time = get_current_time() - self.simulation_start_time
-                    progress = passed_time / self.running_time
-
-                    if event.event_type == SoPEventType.SUB_FUNCTION_EXECUTE:
-                        color = 'light_magenta' if event.error == SoPErrorType.FAIL else 'light_cyan'
-                        SOPTEST_LOG_DEBUG(
-                            f'[EXECUTE_SUB] thing: {thing_name} function: {function_name} scenario: {scenario_name} requester_middleware_name: {requester_middleware_name} duration: {event.duration:0.4f} return value: {return_value} - {return_type.value} error:{event.error.value}', SoPTestLogLevel.PASS, progress=progress, color=color)
-                    elif event.event_type == SoPEventType.FUNCTION_EXECUTE:
-                        color = 'red' if event.error == SoPErrorType.FAIL else 'green'
-                        SOPTEST_LOG_DEBUG(
-                            f'[EXECUTE] thing: {thing_name} function: {function_name} scenario: {scenario_name} requester_middleware_name: {requester_middleware_name} duration: {event.duration:0.4f} return value: {return_value} - {return_type.value} error:{event.error.value}', SoPTestLogLevel.PASS, progress=progress, color=color)
-                    break
-        elif SoPProtocolType.WebClient.EM_VERIFY_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SCENARIO_VERIFY, middleware_element=middleware, scenario_element=scenario, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.WebClient.ME_RESULT_VERIFY_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            scenario.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == SoPEventType.SCENARIO_VERIFY:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    SOPTEST_LOG_DEBUG(
-                        f'[SCENE_VERIFY] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
-                    break
-        elif SoPProtocolType.WebClient.EM_ADD_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SCENARIO_ADD, middleware_element=middleware, scenario_element=scenario, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.WebClient.ME_RESULT_ADD_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            if not scenario.is_super():
-                scenario.schedule_success = True
-                scenario.service_check = True
-
-            scenario.schedule_timeout = False
-            scenario.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == SoPEventType.SCENARIO_ADD:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-
-                    progress = [scenario.schedule_success for scenario in self.scenario_list].count(
-                        True) / len(self.scenario_list)
-                    color = 'red' if event.error == SoPErrorType.FAIL else 'green'
-                    SOPTEST_LOG_DEBUG(
-                        f'[SCENE_ADD] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO, progress=progress, color=color)
-                    break
-        elif SoPProtocolType.WebClient.EM_RUN_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SCENARIO_RUN, middleware_element=middleware, scenario_element=scenario, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.WebClient.ME_RESULT_RUN_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            scenario.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == SoPEventType.SCENARIO_RUN:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    SOPTEST_LOG_DEBUG(
-                        f'[SCENE_RUN] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
-                    break
-        elif SoPProtocolType.WebClient.EM_STOP_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SCENARIO_STOP, middleware_element=middleware, scenario_element=scenario, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.WebClient.ME_RESULT_STOP_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            scenario.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == SoPEventType.SCENARIO_STOP:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    SOPTEST_LOG_DEBUG(
-                        f'[SCENE_STOP] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
-                    break
-        elif SoPProtocolType.WebClient.EM_UPDATE_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SCENARIO_UPDATE, middleware_element=middleware, scenario_element=scenario, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.WebClient.ME_RESULT_UPDATE_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            scenario.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == SoPEventType.SCENARIO_UPDATE:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    SOPTEST_LOG_DEBUG(
-                        f'[SCENE_UPDATE] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
-                    break
-        elif SoPProtocolType.WebClient.EM_DELETE_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SCENARIO_DELETE, middleware_element=middleware, scenario_element=scenario, timestamp=timestamp, duration=0))
-        elif SoPProtocolType.WebClient.ME_RESULT_DELETE_SCENARIO.get_prefix() in topic:
-            scenario = self.find_scenario(scenario_name)
-            middleware = self.find_element_middleware(scenario)
-
-            scenario.recv_queue.put(msg)
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == SoPEventType.SCENARIO_DELETE:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    SOPTEST_LOG_DEBUG(
-                        f'[SCENE_DELETE] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
-                    break
+        if 'get_whole_scenario_info' in client_id:
+            middleware_name = client_id.split('@')[1]
 
-        ####################################################################################################################################################
+            middleware = self.find_middleware(middleware_name)
+            self.expect_table.resolve(middleware, msg)
 
-        elif SoPProtocolType.Super.MS_SCHEDULE.get_prefix() in topic:
-            requester_middleware_name = topic.split('/')[5]
-            super_middleware_name = topic.split('/')[4]
-            super_thing_name = topic.split('/')[3]
-            super_function_name = topic.split('/')[2]
+    def on_recv_service_list_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        client_id = topic_list[3]
 
-            super_thing = self.find_thing(super_thing_name)
-            middleware = self.find_element_middleware(super_thing)
-            scenario = self.find_scenario(scenario_name)
-            super_service = super_thing.find_service_by_name(
-                super_function_name)
+        if 'get_whole_service_list_info' in client_id:
+            middleware_name = client_id.split('@')[1]
 
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SUPER_SCHEDULE, middleware_element=middleware, thing_element=super_thing, service_element=super_service, scenario_element=scenario, timestamp=timestamp, duration=0))
-            SOPTEST_LOG_DEBUG(
-                f'[SUPER_SCHEDULE_START] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO)
-        elif SoPProtocolType.Super.SM_SCHEDULE.get_prefix() in topic:
-            target_middleware_name = topic.split('/')[4]
-            target_thing_name = topic.split('/')[3]
-            target_function_name = topic.split('/')[2]
+            middleware = self.find_middleware(middleware_name)
+            self.expect_table.resolve(middleware, msg)
+        elif 'check_online' in client_id:
+            middleware_name = client_id.split('@')[1]
 
-            request_ID = topic.split('/')[5]
-            requester_middleware_name = request_ID.split('@')[0]
-            super_thing_name = request_ID.split('@')[1]
-            super_function_name = request_ID.split('@')[2]
+            middleware = self.find_middleware(middleware_name)
+            self.expect_table.resolve(middleware, msg)
 
-            scenario = self.find_scenario(scenario_name)
+    def on_recv_thing_register(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        thing_name = topic_list[2]
 
-            progress = [scenario.schedule_success for scenario in self.scenario_list].count(
-                True) / len(self.scenario_list)
-            color = 'light_magenta'
-            SOPTEST_LOG_DEBUG(
-                f'[SUB_SCHEDULE_START] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
-        elif SoPProtocolType.Super.MS_RESULT_SCHEDULE.get_prefix() in topic:
-            target_middleware_name = topic.split('/')[5]
-            target_thing_name = topic.split('/')[4]
-            target_function_name = topic.split('/')[3]
+        thing = self.find_thing(thing_name)
+        middleware = self.find_element_middleware(thing)
+        self.expect_table.resolve(thing, msg)
+        self.add_event(SoPEvent(
+            event_type=SoPEventType.THING_REGISTER, middleware_element=middleware, thing_element=thing, timestamp=timestamp, duration=0))
 
-            request_ID = topic.split('/')[6]
-            requester_middleware_name = request_ID.split('@')[0]
-            super_thing_name = request_ID.split('@')[1]
-            super_function_name = request_ID.split('@')[2]
+    def on_recv_thing_register_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        thing_name = topic_list[3]
+        error_type = SoPErrorType.get(payload.get('error', None))
 
-            scenario = self.find_scenario(scenario_name)
+        thing = self.find_thing(thing_name)
+        middleware = self.find_element_middleware(thing)
+        thing.registered = True
+        self.expect_table.resolve(thing, msg)
+        for event in list(reversed(self.event_log)):
+            if event.middleware_element == middleware and event.thing_element == thing and event.event_type == SoPEventType.THING_REGISTER:
+                prev_duration = event.duration
+                event.duration = timestamp - event.timestamp
+                event.error = error_type
+                self.finish_event(event, prev_duration)
+
+                progress = [thing.registered for thing in self.thing_list].count(
+                    True) / len(self.thing_list)
+                color = 'red' if event.error == SoPErrorType.FAIL else 'green'
+                SOPTEST_LOG_DEBUG(
+                    f'[REGISTER] thing: {thing_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO, progress=progress, color=color)
+                break
 
-            progress = [scenario.schedule_success for scenario in self.scenario_list].count(
-                True) / len(self.scenario_list)
-            color = 'light_magenta'
-            SOPTEST_LOG_DEBUG(
-                f'[SUB_SCHEDULE_END] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
-        elif SoPProtocolType.Super.SM_RESULT_SCHEDULE.get_prefix() in topic:
-            requester_middleware_name = topic.split('/')[6]
-            super_middleware_name = topic.split('/')[5]
-            super_thing_name = topic.split('/')[4]
-            super_function_name = topic.split('/')[3]
-
-            super_thing = self.find_thing(super_thing_name)
-            middleware = self.find_element_middleware(super_thing)
-            scenario = self.find_scenario(scenario_name)
-            super_service = super_thing.find_service_by_name(
-                super_function_name)
-
-            if scenario.is_super():
-                scenario.schedule_success = True
-                scenario.service_check = True
-
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.thing_element == super_thing and event.service_element == super_service and event.scenario_element == scenario and event.event_type == SoPEventType.SUPER_SCHEDULE:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    event.return_type = return_type
-                    event.return_value = return_value
-
-                    progress = [scenario.schedule_success for scenario in self.scenario_list].count(
-                        True) / len(self.scenario_list)
+    def on_recv_thing_unregister(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        thing_name = topic_list[2]
 
-                    SOPTEST_LOG_DEBUG(
-                        f'[SUPER_SCHEDULE_END] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name} duration: {event.duration:0.4f} result: {event.error.value}', SoPTestLogLevel.INFO, progress=progress)
-                    break
-        elif SoPProtocolType.Super.MS_EXECUTE.get_prefix() in topic:
-            super_function_name = topic.split('/')[2]
-            super_thing_name = topic.split('/')[3]
-            super_middleware_name = topic.split('/')[4]
-            requester_middleware_name = topic.split('/')[5]
-
-            super_thing = self.find_thing(super_thing_name)
-            middleware = self.find_element_middleware(super_thing)
-            scenario = self.find_scenario(scenario_name)
-            super_service = super_thing.find_service_by_name(
-                super_function_name)
-
-            # NOTE: Super service가 감지되면 각 subfunction의 energy를 0으로 초기화한다.
-            # 이렇게 하는 이유는 super service가 실행될 때 마다 다른 subfunction이 실행될 수 있고
-            # 이에 따라 다른 eneryg 소모량을 가질 수 있다.
-            # for subfunction in super_service.subfunction_list:
-            #     subfunction.energy = 0
-
-            self.event_log.append(SoPEvent(
-                event_type=SoPEventType.SUPER_FUNCTION_EXECUTE, middleware_element=middleware, thing_element=super_thing, service_element=super_service, scenario_element=scenario, timestamp=timestamp, duration=0))
-            passed_time = get_current_time() - self.simulation_start_time
-            progress = passed_time / self.running_time
-            SOPTEST_LOG_DEBUG(
-                f'[SUPER_EXECUTE_START] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress)
-        elif SoPProtocolType.Super.SM_EXECUTE.get_prefix() in topic:
-            target_middleware_name = topic.split('/')[4]
-            target_thing_name = topic.split('/')[3]
-            target_function_name = topic.split('/')[2]
+        thing = self.find_thing(thing_name)
+        middleware = self.find_element_middleware(thing)
+        self.expect_table.resolve(thing, msg)
+        self.add_event(SoPEvent(
+            event_type=SoPEventType.THING_UNREGISTER, middleware_element=middleware, thing_element=thing, timestamp=timestamp, duration=0))
+
+    def on_recv_thing_unregister_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        thing_name = topic_list[3]
+        error_type = SoPErrorType.get(payload.get('error', None))
+
+        thing = self.find_thing(thing_name)
+        middleware = self.find_element_middleware(thing)
+        self.expect_table.resolve(thing, msg)
+        for event in list(reversed(self.event_log)):
+            if event.middleware_element == middleware and event.thing_element == thing and event.event_type == SoPEventType.THING_UNREGISTER:
+                prev_duration = event.duration
+                event.duration = timestamp - event.timestamp
+                event.error = error_type
+                self.finish_event(event, prev_duration)
+                SOPTEST_LOG_DEBUG(
+                    f'[UNREGISTER] thing: {thing_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
+                break
+
+    def on_recv_function_execute(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        function_name = topic_list[2]
+        thing_name = topic_list[3]
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        thing = self.find_thing(thing_name)
+        middleware = self.find_element_middleware(thing)
+        scenario = self.find_scenario(scenario_name)
+        service = thing.find_service_by_name(function_name)
+
+        if len(topic_list) > 4:
+            # middleware_name = topic_list[4]
+            # Request_ID = RequesterMiddlewareName_SuperThing@SuperFunction@SubrequestOrder
+            request_ID = topic_list[5]
 
-            request_ID = topic.split('/')[5]
             requester_middleware_name = request_ID.split('@')[0]
             super_thing_name = request_ID.split('@')[1]
             super_function_name = request_ID.split('@')[2]
+            # subrequest_order = request_ID.split('@')[3]
+        else:
+            super_thing_name = None
+            super_function_name = None
+            requester_middleware_name = None
 
-            scenario = self.find_scenario(scenario_name)
+        if requester_middleware_name is not None:
+            event_type = SoPEventType.SUB_FUNCTION_EXECUTE
+        else:
+            event_type = SoPEventType.FUNCTION_EXECUTE
+        self.add_event(SoPEvent(
+            event_type=event_type, middleware_element=middleware, thing_element=thing, service_element=service, scenario_element=scenario,
+            timestamp=timestamp, duration=0, requester_middleware_name=requester_middleware_name, super_thing_name=super_thing_name, super_function_name=super_function_name))
+
+    def on_recv_function_execute_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        function_name = topic_list[3]
+        thing_name = topic_list[4]
+        scenario_name = self.get_payload_scenario_name(payload)
+        return_type = SoPType.get(payload.get('return_type', None))
+        return_value = payload.get('return_value', None)
+        error_type = SoPErrorType.get(payload.get('error', None))
 
-            passed_time = get_current_time() - self.simulation_start_time
-            progress = passed_time / self.running_time
-            color = 'light_magenta'
-            SOPTEST_LOG_DEBUG(
-                f'[SUB_EXECUTE_START] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
-        elif SoPProtocolType.Super.MS_RESULT_EXECUTE.get_prefix() in topic:
-            target_middleware_name = topic.split('/')[5]
-            target_thing_name = topic.split('/')[4]
-            target_function_name = topic.split('/')[3]
+        thing = self.find_thing(thing_name)
+        middleware = self.find_element_middleware(thing)
+        scenario = self.find_scenario(scenario_name)
+        service = thing.find_service_by_name(function_name)
+
+        if len(topic_list) > 5:
+            # middleware_name = topic_list[5]
+            request_ID = topic_list[6]
 
-            request_ID = topic.split('/')[6]
             requester_middleware_name = request_ID.split('@')[0]
             super_thing_name = request_ID.split('@')[1]
             super_function_name = request_ID.split('@')[2]
+            # subrequest_order = request_ID.split('@')[3]
+        else:
+            super_thing_name = None
+            super_function_name = None
+            requester_middleware_name = None
+
+        for event in list(reversed(self.event_log)):
+            if event.middleware_element == middleware and event.thing_element == thing and event.service_element == service and event.scenario_element == scenario and event.requester_middleware_name == requester_middleware_name and event.event_type in [SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE]:
+                prev_duration = event.duration
+                event.duration = timestamp - event.timestamp
+                event.return_type = return_type
+                event.return_value = return_value
+                event.requester_middleware_name = requester_middleware_name
+                # online evaluator는 error가 기록된 event를 result를 받은 것으로 보므로 error를 마지막에 기록한다.
+                event.error = error_type
+                self.finish_event(event, prev_duration)
+
+                passed_time = get_current_time() - self.simulation_start_time
+                progress = passed_time / self.running_time
+
+                if event.event_type == SoPEventType.SUB_FUNCTION_EXECUTE:
+                    color = 'light_magenta' if event.error == SoPErrorType.FAIL else 'light_cyan'
+                    SOPTEST_LOG_DEBUG(
+                        f'[EXECUTE_SUB] thing: {thing_name} function: {function_name} scenario: {scenario_name} requester_middleware_name: {requester_middleware_name} duration: {event.duration:0.4f} return value: {return_value} - {return_type.value} error:{event.error.value}', SoPTestLogLevel.PASS, progress=progress, color=color)
+                elif event.event_type == SoPEventType.FUNCTION_EXECUTE:
+                    color = 'red' if event.error == SoPErrorType.FAIL else 'green'
+                    SOPTEST_LOG_DEBUG(
+                        f'[EXECUTE] thing: {thing_name} function: {function_name} scenario: {scenario_name} requester_middleware_name: {requester_middleware_name} duration: {event.duration:0.4f} return value: {return_value} - {return_type.value} error:{event.error.value}', SoPTestLogLevel.PASS, progress=progress, color=color)
+                break
 
-            scenario = self.find_scenario(scenario_name)
+    def on_recv_scenario_request(self, event_type: SoPEventType, payload: dict, timestamp: float):
+        scenario_name = self.get_payload_scenario_name(payload)
 
-            passed_time = get_current_time() - self.simulation_start_time
-            progress = passed_time / self.running_time
-            color = 'light_magenta'
-            SOPTEST_LOG_DEBUG(
-                f'[SUB_EXECUTE_END] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
-        elif SoPProtocolType.Super.SM_RESULT_EXECUTE.get_prefix() in topic:
-            requester_middleware_name = topic.split('/')[6]
-            super_middleware_name = topic.split('/')[5]
-            super_thing_name = topic.split('/')[4]
-            super_function_name = topic.split('/')[3]
-
-            super_thing = self.find_thing(super_thing_name)
-            middleware = self.find_element_middleware(super_thing)
-            scenario = self.find_scenario(scenario_name)
-            super_service = super_thing.find_service_by_name(
-                super_function_name)
-
-            for event in list(reversed(self.event_log)):
-                if event.middleware_element == middleware and event.thing_element == super_thing and event.service_element == super_service and event.scenario_element == scenario and event.event_type == SoPEventType.SUPER_FUNCTION_EXECUTE:
-                    event.duration = timestamp - event.timestamp
-                    event.error = error_type
-                    event.return_type = return_type
-                    event.return_value = return_value
-
-                    passed_time = get_current_time() - self.simulation_start_time
-                    progress = passed_time / self.running_time
-                    SOPTEST_LOG_DEBUG(
-                        f'[SUPER_EXECUTE_END] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name} duration: {event.duration:0.4f} return value: {return_value} - {return_type.value} error:{event.error.value}', SoPTestLogLevel.INFO, progress=progress)
-                    break
-        elif 'SIM/FINISH' in topic:
-            scenario = self.find_scenario(scenario_name)
-            scenario.cycle_count += 1
-            # SOPTEST_LOG_DEBUG(
-            #     f'[SIM_FINISH] scenario: {scenario.name}, cycle_count: {scenario.cycle_count}', SoPTestLogLevel.WARN)
-            return True
-        else:
-            raise Exception(f'Unknown topic: {topic}')
+        scenario = self.find_scenario(scenario_name)
+        middleware = self.find_element_middleware(scenario)
 
-        # elif SoPProtocolType.Default.TM_VALUE_PUBLISH.get_prefix() in topic:
-        #     pass
-        # elif SoPProtocolType.Default.TM_VALUE_PUBLISH_OLD.get_prefix() in topic:
-        #     pass
+        self.add_event(SoPEvent(
+            event_type=event_type, middleware_element=middleware, scenario_element=scenario, timestamp=timestamp, duration=0))
+
+    def on_recv_scenario_result(self, event_type: SoPEventType, log_tag: str, msg: mqtt.MQTTMessage, payload: dict, timestamp: float):
+        scenario_name = self.get_payload_scenario_name(payload)
+        error_type = SoPErrorType.get(payload.get('error', None))
+
+        scenario = self.find_scenario(scenario_name)
+        middleware = self.find_element_middleware(scenario)
+
+        self.expect_table.resolve(scenario, msg)
+        for event in list(reversed(self.event_log)):
+            if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == event_type:
+                prev_duration = event.duration
+                event.duration = timestamp - event.timestamp
+                event.error = error_type
+                self.finish_event(event, prev_duration)
+                SOPTEST_LOG_DEBUG(
+                    f'[{log_tag}] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO)
+                break
+
+    def on_recv_scenario_verify(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_request(SoPEventType.SCENARIO_VERIFY, payload, timestamp)
+
+    def on_recv_scenario_verify_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_result(SoPEventType.SCENARIO_VERIFY, 'SCENE_VERIFY', msg, payload, timestamp)
+
+    def on_recv_scenario_add(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_request(SoPEventType.SCENARIO_ADD, payload, timestamp)
+
+    def on_recv_scenario_add_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        scenario_name = self.get_payload_scenario_name(payload)
+        error_type = SoPErrorType.get(payload.get('error', None))
+
+        scenario = self.find_scenario(scenario_name)
+        middleware = self.find_element_middleware(scenario)
+
+        if not scenario.is_super():
+            scenario.schedule_success = True
+            scenario.service_check = True
+
+        scenario.schedule_timeout = False
+        self.expect_table.resolve(scenario, msg)
+        for event in list(reversed(self.event_log)):
+            if event.middleware_element == middleware and event.scenario_element == scenario and event.event_type == SoPEventType.SCENARIO_ADD:
+                prev_duration = event.duration
+                event.duration = timestamp - event.timestamp
+                event.error = error_type
+                self.finish_event(event, prev_duration)
+
+                progress = [scenario.schedule_success for scenario in self.scenario_list].count(
+                    True) / len(self.scenario_list)
+                color = 'red' if event.error == SoPErrorType.FAIL else 'green'
+                SOPTEST_LOG_DEBUG(
+                    f'[SCENE_ADD] scenario: {scenario_name} duration: {event.duration:0.4f}', SoPTestLogLevel.INFO, progress=progress, color=color)
+                break
+
+    def on_recv_scenario_run(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_request(SoPEventType.SCENARIO_RUN, payload, timestamp)
+
+    def on_recv_scenario_run_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_result(SoPEventType.SCENARIO_RUN, 'SCENE_RUN', msg, payload, timestamp)
+
+    def on_recv_scenario_stop(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_request(SoPEventType.SCENARIO_STOP, payload, timestamp)
+
+    def on_recv_scenario_stop_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_result(SoPEventType.SCENARIO_STOP, 'SCENE_STOP', msg, payload, timestamp)
+
+    def on_recv_scenario_update(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_request(SoPEventType.SCENARIO_UPDATE, payload, timestamp)
+
+    def on_recv_scenario_update_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_result(SoPEventType.SCENARIO_UPDATE, 'SCENE_UPDATE', msg, payload, timestamp)
+
+    def on_recv_scenario_delete(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_request(SoPEventType.SCENARIO_DELETE, payload, timestamp)
+
+    def on_recv_scenario_delete_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        self.on_recv_scenario_result(SoPEventType.SCENARIO_DELETE, 'SCENE_DELETE', msg, payload, timestamp)
+
+    ####################################################################################################################################################
+
+    def on_recv_super_schedule(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        requester_middleware_name = topic_list[5]
+        super_middleware_name = topic_list[4]
+        super_thing_name = topic_list[3]
+        super_function_name = topic_list[2]
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        super_thing = self.find_thing(super_thing_name)
+        middleware = self.find_element_middleware(super_thing)
+        scenario = self.find_scenario(scenario_name)
+        super_service = super_thing.find_service_by_name(
+            super_function_name)
+
+        self.add_event(SoPEvent(
+            event_type=SoPEventType.SUPER_SCHEDULE, middleware_element=middleware, thing_element=super_thing, service_element=super_service, scenario_element=scenario, timestamp=timestamp, duration=0))
+        SOPTEST_LOG_DEBUG(
+            f'[SUPER_SCHEDULE_START] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO)
+
+    def on_recv_sub_schedule(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        target_middleware_name = topic_list[4]
+        target_thing_name = topic_list[3]
+        target_function_name = topic_list[2]
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        request_ID = topic_list[5]
+        requester_middleware_name = request_ID.split('@')[0]
+        super_thing_name = request_ID.split('@')[1]
+        super_function_name = request_ID.split('@')[2]
+
+        scenario = self.find_scenario(scenario_name)
+
+        progress = [scenario.schedule_success for scenario in self.scenario_list].count(
+            True) / len(self.scenario_list)
+        color = 'light_magenta'
+        SOPTEST_LOG_DEBUG(
+            f'[SUB_SCHEDULE_START] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
+
+    def on_recv_sub_schedule_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        target_middleware_name = topic_list[5]
+        target_thing_name = topic_list[4]
+        target_function_name = topic_list[3]
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        request_ID = topic_list[6]
+        requester_middleware_name = request_ID.split('@')[0]
+        super_thing_name = request_ID.split('@')[1]
+        super_function_name = request_ID.split('@')[2]
+
+        scenario = self.find_scenario(scenario_name)
+
+        progress = [scenario.schedule_success for scenario in self.scenario_list].count(
+            True) / len(self.scenario_list)
+        color = 'light_magenta'
+        SOPTEST_LOG_DEBUG(
+            f'[SUB_SCHEDULE_END] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
+
+    def on_recv_super_schedule_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        requester_middleware_name = topic_list[6]
+        super_middleware_name = topic_list[5]
+        super_thing_name = topic_list[4]
+        super_function_name = topic_list[3]
+        scenario_name = self.get_payload_scenario_name(payload)
+        return_type = SoPType.get(payload.get('return_type', None))
+        return_value = payload.get('return_value', None)
+        error_type = SoPErrorType.get(payload.get('error', None))
+
+        super_thing = self.find_thing(super_thing_name)
+        middleware = self.find_element_middleware(super_thing)
+        scenario = self.find_scenario(scenario_name)
+        super_service = super_thing.find_service_by_name(
+            super_function_name)
+
+        if scenario.is_super():
+            scenario.schedule_success = True
+            scenario.service_check = True
+
+        for event in list(reversed(self.event_log)):
+            if event.middleware_element == middleware and event.thing_element == super_thing and event.service_element == super_service and event.scenario_element == scenario and event.event_type == SoPEventType.SUPER_SCHEDULE:
+                prev_duration = event.duration
+                event.duration = timestamp - event.timestamp
+                event.return_type = return_type
+                event.return_value = return_value
+                event.error = error_type
+                self.finish_event(event, prev_duration)
+
+                progress = [scenario.schedule_success for scenario in self.scenario_list].count(
+                    True) / len(self.scenario_list)
+
+                SOPTEST_LOG_DEBUG(
+                    f'[SUPER_SCHEDULE_END] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name} duration: {event.duration:0.4f} result: {event.error.value}', SoPTestLogLevel.INFO, progress=progress)
+                break
+
+    def on_recv_super_execute(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        super_function_name = topic_list[2]
+        super_thing_name = topic_list[3]
+        super_middleware_name = topic_list[4]
+        requester_middleware_name = topic_list[5]
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        super_thing = self.find_thing(super_thing_name)
+        middleware = self.find_element_middleware(super_thing)
+        scenario = self.find_scenario(scenario_name)
+        super_service = super_thing.find_service_by_name(
+            super_function_name)
+
+        # NOTE: Super service가 감지되면 각 subfunction의 energy를 0으로 초기화한다.
+        # 이렇게 하는 이유는 super service가 실행될 때 마다 다른 subfunction이 실행될 수 있고
+        # 이에 따라 다른 eneryg 소모량을 가질 수 있다.
+        # for subfunction in super_service.subfunction_list:
+        #     subfunction.energy = 0
+
+        self.add_event(SoPEvent(
+            event_type=SoPEventType.SUPER_FUNCTION_EXECUTE, middleware_element=middleware, thing_element=super_thing, service_element=super_service, scenario_element=scenario, timestamp=timestamp, duration=0))
+        passed_time = get_current_time() - self.simulation_start_time
+        progress = passed_time / self.running_time
+        SOPTEST_LOG_DEBUG(
+            f'[SUPER_EXECUTE_START] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress)
+
+    def on_recv_sub_execute(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        target_middleware_name = topic_list[4]
+        target_thing_name = topic_list[3]
+        target_function_name = topic_list[2]
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        request_ID = topic_list[5]
+        requester_middleware_name = request_ID.split('@')[0]
+        super_thing_name = request_ID.split('@')[1]
+        super_function_name = request_ID.split('@')[2]
+
+        scenario = self.find_scenario(scenario_name)
+
+        passed_time = get_current_time() - self.simulation_start_time
+        progress = passed_time / self.running_time
+        color = 'light_magenta'
+        SOPTEST_LOG_DEBUG(
+            f'[SUB_EXECUTE_START] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
+
+    def on_recv_sub_execute_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        target_middleware_name = topic_list[5]
+        target_thing_name = topic_list[4]
+        target_function_name = topic_list[3]
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        request_ID = topic_list[6]
+        requester_middleware_name = request_ID.split('@')[0]
+        super_thing_name = request_ID.split('@')[1]
+        super_function_name = request_ID.split('@')[2]
+
+        scenario = self.find_scenario(scenario_name)
+
+        passed_time = get_current_time() - self.simulation_start_time
+        progress = passed_time / self.running_time
+        color = 'light_magenta'
+        SOPTEST_LOG_DEBUG(
+            f'[SUB_EXECUTE_END] super_middleware: {""} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} target_middleware: {target_middleware_name} target_thing: {target_thing_name} target_function: {target_function_name} scenario: {scenario_name}', SoPTestLogLevel.INFO, progress=progress, color=color)
+
+    def on_recv_super_execute_result(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        requester_middleware_name = topic_list[6]
+        super_middleware_name = topic_list[5]
+        super_thing_name = topic_list[4]
+        super_function_name = topic_list[3]
+        scenario_name = self.get_payload_scenario_name(payload)
+        return_type = SoPType.get(payload.get('return_type', None))
+        return_value = payload.get('return_value', None)
+        error_type = SoPErrorType.get(payload.get('error', None))
+
+        super_thing = self.find_thing(super_thing_name)
+        middleware = self.find_element_middleware(super_thing)
+        scenario = self.find_scenario(scenario_name)
+        super_service = super_thing.find_service_by_name(
+            super_function_name)
+
+        for event in list(reversed(self.event_log)):
+            if event.middleware_element == middleware and event.thing_element == super_thing and event.service_element == super_service and event.scenario_element == scenario and event.event_type == SoPEventType.SUPER_FUNCTION_EXECUTE:
+                prev_duration = event.duration
+                event.duration = timestamp - event.timestamp
+                event.return_type = return_type
+                event.return_value = return_value
+                event.error = error_type
+                self.finish_event(event, prev_duration)
+
+                passed_time = get_current_time() - self.simulation_start_time
+                progress = passed_time / self.running_time
+                SOPTEST_LOG_DEBUG(
+                    f'[SUPER_EXECUTE_END] super_middleware: {super_middleware_name} requester_middleware: {requester_middleware_name} super_thing: {super_thing_name} super_function: {super_function_name} scenario: {scenario_name} duration: {event.duration:0.4f} return value: {return_value} - {return_type.value} error:{event.error.value}', SoPTestLogLevel.INFO, progress=progress)
+                break
+
+    def on_recv_simulation_finish(self, msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+        scenario_name = self.get_payload_scenario_name(payload)
+
+        scenario = self.find_scenario(scenario_name)
+        scenario.cycle_count += 1
+        # SOPTEST_LOG_DEBUG(
+        #     f'[SIM_FINISH] scenario: {scenario.name}, cycle_count: {scenario.cycle_count}', SoPTestLogLevel.WARN)
+        return True
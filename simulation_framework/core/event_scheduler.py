@@ -0,0 +1,112 @@
+from simulation_framework.core.worker_pool import *
+
+import copy
+import heapq
+from threading import Condition
+
+
+class SoPEventScheduler:
+    '''
+    timestamp를 key로 하는 priority queue에 event를 쌓고, 하나의 dispatcher thread가 다음 event의 시각까지 잠든 뒤 event를 실행한다.
+    오래 걸리는 event handler는 크기가 제한된 worker pool에서 실행된다.
+    '''
+
+    def __init__(self, dispatch: Callable[[SoPEvent], Any], get_time_origin: Callable[[], float], worker_pool: SoPWorkerPool = None) -> None:
+        self.dispatch = dispatch
+        self.get_time_origin = get_time_origin
+
+        # (timestamp, sequence, event). timestamp가 같은 경우 schedule된 순서대로 실행한다.
+        self.event_heap: List[Tuple[float, int, SoPEvent]] = []
+        self.event_sequence = 0
+        self.dispatching = False
+        self.is_stop = False
+        self.condition = Condition()
+
+        self.worker_pool = worker_pool if worker_pool else SoPWorkerPool()
+        self.dispatcher_thread: SoPThread = SoPThread(
+            name='event_dispatcher', target=self.dispatcher)
+
+        # event가 예정된 시각보다 늦게 실행된 시간
+        self.lateness_stat = SoPLatencyStat()
+
+    def start(self):
+        self.dispatcher_thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.is_stop = True
+            self.condition.notify_all()
+        self.worker_pool.shutdown(wait=False)
+
+    def schedule(self, event: SoPEvent):
+        if event.timestamp == None:
+            raise Exception('timestamp is not defined')
+
+        with self.condition:
+            heapq.heappush(self.event_heap, (event.timestamp, self.event_sequence, event))
+            self.event_sequence += 1
+            self.condition.notify_all()
+
+    def schedule_list(self, event_list: List[SoPEvent]):
+        for event in event_list:
+            self.schedule(event)
+
+    def preempt(self, event_type: SoPEventType, timestamp: float) -> bool:
+        # event_type의 event를 timestamp로 앞당기고, 그보다 늦게 예정된 event는 실행하지 않는다.
+        with self.condition:
+            target_list = [event for _, _, event in self.event_heap if event.event_type == event_type]
+            if not target_list:
+                return False
+
+            target_event = copy.copy(min(target_list, key=lambda event: event.timestamp))
+            target_event.timestamp = timestamp
+            self.event_heap = [item for item in self.event_heap if item[0] <= timestamp and item[2].event_type != event_type]
+            heapq.heapify(self.event_heap)
+            heapq.heappush(self.event_heap, (timestamp, self.event_sequence, target_event))
+            self.event_sequence += 1
+            self.condition.notify_all()
+        return True
+
+    def join(self):
+        with self.condition:
+            while (self.event_heap or self.dispatching) and not self.is_stop:
+                self.condition.wait()
+
+    def submit(self, func: Callable, *args, device_key: tuple = None, task_type: str = None) -> Future:
+        return self.worker_pool.submit(func, *args, device_key=device_key, task_type=task_type)
+
+    def dispatcher(self):
+        while True:
+            with self.condition:
+                while not self.event_heap and not self.is_stop:
+                    self.condition.wait()
+                if self.is_stop:
+                    return
+
+                timestamp, _, event = self.event_heap[0]
+                # START event가 실행되면 time origin이 바뀌므로 매번 deadline을 다시 계산한다.
+                time_origin = self.get_time_origin()
+                deadline = time_origin + timestamp
+                remaining = deadline - get_current_time()
+                if remaining > 0:
+                    # 더 이른 event가 schedule되면 notify에 의해 깨어나 다시 확인한다.
+                    self.condition.wait(remaining)
+                    continue
+
+                heapq.heappop(self.event_heap)
+                self.dispatching = True
+
+            # START 전에는 time origin이 정해지지 않아 (0) deadline이 의미가 없으므로 START를 포함해 기록하지 않는다.
+            if time_origin:
+                self.lateness_stat.add(get_current_time() - deadline)
+            try:
+                self.dispatch(event)
+            except Exception as e:
+                print_error(e)
+            finally:
+                with self.condition:
+                    self.dispatching = False
+                    self.condition.notify_all()
+
+    def get_lateness(self) -> dict:
+        return self.lateness_stat.summary()
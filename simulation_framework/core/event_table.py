@@ -0,0 +1,151 @@
+from simulation_framework.core.elements import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SoPEventTable:
+    '''
+    event log를 column 단위의 NumPy array로 변환한 table. event 하나가 row 하나에 대응된다.
+    element는 kind별 이름 목록의 index로, event type과 error는 enum 목록의 index로 저장하며 값이 없으면 -1이다.
+    NumPy가 설치되지 않은 환경에서는 사용할 수 없으며 is_available()로 확인한다.
+    '''
+
+    EVENT_TYPE_LIST = list(SoPEventType)
+    ERROR_TYPE_LIST = list(SoPErrorType)
+    ELEMENT_KIND_LIST = ['middleware', 'thing', 'service', 'scenario']
+
+    def __init__(self, event_log: List[SoPEvent] = []) -> None:
+        if not self.is_available():
+            raise Exception('numpy is not installed')
+
+        self.event_type_code_table = {event_type: i for i, event_type in enumerate(self.EVENT_TYPE_LIST)}
+        self.error_code_table = {error: i for i, error in enumerate(self.ERROR_TYPE_LIST)}
+
+        # key: element kind, value: 이름 목록 / {이름: code}
+        self.name_list_table: Dict[str, List[str]] = {kind: [] for kind in self.ELEMENT_KIND_LIST}
+        self.name_code_table: Dict[str, Dict[str, int]] = {kind: {} for kind in self.ELEMENT_KIND_LIST}
+
+        # key: id(event), value: row index
+        self.row_table: Dict[int, int] = {}
+        # key: (middleware code, event type set), value: (service별 호출 횟수, service별 duration 합)
+        self.service_usage_cache: Dict[tuple, Tuple['np.ndarray', 'np.ndarray']] = {}
+
+        self.build(event_log)
+
+    @staticmethod
+    def is_available() -> bool:
+        return np is not None
+
+    def name_code(self, kind: str, element: SoPElement) -> int:
+        if element is None:
+            return -1
+        code_table = self.name_code_table[kind]
+        code = code_table.get(element.name)
+        if code is None:
+            code = code_table[element.name] = len(code_table)
+            self.name_list_table[kind].append(element.name)
+        return code
+
+    def find_code(self, kind: str, name: str) -> int:
+        return self.name_code_table[kind].get(name, -1)
+
+    def encode(self, kind: str, element_list: List[SoPElement]) -> 'np.ndarray':
+        # 같은 element 객체는 한번만 이름으로 code를 찾는다.
+        code_cache: Dict[int, int] = {id(None): -1}
+        code_list = []
+        for element in element_list:
+            code = code_cache.get(id(element))
+            if code is None:
+                code = code_cache[id(element)] = self.name_code(kind, element)
+            code_list.append(code)
+        return np.array(code_list, dtype=np.int32)
+
+    def build(self, event_log: List[SoPEvent]):
+        def to_float(value) -> float:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return float(value)
+            return np.nan
+
+        self.row_table = {id(event): i for i, event in enumerate(event_log)}
+        # float column에서 None은 nan으로 변환된다.
+        self.timestamp = np.array([event.timestamp for event in event_log], dtype=np.float64)
+        self.duration = np.array([event.duration for event in event_log], dtype=np.float64)
+        self.energy = np.array([event.service_element.energy if event.service_element else None for event in event_log], dtype=np.float64)
+        self.return_value = np.array([to_float(event.return_value) for event in event_log], dtype=np.float64)
+        self.event_type = np.array([self.event_type_code_table.get(event.event_type, -1) for event in event_log], dtype=np.int16)
+        self.error = np.array([self.error_code_table.get(event.error, -1) for event in event_log], dtype=np.int16)
+        self.middleware = self.encode('middleware', [event.middleware_element for event in event_log])
+        self.thing = self.encode('thing', [event.thing_element for event in event_log])
+        self.service = self.encode('service', [event.service_element for event in event_log])
+        self.scenario = self.encode('scenario', [event.scenario_element for event in event_log])
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def rows(self, event_list: List[SoPEvent]) -> 'np.ndarray':
+        return np.fromiter((self.row_table[id(event)] for event in event_list), dtype=np.int64, count=len(event_list))
+
+    def type_mask(self, event_type_list: Iterable[SoPEventType]) -> 'np.ndarray':
+        return np.isin(self.event_type, [self.event_type_code_table[event_type] for event_type in event_type_list])
+
+    def service_usage(self, middleware: SoPMiddlewareElement, event_type_list: Iterable[SoPEventType]) -> Tuple['np.ndarray', 'np.ndarray']:
+        # middleware에서 실행된 service별 호출 횟수와 duration 합을 한번에 계산하여 caching한다.
+        key = (self.find_code('middleware', middleware.name), frozenset(event_type_list))
+        if key not in self.service_usage_cache:
+            mask = (self.middleware == key[0]) & self.type_mask(event_type_list) & (self.service >= 0)
+            service_num = len(self.name_list_table['service'])
+            count = np.bincount(self.service[mask], minlength=service_num)
+            duration = np.bincount(self.service[mask], weights=np.nan_to_num(self.duration[mask]), minlength=service_num)
+            self.service_usage_cache[key] = (count, duration)
+        return self.service_usage_cache[key]
+
+    def execute_summary(self, middleware: SoPMiddlewareElement, event_type_list: Iterable[SoPEventType]) -> Tuple[int, float]:
+        mask = (self.middleware == self.find_code('middleware', middleware.name)) & self.type_mask(event_type_list)
+        return int(np.count_nonzero(mask)), float(np.nansum(self.duration[mask]))
+
+    @staticmethod
+    def avg(value_array: 'np.ndarray', axis: int = None) -> Union[float, 'np.ndarray']:
+        # utils.avg와 같이 0보다 큰 값들의 평균을 구하며, 그런 값이 없으면 0이다.
+        value_array = np.asarray(value_array, dtype=np.float64)
+        positive_mask = value_array > 0
+        count = np.count_nonzero(positive_mask, axis=axis)
+        total = np.sum(np.where(positive_mask, value_array, 0), axis=axis)
+        result = np.divide(total, count, out=np.zeros_like(total, dtype=np.float64), where=count > 0)
+        return float(result) if axis is None else result
+
+    def save(self, path: str):
+        np.savez_compressed(path,
+                            timestamp=self.timestamp,
+                            duration=self.duration,
+                            energy=self.energy,
+                            return_value=self.return_value,
+                            event_type=self.event_type,
+                            error=self.error,
+                            middleware=self.middleware,
+                            thing=self.thing,
+                            service=self.service,
+                            scenario=self.scenario,
+                            event_type_name=np.array([event_type.value for event_type in self.EVENT_TYPE_LIST]),
+                            error_name=np.array([error.name for error in self.ERROR_TYPE_LIST]),
+                            **{f'{kind}_name': np.array(self.name_list_table[kind], dtype=str) for kind in self.ELEMENT_KIND_LIST})
+
+    @classmethod
+    def load(cls, path: str) -> 'SoPEventTable':
+        data = np.load(path)
+        event_table = cls()
+        for column in ['timestamp', 'duration', 'energy', 'return_value', 'event_type', 'error', 'middleware', 'thing', 'service', 'scenario']:
+            setattr(event_table, column, data[column])
+
+        # 저장할 때의 enum 순서가 현재와 다르더라도 같은 enum을 가리키도록 code를 다시 매긴다.
+        event_type_remap = np.array([event_table.event_type_code_table.get(SoPEventType(name), -1) for name in data['event_type_name']] + [-1])
+        error_remap = np.array([event_table.error_code_table.get(SoPErrorType[name], -1) for name in data['error_name']] + [-1])
+        event_table.event_type = event_type_remap[event_table.event_type].astype(np.int16)
+        event_table.error = error_remap[event_table.error].astype(np.int16)
+
+        for kind in cls.ELEMENT_KIND_LIST:
+            event_table.name_list_table[kind] = [str(name) for name in data[f'{kind}_name']]
+            event_table.name_code_table[kind] = {name: i for i, name in enumerate(event_table.name_list_table[kind])}
+        return event_table
@@ -1,11 +1,275 @@
 from simulation_framework.core.elements import *
+from simulation_framework.core.topic_router import *
 
 import paho.mqtt.client as mqtt
 from queue import Queue, Empty
 
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class SoPMQTTClientManager:
+    '''
+    여러 SoPMQTTClient의 socket을 client별 loop_start() thread 대신 하나의 asyncio event loop에서 처리한다.
+    수신한 message는 queue와 listener thread를 거치지 않고 loop thread에서 바로 on_message로 전달된다.
+    처리되지 않은 message가 high_watermark개를 넘으면 socket 읽기를 멈추고, low_watermark개 이하로 줄면 다시 읽는다.
+    여러 thread에서 요청한 subscribe/unsubscribe는 loop의 한 tick 동안 모아 client별로 하나의 packet으로 전송한다.
+    broker와의 연결이 끊기면 reconnect_min_delay부터 reconnect_max_delay까지 대기 시간을 두배씩 늘리며 재접속한다.
+    '''
+
+    def __init__(self, on_message: Callable[[mqtt.MQTTMessage, float], Any], high_watermark: int = 10000, low_watermark: int = 1000,
+                 dispatch_batch_size: int = 100, misc_interval: float = 1.0, reconnect_min_delay: float = 1.0, reconnect_max_delay: float = 30.0) -> None:
+        self.on_message = on_message
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.dispatch_batch_size = dispatch_batch_size
+        self.misc_interval = misc_interval
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread: SoPThread = SoPThread(name='mqtt_event_loop', target=self.run_loop)
+        self.loop_thread_id = None
+        self.loop_closed_event = threading.Event()
+        self.stopping = False
+
+        self.client_list: List['SoPMQTTClient'] = []
+        # key: socket, value: socket을 사용하는 paho client
+        self.socket_table: Dict[Any, mqtt.Client] = {}
+
+        self.pending_message_queue: deque = deque()
+        self.dispatch_scheduled = False
+        self.reading_paused = False
+
+        # key: id(mqtt_client), value: (mqtt_client, [(action, topic_list, qos, future)])
+        self.lock = threading.Lock()
+        self.pending_subscribe_table: Dict[int, Tuple['SoPMQTTClient', List[Tuple[str, List[str], int, Future]]]] = {}
+        self.flush_scheduled = False
+
+        # metric
+        self.pause_num = 0
+        self.subscribe_packet_num = 0
+        self.reconnect_num = 0
+
+    def start(self):
+        self.loop_thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        # loop를 먼저 멈추면 disconnect()의 DISCONNECT packet이 전송되지 않으므로,
+        # loop에서 모든 client의 연결을 끊고 socket이 닫힌 뒤에 loop를 멈추고 닫는다.
+        if self.stopping or self.loop.is_closed():
+            return
+        self.stopping = True
+
+        if not self.loop_thread.is_alive():
+            self.loop.close()
+            self.loop_closed_event.set()
+            return
+
+        self.call_soon(self.disconnect_all, timeout)
+        if not self.in_loop_thread():
+            self.loop_closed_event.wait(timeout + 1)
+
+    def disconnect_all(self, timeout: float):
+        for mqtt_client in self.client_list:
+            mqtt_client.client.disconnect()
+        self.wait_socket_close(self.loop.time() + timeout)
+
+    def wait_socket_close(self, deadline: float):
+        # paho는 DISCONNECT packet을 전송한 뒤 socket을 닫는다.
+        if self.socket_table and self.loop.time() < deadline:
+            self.loop.call_later(0.01, self.wait_socket_close, deadline)
+        else:
+            self.loop.stop()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop_thread_id = threading.get_ident()
+        self.loop.call_later(self.misc_interval, self.loop_misc)
+        self.loop.run_forever()
+        self.loop.close()
+        self.loop_closed_event.set()
+
+    def in_loop_thread(self) -> bool:
+        return threading.get_ident() == self.loop_thread_id
+
+    def call_soon(self, callback: Callable, *args):
+        # loop가 닫힌 뒤에 호출된 client의 callback은 무시한다.
+        if self.loop.is_closed():
+            return
+        if self.in_loop_thread():
+            self.loop.call_soon(callback, *args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def add_client(self, mqtt_client: 'SoPMQTTClient'):
+        client = mqtt_client.client
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        self.client_list.append(mqtt_client)
+
+    def remove_client(self, mqtt_client: 'SoPMQTTClient'):
+        if mqtt_client in self.client_list:
+            self.client_list.remove(mqtt_client)
+
+    def loop_misc(self):
+        # keepalive ping과 timeout 처리
+        for mqtt_client in self.client_list:
+            mqtt_client.client.loop_misc()
+        self.loop.call_later(self.misc_interval, self.loop_misc)
+
+    ####  reconnect   #################################################################################################
+
+    def schedule_reconnect(self, mqtt_client: 'SoPMQTTClient', delay: float = None):
+        if self.stopping:
+            return
+        delay = self.reconnect_min_delay if delay is None else delay
+        self.call_soon(self.loop.call_later, delay, self.reconnect, mqtt_client, delay)
+
+    def reconnect(self, mqtt_client: 'SoPMQTTClient', delay: float):
+        if self.stopping or mqtt_client not in self.client_list:
+            return
+        # connect()는 TCP 연결까지 block되므로 loop thread가 아닌 executor에서 실행한다.
+        future = self.loop.run_in_executor(None, mqtt_client.client.reconnect)
+        future.add_done_callback(lambda future: self.on_reconnect_done(mqtt_client, delay, future))
+
+    def on_reconnect_done(self, mqtt_client: 'SoPMQTTClient', delay: float, future: asyncio.Future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            next_delay = min(delay * 2, self.reconnect_max_delay)
+            SOPLOG_DEBUG(f'Reconnect to broker {mqtt_client.host}:{mqtt_client.port} failed... retry after {next_delay:.1f} sec', 'red')
+            self.schedule_reconnect(mqtt_client, next_delay)
+            return
+        # CONNACK을 받으면 SoPMQTTClient._on_connect에서 subscribe한 topic을 다시 subscribe한다.
+        self.reconnect_num += 1
+
+    ####  socket   ####################################################################################################
+
+    def add_reader(self, sock, client: mqtt.Client):
+        self.socket_table[sock] = client
+        if not self.reading_paused:
+            self.loop.add_reader(sock, client.loop_read)
+
+    def remove_socket(self, sock, fd: int):
+        self.socket_table.pop(sock, None)
+        self.loop.remove_reader(fd)
+        self.loop.remove_writer(fd)
+
+    def pause_reading(self):
+        self.reading_paused = True
+        self.pause_num += 1
+        for sock in self.socket_table:
+            self.loop.remove_reader(sock)
+
+    def resume_reading(self):
+        self.reading_paused = False
+        for sock, client in self.socket_table.items():
+            self.loop.add_reader(sock, client.loop_read)
+
+    def _on_socket_open(self, client: mqtt.Client, userdata, sock):
+        self.call_soon(self.add_reader, sock, client)
+
+    def _on_socket_close(self, client: mqtt.Client, userdata, sock):
+        # paho는 socket을 닫기 직전에 호출하므로, 닫힌 뒤에도 selector에서 제거할 수 있도록 fd를 넘긴다.
+        if self.in_loop_thread():
+            self.remove_socket(sock, sock.fileno())
+        else:
+            self.call_soon(self.remove_socket, sock, sock.fileno())
+
+    def _on_socket_register_write(self, client: mqtt.Client, userdata, sock):
+        self.call_soon(self.loop.add_writer, sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client: mqtt.Client, userdata, sock):
+        if self.in_loop_thread():
+            self.loop.remove_writer(sock.fileno())
+        else:
+            self.call_soon(self.loop.remove_writer, sock.fileno())
+
+    ####  message   ###################################################################################################
+
+    def put_message(self, msg: mqtt.MQTTMessage, recv_time: float):
+        # paho의 loop_read 안에서 호출되므로 항상 loop thread에서 실행된다.
+        self.pending_message_queue.append((msg, recv_time))
+        if len(self.pending_message_queue) >= self.high_watermark and not self.reading_paused:
+            self.pause_reading()
+        if not self.dispatch_scheduled:
+            self.dispatch_scheduled = True
+            self.loop.call_soon(self.dispatch)
+
+    def dispatch(self):
+        self.dispatch_scheduled = False
+
+        # batch 단위로 처리하고 loop에 제어를 돌려주어 socket 처리가 밀리지 않도록 한다.
+        for _ in range(min(len(self.pending_message_queue), self.dispatch_batch_size)):
+            msg, recv_time = self.pending_message_queue.popleft()
+            try:
+                self.on_message(msg, recv_time)
+            except Exception as e:
+                print_error(e)
+
+        if self.reading_paused and len(self.pending_message_queue) <= self.low_watermark:
+            self.resume_reading()
+        if self.pending_message_queue and not self.dispatch_scheduled:
+            self.dispatch_scheduled = True
+            self.loop.call_soon(self.dispatch)
+
+    def get_pending_message_num(self) -> int:
+        return len(self.pending_message_queue)
+
+    ####  subscribe   #################################################################################################
+
+    def request_subscribe(self, mqtt_client: 'SoPMQTTClient', action: str, topic_list: List[str], qos: int = 0) -> bool:
+        # 호출한 thread는 packet이 전송 queue에 들어갈 때까지 기다린다. 따라서 이후에 publish한 message보다 subscribe가 먼저 전송된다.
+        future = Future()
+        with self.lock:
+            _, request_list = self.pending_subscribe_table.setdefault(id(mqtt_client), (mqtt_client, []))
+            request_list.append((action, topic_list, qos, future))
+            if not self.flush_scheduled:
+                self.flush_scheduled = True
+                self.call_soon(self.flush_subscribe)
+
+        if self.in_loop_thread() or not self.loop.is_running():
+            # loop thread에서 호출된 경우 기다리면 deadlock이 발생하므로 바로 전송한다.
+            self.flush_subscribe()
+        return future.result()
+
+    def flush_subscribe(self):
+        with self.lock:
+            pending_subscribe_list = list(self.pending_subscribe_table.values())
+            self.pending_subscribe_table.clear()
+            self.flush_scheduled = False
+
+        for mqtt_client, request_list in pending_subscribe_list:
+            # 연속된 같은 종류의 요청을 하나의 SUBSCRIBE/UNSUBSCRIBE packet으로 묶는다.
+            i = 0
+            while i < len(request_list):
+                action, _, qos, _ = request_list[i]
+                j = i
+                while j < len(request_list) and request_list[j][0] == action and request_list[j][2] == qos:
+                    j += 1
+
+                topic_list = list(dict.fromkeys([topic for _, topic_list, _, _ in request_list[i:j] for topic in topic_list]))
+                try:
+                    if action == 'subscribe':
+                        result, _ = mqtt_client.client.subscribe([(topic, qos) for topic in topic_list])
+                    else:
+                        result, _ = mqtt_client.client.unsubscribe(topic_list)
+                    self.subscribe_packet_num += 1
+                    for _, _, _, future in request_list[i:j]:
+                        future.set_result(result == mqtt.MQTT_ERR_SUCCESS)
+                except Exception as e:
+                    for _, _, _, future in request_list[i:j]:
+                        future.set_exception(e)
+                i = j
+
 
 class SoPMQTTClient:
-    def __init__(self, middleware: SoPMiddlewareElement, debug: bool = False):
+    def __init__(self, middleware: SoPMiddlewareElement, debug: bool = False, recv_message_queue: Queue = None, manager: SoPMQTTClientManager = None):
         self.client: mqtt.Client = mqtt.Client(
             client_id=middleware.name, clean_session=True)
 
@@ -16,12 +280,23 @@ class SoPMQTTClient:
         self.pub_message = None
         self.recv_message = None
         self.pub_message_queue: Queue = Queue()
-        self.recv_message_queue: Queue = Queue()
+        # 여러 client가 하나의 queue를 공유하는 경우 (message, recv_time) 순으로 도착한 순서대로 쌓인다.
+        self.recv_message_queue: Queue = recv_message_queue if recv_message_queue is not None else Queue()
 
+        # subscribe_list는 요청받은 topic, broker_subscribe_table은 실제로 broker에 subscribe한 topic과 qos이다.
+        # 이미 subscribe한 wildcard topic에 포함되는 topic은 broker에 다시 subscribe하지 않는다.
         self.subscribe_list = set()
+        self.subscribe_qos_table: Dict[str, int] = {}
+        self.broker_subscribe_table: Dict[str, int] = {}
+        self.subscribe_lock = threading.Lock()
         self.is_run = False
         self.debug = debug
 
+        # manager가 있으면 socket 처리와 message 전달을 manager의 event loop에서 수행한다.
+        self.manager = manager
+        if self.manager:
+            self.manager.add_client(self)
+
         self.set_callback()
 
     def connect(self):
@@ -59,37 +334,90 @@ class SoPMQTTClient:
                 pass
                 SOPLOG_DEBUG(f'Publish failed...', 'red')
 
-    def subscribe(self, topic: Union[List, str], qos=0):
-        if type(topic) is not list:
-            self.client.subscribe(topic, qos)
-            self.subscribe_list.add(topic)
-            if self.debug:
-                SOPLOG_DEBUG(
-                    f'{f"✅ Subscribed by {self.get_client_id()}":>16}(qos={qos}): {topic:<80}, on {self.middleware.device.host}:{self.middleware.mqtt_port}', 'yellow')
+    def find_uncovered_topic_list(self, topic_list: List[str]) -> List[str]:
+        # broker에 subscribe한 topic이나 topic_list의 다른 topic에 포함되지 않는 topic만 남긴다.
+        uncovered_topic_list = []
+        for topic in topic_list:
+            qos = self.subscribe_qos_table.get(topic, 0)
+            topic_segment_list = topic.split('/')
+            if any([broker_topic != topic and broker_qos >= qos and topic_cover(broker_topic.split('/'), topic_segment_list)
+                    for broker_topic, broker_qos in self.broker_subscribe_table.items()]):
+                continue
+            if any([other_topic != topic and self.subscribe_qos_table.get(other_topic, 0) >= qos and topic_cover(other_topic.split('/'), topic_segment_list)
+                    for other_topic in topic_list]):
+                continue
+            uncovered_topic_list.append(topic)
+
+        return uncovered_topic_list
+
+    def send_subscribe(self, topic_list: List[str], qos: int = 0):
+        # 여러 topic을 하나의 SUBSCRIBE packet으로 전송한다.
+        if not topic_list:
+            return
+        if self.manager:
+            self.manager.request_subscribe(self, 'subscribe', topic_list, qos)
         else:
-            for item in topic:
-                self.client.subscribe(item, qos)
+            self.client.subscribe([(topic, qos) for topic in topic_list])
+
+    def send_unsubscribe(self, topic_list: List[str], properties=None):
+        if not topic_list:
+            return
+        if self.manager:
+            self.manager.request_subscribe(self, 'unsubscribe', topic_list)
+        else:
+            self.client.unsubscribe(topic_list, properties)
+
+    def subscribe(self, topic: Union[List, str], qos=0):
+        topic_list = topic if type(topic) is list else [topic]
+
+        with self.subscribe_lock:
+            new_topic_list = [item for item in dict.fromkeys(topic_list)
+                              if item not in self.subscribe_list or self.subscribe_qos_table[item] < qos]
+            for item in new_topic_list:
                 self.subscribe_list.add(item)
-                if self.debug:
-                    SOPLOG_DEBUG(
-                        f'{f"✅ Subscribed by {self.get_client_id()}":>16}(qos={qos}): {item:<80}, on {self.middleware.device.host}:{self.middleware.mqtt_port}', 'yellow')
+                self.subscribe_qos_table[item] = qos
+
+            send_topic_list = self.find_uncovered_topic_list(new_topic_list)
+            for item in send_topic_list:
+                self.broker_subscribe_table[item] = qos
+
+        # manager가 loop thread에서 subscribe를 처리하므로 lock을 잡지 않은 상태에서 전송한다.
+        self.send_subscribe(send_topic_list, qos)
+
+        if self.debug:
+            for item in new_topic_list:
+                SOPLOG_DEBUG(
+                    f'{f"✅ Subscribed by {self.get_client_id()}":>16}(qos={qos}): {item:<80}, on {self.middleware.device.host}:{self.middleware.mqtt_port}{"" if item in send_topic_list else " (covered)"}', 'yellow')
 
     def unsubscribe(self, topic, properties=None):
-        if type(topic) is not list:
-            self.client.unsubscribe(topic, properties)
-            if topic in self.subscribe_list:
-                self.subscribe_list.remove(topic)
-            if self.debug:
+        topic_list = topic if type(topic) is list else [topic]
+
+        with self.subscribe_lock:
+            remove_topic_list = [item for item in dict.fromkeys(topic_list) if item in self.subscribe_list]
+            for item in remove_topic_list:
+                self.subscribe_list.remove(item)
+                self.subscribe_qos_table.pop(item)
+
+            unsubscribe_topic_list = [item for item in remove_topic_list if item in self.broker_subscribe_table]
+            for item in unsubscribe_topic_list:
+                self.broker_subscribe_table.pop(item)
+
+            # broker에서 제거된 wildcard topic에 포함되어 있던 topic은 다시 subscribe 해야 한다.
+            resubscribe_topic_list = self.find_uncovered_topic_list(
+                [item for item in self.subscribe_list if item not in self.broker_subscribe_table]) if unsubscribe_topic_list else []
+            resubscribe_qos_table: Dict[int, List[str]] = {}
+            for item in resubscribe_topic_list:
+                self.broker_subscribe_table[item] = self.subscribe_qos_table[item]
+                resubscribe_qos_table.setdefault(self.subscribe_qos_table[item], []).append(item)
+
+        self.send_unsubscribe(unsubscribe_topic_list, properties)
+        for qos, item_list in resubscribe_qos_table.items():
+            self.send_subscribe(item_list, qos)
+
+        if self.debug:
+            for item in remove_topic_list:
                 SOPLOG_DEBUG(
-                    f'{f"❌ Unsubscribed by {self.get_client_id()}":>16}: {topic:<80}, on {self.middleware.device.host}:{self.middleware.mqtt_port}', 'yellow')
-        else:
-            for item in topic:
-                self.client.unsubscribe(item, properties)
-                if item in self.subscribe_list:
-                    self.subscribe_list.remove(item)
-                if self.debug:
-                    SOPLOG_DEBUG(
-                        f'{f"❌ Unsubscribed by {self.get_client_id()}":>16}: {item:<80}, on {self.middleware.device.host}:{self.middleware.mqtt_port}', 'yellow')
+                    f'{f"❌ Unsubscribed by {self.get_client_id()}":>16}: {item:<80}, on {self.middleware.device.host}:{self.middleware.mqtt_port}', 'yellow')
 
     def run(self):
         if self.is_run:
@@ -102,10 +430,16 @@ class SoPMQTTClient:
             return self
 
     def stop(self):
-        self.loop_stop()
+        if self.manager:
+            self.client.disconnect()
+            self.manager.remove_client(self)
+        else:
+            self.loop_stop()
 
     def loop_start(self):
-        self.client.loop_start()
+        # manager가 socket을 처리하는 경우 network thread를 실행하지 않는다.
+        if not self.manager:
+            self.client.loop_start()
 
     def loop_stop(self):
         self.client.loop_stop()
@@ -113,10 +447,21 @@ class SoPMQTTClient:
     ####################################################################################################
 
     def _on_connect(self, client: mqtt.Client, userdata, flags, rc):
-        pass
+        # clean session이므로 재접속한 경우 broker에 subscribe한 topic을 다시 subscribe한다.
+        if rc != 0:
+            return
+        with self.subscribe_lock:
+            resubscribe_qos_table: Dict[int, List[str]] = {}
+            for topic, qos in self.broker_subscribe_table.items():
+                resubscribe_qos_table.setdefault(qos, []).append(topic)
+        for qos, topic_list in resubscribe_qos_table.items():
+            self.client.subscribe([(topic, qos) for topic in topic_list])
 
     def _on_disconnect(self, client, userdata, rc):
-        pass
+        # loop_start()의 network thread는 스스로 재접속하지만, manager를 사용하는 경우 manager의 loop에서 재접속한다.
+        # rc가 0이면 disconnect()로 직접 연결을 끊은 경우이다.
+        if rc != 0 and self.manager:
+            self.manager.schedule_reconnect(self)
 
     def _on_log(self, client, userdata, level, buf):
         pass
@@ -132,7 +477,11 @@ class SoPMQTTClient:
 
     def _on_message(self, client: mqtt.Client, userdata, message: mqtt.MQTTMessage):
         # self.recv_message = message
-        self.recv_message_queue.put(message)
+        # listener에서 꺼낸 시점이 아닌 callback에서 수신한 시점을 monotonic clock으로 기록한다.
+        if self.manager:
+            self.manager.put_message(message, time.perf_counter())
+        else:
+            self.recv_message_queue.put((message, time.perf_counter()))
         topic, payload, _ = decode_MQTT_message(message)
 
         if self.debug:
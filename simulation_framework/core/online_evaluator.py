@@ -0,0 +1,267 @@
+from simulation_framework.core.simulation_evaluator import *
+
+import math
+from statistics import NormalDist
+from threading import Lock
+
+
+class SoPRunningStat:
+    '''
+    Welford 방식으로 평균과 분산을 누적하는 통계. 값을 보관하지 않으므로 추가와 조회가 O(1)이다.
+    '''
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self) -> float:
+        return math.sqrt(self.variance())
+
+    def half_width(self, z: float) -> float:
+        # 평균의 신뢰구간 반폭. 표본이 2개 미만이면 구간을 알 수 없다.
+        if self.count < 2:
+            return math.inf
+        return z * self.std() / math.sqrt(self.count)
+
+
+class SoPOnlineScenarioState:
+    '''
+    scenario 하나의 execute cycle 탐색 상태와 누적 metric.
+    SoPSimulationEvaluator.evaluate_scenario와 같이 처음 2개와 마지막 2개의 cycle은 통계에서 제외되며,
+    마지막 2개는 아직 알 수 없으므로 cycle은 뒤에 2개의 cycle이 더 평가된 후에 통계에 반영된다.
+    '''
+
+    SKIP_CYCLE_NUM = 2
+    METRIC_LIST = ['latency', 'energy', 'execute_time', 'overhead']
+
+    def __init__(self, scenario: SoPScenarioElement, window_size: int) -> None:
+        self.scenario = scenario
+
+        service_pattern = []
+        for service in scenario.service_list:
+            service_pattern.append(service)
+            service_pattern.extend(service.subservice_list)
+        self.matcher = SoPExecuteCycleMatcher(service_pattern)
+
+        # 기록되었지만 아직 matcher에 넣지 않은 execute event. matcher는 FAIL 여부를 누적하므로 result를 받은 event만 순서대로 넣는다.
+        self.pending_event_list: deque = deque()
+        # 평가되었지만 뒤에 2개의 cycle이 더 평가되기 전이라 통계에 반영되지 않은 cycle
+        self.uncommitted_result_list: deque = deque()
+        self.evaluated_cycle_num = 0
+
+        self.execute_cycle_result_list: List[SoPExecuteCycleResult] = []
+        self.schedule_event_list: List[SoPEvent] = []
+
+        # utils.avg와 같이 0보다 큰 값만 평균에 반영한다. value: [합, 개수]
+        self.positive_sum_table: Dict[str, List[float]] = {metric: [0, 0] for metric in self.METRIC_LIST}
+        # 성공한 cycle의 latency, energy와 cycle 성공 여부(0/1)의 평균, 분산
+        self.stat_table: Dict[str, SoPRunningStat] = {metric: SoPRunningStat() for metric in ['latency', 'energy', 'success']}
+        self.window: deque = deque(maxlen=window_size)
+
+    def commit(self, execute_cycle_result: SoPExecuteCycleResult):
+        self.execute_cycle_result_list.append(execute_cycle_result)
+        for metric, value in zip(self.METRIC_LIST, [execute_cycle_result.cycle_latency, execute_cycle_result.cycle_energy,
+                                                    execute_cycle_result.avg_execute_time, execute_cycle_result.overhead]):
+            if value > 0:
+                self.positive_sum_table[metric][0] += value
+                self.positive_sum_table[metric][1] += 1
+
+        success = execute_cycle_result.error == SoPExecuteCycleErrorType.SUCCESS
+        if success:
+            self.stat_table['latency'].add(execute_cycle_result.cycle_latency)
+            self.stat_table['energy'].add(execute_cycle_result.cycle_energy)
+        self.stat_table['success'].add(1 if success else 0)
+        self.window.append((execute_cycle_result.cycle_latency, execute_cycle_result.cycle_energy, success))
+
+    def avg(self, metric: str) -> float:
+        total, count = self.positive_sum_table[metric]
+        return total / count if count > 0 else 0
+
+    def window_avg(self) -> Tuple[float, float, float]:
+        if not self.window:
+            return 0, 0, 0
+        return (avg([latency for latency, _, _ in self.window]),
+                avg([energy for _, energy, _ in self.window]),
+                [success for _, _, success in self.window].count(True) / len(self.window))
+
+
+class SoPOnlineEvaluator:
+    '''
+    event handler가 event를 기록하거나 result를 받을 때마다 호출되어, simulation이 실행되는 동안 scenario별 metric을 갱신한다.
+    simulation이 끝난 후에는 event log를 다시 순회하지 않고 누적된 상태로 SoPScenarioResult를 만든다.
+    '''
+
+    EXECUTE_EVENT = {SoPEventType.FUNCTION_EXECUTE,
+                     SoPEventType.SUPER_FUNCTION_EXECUTE,
+                     SoPEventType.SUB_FUNCTION_EXECUTE}
+    MIDDLEWARE_EXECUTE_EVENT = {SoPEventType.FUNCTION_EXECUTE,
+                                SoPEventType.SUB_FUNCTION_EXECUTE}
+
+    def __init__(self, simulation_env: SoPMiddlewareElement, running_time: float, window_size: int = 20, max_pending_event: int = 64) -> None:
+        self.simulation_env = simulation_env
+        self.window_size = window_size
+        # result를 받지 못한 event 뒤로 max_pending_event개의 event가 쌓이면 더 기다리지 않고 matcher에 넣는다.
+        self.max_pending_event = max_pending_event
+
+        # cycle의 error 판정과 metric 계산은 기존 evaluator와 같은 코드를 사용한다.
+        self.cycle_evaluator = SoPSimulationEvaluator(simulation_env, [], running_time, 0)
+        self.lock = Lock()
+
+        # key: id(scenario)
+        self.scenario_state_table: Dict[int, SoPOnlineScenarioState] = {}
+        # key: id(middleware), value: [FUNCTION_EXECUTE, SUB_FUNCTION_EXECUTE 개수, duration 합]
+        self.middleware_execute_table: Dict[int, List[float]] = {}
+        self.scenario_add_event_list: List[SoPEvent] = []
+
+        self.event_num = 0
+        self.last_timestamp = 0
+        self.is_finished = False
+
+    def start(self, simulation_start_time: float):
+        self.cycle_evaluator.simulation_start_time = simulation_start_time
+
+    def get_scenario_state(self, scenario: SoPScenarioElement) -> SoPOnlineScenarioState:
+        scenario_state = self.scenario_state_table.get(id(scenario))
+        if scenario_state is None:
+            scenario_state = self.scenario_state_table[id(scenario)] = SoPOnlineScenarioState(scenario, self.window_size)
+        return scenario_state
+
+    def on_event_add(self, event: SoPEvent):
+        with self.lock:
+            self.event_num += 1
+            self.last_timestamp = max(self.last_timestamp, event.timestamp)
+
+            if event.event_type in self.MIDDLEWARE_EXECUTE_EVENT and event.middleware_element:
+                self.middleware_execute_table.setdefault(id(event.middleware_element), [0, 0])[0] += 1
+            if event.event_type == SoPEventType.SCENARIO_ADD:
+                self.scenario_add_event_list.append(event)
+            if not event.scenario_element:
+                return
+
+            if event.event_type == SoPEventType.SUPER_SCHEDULE:
+                self.get_scenario_state(event.scenario_element).schedule_event_list.append(event)
+            elif event.event_type in self.EXECUTE_EVENT:
+                scenario_state = self.get_scenario_state(event.scenario_element)
+                scenario_state.pending_event_list.append(event)
+                self.feed_pending_event(scenario_state)
+
+    def on_event_finish(self, event: SoPEvent, prev_duration: float):
+        with self.lock:
+            if event.event_type in self.MIDDLEWARE_EXECUTE_EVENT and event.middleware_element:
+                self.middleware_execute_table.setdefault(id(event.middleware_element), [0, 0])[1] += (event.duration or 0) - (prev_duration or 0)
+            if event.event_type in self.EXECUTE_EVENT and event.scenario_element:
+                self.feed_pending_event(self.get_scenario_state(event.scenario_element))
+
+    def feed_pending_event(self, scenario_state: SoPOnlineScenarioState, force: bool = False):
+        # event는 기록된 순서대로 넣는다. result를 받았는지는 error가 기록되었는지로 확인한다.
+        pending_event_list = scenario_state.pending_event_list
+        while pending_event_list:
+            if not (force or pending_event_list[0].error is not None or len(pending_event_list) > self.max_pending_event):
+                break
+            for execute_cycle in scenario_state.matcher.feed(pending_event_list.popleft()):
+                self.evaluate_cycle(scenario_state, execute_cycle)
+
+    def evaluate_cycle(self, scenario_state: SoPOnlineScenarioState, execute_cycle: List[SoPEvent]):
+        scenario_state.evaluated_cycle_num += 1
+        if scenario_state.evaluated_cycle_num <= SoPOnlineScenarioState.SKIP_CYCLE_NUM:
+            return
+        scenario_state.uncommitted_result_list.append(
+            self.cycle_evaluator.evaluate_execute_cycle(scenario_state.scenario, execute_cycle))
+        if len(scenario_state.uncommitted_result_list) > SoPOnlineScenarioState.SKIP_CYCLE_NUM:
+            scenario_state.commit(scenario_state.uncommitted_result_list.popleft())
+
+    def finish(self, simulation_duration: float):
+        with self.lock:
+            if self.is_finished:
+                return
+            self.is_finished = True
+            self.cycle_evaluator.simulation_duration = simulation_duration
+            for scenario_state in self.scenario_state_table.values():
+                self.feed_pending_event(scenario_state, force=True)
+                for execute_cycle in scenario_state.matcher.finish():
+                    self.evaluate_cycle(scenario_state, execute_cycle)
+
+    def convergence_error(self, confidence: float = 0.95, min_cycle_num: int = 10) -> float:
+        # scenario별 latency, energy 평균의 상대 신뢰구간 반폭과 cycle 성공률의 신뢰구간 반폭 중 가장 큰 값.
+        # execute event가 기록된 scenario만 대상이며, cycle이 min_cycle_num개 미만인 scenario가 있으면 inf이다.
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        with self.lock:
+            scenario_state_list = list(self.scenario_state_table.values())
+            if not scenario_state_list:
+                return math.inf
+
+            max_error = 0
+            for scenario_state in scenario_state_list:
+                success_stat = scenario_state.stat_table['success']
+                if success_stat.count < min_cycle_num:
+                    return math.inf
+                max_error = max(max_error, success_stat.half_width(z))
+                for metric in ['latency', 'energy']:
+                    stat = scenario_state.stat_table[metric]
+                    if stat.count == 0:
+                        continue
+                    if stat.count < 2 or stat.mean <= 0:
+                        return math.inf
+                    max_error = max(max_error, stat.half_width(z) / stat.mean)
+            return max_error
+
+    def is_converged(self, tolerance: float, confidence: float = 0.95, min_cycle_num: int = 10) -> bool:
+        return self.convergence_error(confidence, min_cycle_num) <= tolerance
+
+    def scenario_result(self, scenario: SoPScenarioElement) -> SoPScenarioResult:
+        if scenario.schedule_timeout:
+            return SoPScenarioResult(scenario_element=scenario, error=SoPScenarioErrorType.SCHEDULE_TIMEOUT)
+        elif not scenario.schedule_success:
+            return SoPScenarioResult(scenario_element=scenario, error=SoPScenarioErrorType.SCHEDULE_FAIL)
+        elif scenario.state == SoPScenarioState.STUCKED:
+            return SoPScenarioResult(scenario_element=scenario, error=SoPScenarioErrorType.FAIL)
+
+        scenario_state = self.get_scenario_state(scenario)
+        return SoPScenarioResult(scenario_element=scenario,
+                                 execute_cycle_result_list=list(scenario_state.execute_cycle_result_list),
+                                 schedule_event_list=list(scenario_state.schedule_event_list),
+                                 avg_schedule_latency=avg([schedule_event.duration for schedule_event in scenario_state.schedule_event_list]),
+                                 avg_latency=scenario_state.avg('latency'),
+                                 avg_energy=scenario_state.avg('energy'),
+                                 avg_exeucte_time=scenario_state.avg('execute_time'),
+                                 avg_overhead=scenario_state.avg('overhead'),
+                                 error=SoPScenarioErrorType.SUCCESS)
+
+    def execute_summary(self, middleware: SoPMiddlewareElement) -> Tuple[int, float]:
+        execute_count, execute_time = self.middleware_execute_table.get(id(middleware), [0, 0])
+        return execute_count, execute_time
+
+    def summary(self) -> dict:
+        # simulation 도중에도 호출할 수 있는 전체 metric. scenario 수에 비례하는 비용이다.
+        with self.lock:
+            added_scenario_list = list({id(event.scenario_element): event.scenario_element
+                                        for event in self.scenario_add_event_list if event.scenario_element}.values())
+            non_timeout_scenario_list = [scenario for scenario in added_scenario_list if not scenario.schedule_timeout]
+            accepted_scenario_num = [scenario.schedule_success for scenario in non_timeout_scenario_list].count(True)
+
+            scenario_state_list = list(self.scenario_state_table.values())
+            cycle_num = sum([scenario_state.stat_table['success'].count for scenario_state in scenario_state_list])
+            success_cycle_num = sum([scenario_state.stat_table['latency'].count for scenario_state in scenario_state_list])
+            window_avg_list = [scenario_state.window_avg() for scenario_state in scenario_state_list if scenario_state.window]
+
+            return dict(timestamp=self.last_timestamp,
+                        event_num=self.event_num,
+                        added_scenario_num=len(added_scenario_list),
+                        acceptance_ratio=accepted_scenario_num / len(non_timeout_scenario_list) if non_timeout_scenario_list else 0,
+                        cycle_num=cycle_num,
+                        cycle_success_ratio=success_cycle_num / cycle_num if cycle_num else 0,
+                        avg_latency=avg([scenario_state.avg('latency') for scenario_state in scenario_state_list]),
+                        avg_energy=avg([scenario_state.avg('energy') for scenario_state in scenario_state_list]),
+                        rolling_latency=avg([latency for latency, _, _ in window_avg_list]),
+                        rolling_energy=avg([energy for _, energy, _ in window_avg_list]),
+                        rolling_success_ratio=sum([success_ratio for _, _, success_ratio in window_avg_list]) / len(window_avg_list) if window_avg_list else 0)
@@ -4,6 +4,10 @@ from simulation_framework.core.simulation_evaluator import *
 
 
 PREDEFINED_POLICY_FILE_NAME = 'my_scheduling_policies.cc'
+SCHEDULING_POLICY_LIBRARY_NAME = 'libscheduling-policies.so'
+# build 방식이 바뀌어 이전 build cache를 사용하면 안되는 경우 올린다.
+# 2: make의 timestamp 비교로 이전 policy의 결과물이 저장되었을 수 있는 cache를 무효화한다.
+BUILD_CACHE_VERSION = 2
 SCHEDULING_ALGORITHM_PATH = f'{get_project_root()}/scheduling_algorithm'
 
 
@@ -66,66 +70,75 @@ class SoPSchedulingFramework:
                                                      policy_file_path_list=tmp_policy_file_path_list, args=args)
         self.print_ranking(raw_simulation_result_list=simulation_result_list)
 
+    def get_build_key(self, extra_file_table: Dict[str, str], toolchain: str) -> str:
+        manifest = SoPFileManifest.from_local(SCHEDULING_ALGORITHM_PATH, extra_file_table)
+        build_key_source = [f'{rel_path}:{digest}' for rel_path, digest in sorted(manifest.digest_table.items())
+                            if rel_path != 'sopiot_middleware']
+        build_key_source.append(toolchain)
+        build_key_source.append(f'build_cache_version:{BUILD_CACHE_VERSION}')
+        return hashlib.sha256('\n'.join(build_key_source).encode()).hexdigest()[:16]
+
     def update_middleware_thing(self, simulation_executor: SoPSimulatorExecutor,
                                 middleware_path: str = '~/middleware',
-                                policy_file_path: str = ''):
+                                policy_file_path: str = '',
+                                build_farm: bool = False,
+                                full_sync: bool = False):
+        # build_farm 모드에서는 device별로 build하지 않고, 같은 OS/arch/toolchain의 device 중 하나에서만 build한 뒤 나머지에 배포한다.
+        # key: id(ssh_client), value: (ssh_client, remote middleware path, build key)
+        build_target_table: Dict[int, Tuple[SoPSSHClient, str, str]] = {}
+        build_target_lock = Lock()
 
         def task(middleware: SoPMiddlewareElement):
             ssh_client = simulation_executor.event_handler.find_ssh_client(
                 middleware)
-            remote_home_dir = ssh_client.send_command('cd ~ && pwd')[0]
+            host_facts = ssh_client.get_host_facts()
+            if not host_facts.toolchain:
+                host_facts = ssh_client.get_host_facts(refresh=True)
+            remote_home_dir = host_facts.home_dir
             user = os.path.basename(remote_home_dir)
-            ssh_client.send_command('sudo apt install lsb-release -y')
-            result = ssh_client.send_command('echo $?')
-            if int(result[0]):
-                raise Exception(
-                    f'Install lsb-release failed to {middleware.name}')
-            remote_device_os = ssh_client.send_command(
-                'lsb_release -a')[1].split('\t')[1].strip()
+            if not host_facts.os:
+                if not ssh_client.send_command_batch(['sudo apt install lsb-release -y'])[0].success():
+                    raise Exception(
+                        f'Install lsb-release failed to {middleware.name}')
+                host_facts = ssh_client.get_host_facts(refresh=True)
+            remote_device_os = host_facts.os
 
             ssh_client.send_command('pidof sopiot_middleware | xargs kill -9')
-            if not middleware.binary_sended:
-                result = ssh_client.send_command(
-                    f'rm -rf {home_dir_append(middleware_path, user)}')
-                result = ssh_client.send_dir(
-                    SCHEDULING_ALGORITHM_PATH, home_dir_append(middleware_path, user))
-                if 'Ubuntu 20.04' in remote_device_os:
-                    result = ssh_client.send_file(
-                        f'{get_project_root()}/bin/sopiot_middleware_ubuntu2004_x64', f'{home_dir_append(middleware_path, user)}/sopiot_middleware')
-                elif 'Ubuntu 22.04' in remote_device_os:
-                    result = ssh_client.send_file(
-                        f'{get_project_root()}/bin/sopiot_middleware_ubuntu2204_x64', f'{home_dir_append(middleware_path, user)}/sopiot_middleware')
-                elif 'Raspbian' in remote_device_os:
-                    result = ssh_client.send_file(
-                        f'{get_project_root()}/bin/sopiot_middleware_pi_x86', f'{home_dir_append(middleware_path, user)}/sopiot_middleware')
-                middleware.binary_sended = True
-
-            ssh_client.send_file(
-                policy_file_path, f'{home_dir_append(middleware_path, user)}/{PREDEFINED_POLICY_FILE_NAME}')
-            middleware_update_result = ssh_client.send_command(
-                f'cd {home_dir_append(middleware_path, user)}; chmod +x sopiot_middleware;cmake .; make -j; echo $?')[-1]
-
-            if not int(middleware_update_result[0]):
-                SOPTEST_LOG_DEBUG(
-                    f'device {middleware.device.name} middleware {middleware.name} update result: True', SoPTestLogLevel.INFO)
+
+            extra_file_table = {PREDEFINED_POLICY_FILE_NAME: policy_file_path}
+            if 'Ubuntu 20.04' in remote_device_os:
+                extra_file_table['sopiot_middleware'] = f'{get_project_root()}/bin/sopiot_middleware_ubuntu2004_x64'
+            elif 'Ubuntu 22.04' in remote_device_os:
+                extra_file_table['sopiot_middleware'] = f'{get_project_root()}/bin/sopiot_middleware_ubuntu2204_x64'
+            elif 'Raspbian' in remote_device_os:
+                extra_file_table['sopiot_middleware'] = f'{get_project_root()}/bin/sopiot_middleware_pi_x86'
+
+            # 원격 폴더의 manifest와 비교하여 바뀐 파일 (대부분 policy 파일 하나)만 전송한다.
+            ssh_client.sync_dir(SCHEDULING_ALGORITHM_PATH, home_dir_append(middleware_path, user),
+                                extra_file_table=extra_file_table, force=full_sync)
+            middleware.binary_sended = True
+
+            # policy와 scheduling_algorithm 파일들, 원격 device의 toolchain이 같으면 이전에 build한 결과물을 사용한다.
+            build_key = self.get_build_key(extra_file_table, host_facts.toolchain)
+            if build_farm:
+                with build_target_lock:
+                    build_target_table.setdefault(id(ssh_client), (ssh_client, home_dir_append(middleware_path, user), build_key))
             else:
-                raise Exception(
-                    f'device {middleware.device.name} middleware {middleware.name} update result: False')
+                build_cache_hit = self.build_policy(ssh_client, home_dir_append(middleware_path, user), build_key)
+                SOPTEST_LOG_DEBUG(
+                    f'device {middleware.device.name} middleware {middleware.name} update result: True (build cache {"hit" if build_cache_hit else "miss"})', SoPTestLogLevel.INFO)
 
             # TODO: not tested yet
-            randisk_check_command = f'ls /mnt/ramdisk'
-            ssh_client.send_command(randisk_check_command)
-            randisk_check_result = ssh_client.send_command('echo $?')
-            if int(randisk_check_result[0]):
+            if not host_facts.ramdisk:
                 ramdisk_generate_command_list = [f'sudo mkdir -p /mnt/ramdisk',
                                                  f'sudo mount -t tmpfs -o size=200M tmpfs /mnt/ramdisk',
                                                  f'echo "none /mnt/ramdisk tmpfs defaults,size=200M 0 0" | sudo tee -a /etc/fstab > /dev/null',
                                                  f'sudo chmod 777 /mnt/ramdisk']
-                for ramdisk_generate_command in ramdisk_generate_command_list:
-                    ssh_client.send_command(ramdisk_generate_command)
+                ramdisk_generate_result = ssh_client.send_command_batch(ramdisk_generate_command_list, stop_on_error=True)
+                if all([result.success() for result in ramdisk_generate_result]):
+                    ssh_client.update_host_facts(ramdisk=True)
 
             if any([thing.is_super for thing in middleware.thing_list]):
-                remote_home_dir = ssh_client.send_command('cd ~ && pwd')[0]
                 thing_install_command = f'pip install big-thing-py'
                 ssh_client.send_command(thing_install_command)
 
@@ -133,9 +146,64 @@ class SoPSchedulingFramework:
             simulation_executor.simulation_env)
 
         pool_map(task, middleware_list)
+        if build_farm:
+            self.build_policy_by_group(list(build_target_table.values()))
 
         return True
 
+    def build_policy(self, ssh_client: SoPSSHClient, remote_middleware_path: str, build_key: str) -> bool:
+        build_result, build_cache_hit = ssh_client.build_with_cache(remote_middleware_path, build_key,
+                                                                    build_command='chmod +x sopiot_middleware; cmake . && make -B -j',
+                                                                    artifact=SCHEDULING_POLICY_LIBRARY_NAME)
+        if not build_result:
+            raise Exception(
+                f'device {ssh_client.device.name} middleware update result: False')
+
+        return build_cache_hit
+
+    def build_policy_by_group(self, build_target_list: List[Tuple[SoPSSHClient, str, str]]):
+
+        def group_task(group_key: Tuple[str, str, str], group_build_target_list: List[Tuple[SoPSSHClient, str, str]]):
+            os_name, arch, build_key = group_key
+            start_time = get_current_time()
+
+            # 이미 build 결과물을 가지고 있는 device가 있으면 그 device를 builder로 사용한다.
+            has_cache_list = [ssh_client.has_build_cache(remote_middleware_path, build_key, SCHEDULING_POLICY_LIBRARY_NAME)
+                              for ssh_client, remote_middleware_path, _ in group_build_target_list]
+            builder_index = has_cache_list.index(True) if True in has_cache_list else 0
+            builder_ssh_client, builder_remote_middleware_path, _ = group_build_target_list[builder_index]
+            self.build_policy(builder_ssh_client, builder_remote_middleware_path, build_key)
+            build_time = get_current_time() - start_time
+
+            artifact_data = builder_ssh_client.read_remote_file(
+                builder_ssh_client.build_cache_path(builder_remote_middleware_path, build_key, SCHEDULING_POLICY_LIBRARY_NAME))
+
+            def distribute_task(ssh_client: SoPSSHClient, remote_middleware_path: str, has_cache: bool):
+                if not has_cache:
+                    ssh_client.put_build_cache(remote_middleware_path, build_key, SCHEDULING_POLICY_LIBRARY_NAME, artifact_data)
+                # cache가 채워졌으므로 build 없이 symlink만 바뀐다.
+                self.build_policy(ssh_client, remote_middleware_path, build_key)
+
+            pool_map(distribute_task, [(ssh_client, remote_middleware_path, has_cache)
+                                       for i, ((ssh_client, remote_middleware_path, _), has_cache) in enumerate(zip(group_build_target_list, has_cache_list))
+                                       if i != builder_index])
+            distribute_time = get_current_time() - start_time - build_time
+
+            SOPTEST_LOG_DEBUG(
+                f'[BUILD FARM] os: {os_name}, arch: {arch}, builder: {builder_ssh_client.device.name}, device: {len(group_build_target_list)}, '
+                f'build: {build_time:0.2f}s, distribute: {distribute_time:0.2f}s', SoPTestLogLevel.INFO)
+
+        # 같은 OS/arch이고 build key (source + toolchain)가 같은 device들은 같은 결과물을 사용할 수 있다.
+        group_table: Dict[Tuple[str, str, str], List[Tuple[SoPSSHClient, str, str]]] = {}
+        for ssh_client, remote_middleware_path, build_key in build_target_list:
+            group_key = (ssh_client.host_facts.os, ssh_client.host_facts.arch, build_key)
+            group_table.setdefault(group_key, []).append((ssh_client, remote_middleware_path, build_key))
+
+        pool_map(group_task, list(group_table.items()))
+
+        SOPTEST_LOG_DEBUG(
+            f'[BUILD FARM] {len(build_target_list)} devices are built with {len(group_table)} builds', SoPTestLogLevel.INFO)
+
     def print_ranking(self, raw_simulation_result_list: List[SoPSimulationResult]):
         if not raw_simulation_result_list:
             SOPTEST_LOG_DEBUG(f'No simulation result', SoPTestLogLevel.WARN)
@@ -246,7 +314,9 @@ policy: {simulation_result_list_sort_by_success_ratio[i].policy}'''] for i in ra
                 self.update_middleware_thing(
                     simulation_executor=simulation_executor,
                     middleware_path='~/middleware',
-                    policy_file_path=policy_file_path)
+                    policy_file_path=policy_file_path,
+                    build_farm=args.build_farm,
+                    full_sync=args.full_sync)
 
                 try:
                     simulation_env, event_log, simulation_duration, simulation_start_time = simulation_executor.start()
@@ -255,7 +325,8 @@ policy: {simulation_result_list_sort_by_success_ratio[i].policy}'''] for i in ra
                     continue
 
                 simulation_evaluator = SoPSimulationEvaluator(
-                    simulation_env, event_log, simulation_duration, simulation_start_time)
+                    simulation_env, event_log, simulation_duration, simulation_start_time, event_table=args.event_table,
+                    online_evaluator=simulation_executor.event_handler.online_evaluator)
                 simulation_result = simulation_evaluator.evaluate_simulation()
                 simulation_result.config = self.simulation_generator.simulation_config.name
                 simulation_result.policy = os.path.basename(
@@ -266,6 +337,7 @@ policy: {simulation_result_list_sort_by_success_ratio[i].policy}'''] for i in ra
                     simulation_result=simulation_result, label=label, args=args)
                 simulation_evaluator.export_csv(
                     simulation_result=simulation_result, label=label, args=args)
+                simulation_evaluator.export_event_table(label=label)
 
                 if args.download_logs:
                     simulation_executor.event_handler.download_log_file()
@@ -290,7 +362,9 @@ policy: {simulation_result_list_sort_by_success_ratio[i].policy}'''] for i in ra
                     self.update_middleware_thing(
                         simulation_executor=simulation_executor,
                         middleware_path='~/middleware',
-                        policy_file_path=policy_file_path)
+                        policy_file_path=policy_file_path,
+                        build_farm=args.build_farm,
+                        full_sync=args.full_sync)
 
                     try:
                         simulation_env, event_log, simulation_duration, simulation_start_time = simulation_executor.start()
@@ -300,7 +374,8 @@ policy: {simulation_result_list_sort_by_success_ratio[i].policy}'''] for i in ra
                         continue
 
                     simulation_evaluator = SoPSimulationEvaluator(
-                        simulation_env, event_log, simulation_duration, simulation_start_time)
+                        simulation_env, event_log, simulation_duration, simulation_start_time, event_table=args.event_table,
+                        online_evaluator=simulation_executor.event_handler.online_evaluator)
                     simulation_result = simulation_evaluator.evaluate_simulation()
                     simulation_result.config = os.path.basename(
                         self.simulation_generator.simulation_config.path).split('.')[0]
@@ -312,6 +387,7 @@ policy: {simulation_result_list_sort_by_success_ratio[i].policy}'''] for i in ra
                         simulation_result=simulation_result, label=label, args=args)
                     simulation_evaluator.export_csv(
                         simulation_result=simulation_result, label=label, args=args)
+                    simulation_evaluator.export_event_table(label=label)
 
                     if args.download_logs:
                         simulation_executor.event_handler.download_log_file()
@@ -1,7 +1,8 @@
-from simulation_framework.core.elements import *
+from simulation_framework.core.event_table import *
 
 import csv
 from itertools import zip_longest
+from collections import deque
 
 
 class SoPExecuteCycleErrorType(Enum):
@@ -20,14 +21,15 @@ class SoPScenarioErrorType(Enum):
 
 
 class SoPAcceptanceScore:
-    def __init__(self, middleware_list: List[SoPMiddlewareElement]) -> None:
+    def __init__(self, middleware_list: List[SoPMiddlewareElement], event_store: 'SoPEventStore' = None) -> None:
         whole_event_log: List[SoPEvent] = []
         for middleware in middleware_list:
-            whole_event_log += middleware.event_log
+            if event_store:
+                whole_event_log += event_store.get(middleware, SoPEventType.SCENARIO_ADD)
+            else:
+                whole_event_log += [event for event in middleware.event_log if event.event_type == SoPEventType.SCENARIO_ADD]
         whole_event_log = sorted(
             whole_event_log, key=lambda x: x.timestamp)
-        whole_event_log = [
-            event for event in whole_event_log if event.event_type == SoPEventType.SCENARIO_ADD]
 
         acceptance_ratio_meter = []
         acceptance_ratio_by_section = []
@@ -117,7 +119,8 @@ class SoPMiddlewareResult:
     def __init__(self, middleware_element: SoPMiddlewareElement,
                  scenario_result_list: List[SoPScenarioResult] = [], local_scenario_result_list: List[SoPScenarioResult] = [], super_scenario_result_list: List[SoPScenarioResult] = [],
                  total_scenario_num: List[int] = [0, 0, 0], timeout_scenario_num: List[int] = [0, 0, 0], denied_scenario_num: List[int] = [0, 0, 0], failed_scenario_num: List[int] = [0, 0, 0],
-                 avg_latency: List[int] = [0, 0, 0], avg_execute_time: List[int] = [0, 0, 0], avg_schedule_latency: List[int] = [0, 0, 0], avg_energy: List[int] = [0, 0, 0], avg_overhead: List[int] = [0, 0, 0]) -> None:
+                 avg_latency: List[int] = [0, 0, 0], avg_execute_time: List[int] = [0, 0, 0], avg_schedule_latency: List[int] = [0, 0, 0], avg_energy: List[int] = [0, 0, 0], avg_overhead: List[int] = [0, 0, 0],
+                 execute_event_list: List[SoPEvent] = None, execute_summary: Tuple[int, float] = None) -> None:
         self.middleware_element = middleware_element
         self.scenario_result_list = scenario_result_list
         self.local_scenario_result_list = local_scenario_result_list
@@ -136,10 +139,14 @@ class SoPMiddlewareResult:
 
         self.total_scenario_cycle_num = sum(
             [scenario.cycle_count for scenario in self.middleware_element.scenario_list])
-        self.total_execute_count = len([event for event in self.middleware_element.event_log if event.event_type in [
-                                       SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE]])
-        self.total_execute_time = sum([event.duration for event in self.middleware_element.event_log if event.event_type in [
-                                      SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE]])
+        if execute_summary is not None:
+            self.total_execute_count, self.total_execute_time = execute_summary
+        else:
+            if execute_event_list is None:
+                execute_event_list = [event for event in self.middleware_element.event_log if event.event_type in {
+                    SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE}]
+            self.total_execute_count = len(execute_event_list)
+            self.total_execute_time = sum([event.duration for event in execute_event_list])
 
 
 class SoPSimulationResult:
@@ -235,9 +242,158 @@ class SoPSimulationResult:
         return self.avg_overhead
 
 
-class SoPSimulationEvaluator:
-
-    MIDDLEWARE_EVENT = [SoPEventType.MIDDLEWARE_RUN,
+class SoPExecuteCycleMatcher:
+    '''
+    scenario의 service pattern으로 automaton을 만들고 execute event를 하나씩 넣으며 pattern과 일치하는 execute cycle을 찾는다.
+    매 index마다 window를 slicing하고 정렬하던 방식과 같은 결과를 event 수에 비례하는 시간에 구한다.
+        - local scenario: service 이름 sequence에 대한 KMP automaton
+        - super scenario: super service slot별로 subservice 이름 multiset의 차이를 sliding window로 유지
+    window 안의 FUNCTION_EXECUTE, SUPER_FUNCTION_EXECUTE 중 FAIL이 있는 경우는 개수를 유지하여 제외한다.
+    '''
+
+    FAIL_CHECK_EVENT_TYPE = [SoPEventType.SUPER_FUNCTION_EXECUTE, SoPEventType.FUNCTION_EXECUTE]
+
+    def __init__(self, service_pattern: List[SoPServiceElement]) -> None:
+        self.pattern_len = len(service_pattern)
+        self.name_pattern = [service.name for service in service_pattern]
+        self.is_super = any([service.is_super for service in service_pattern])
+
+        # super service slot: (window 안에서 slot의 시작 위치, super service 이름, subservice 개수, subservice 이름별 개수)
+        # 기존 구현과 같이 slot은 super service 순서대로 window의 앞에서부터 이어서 배치된다.
+        self.slot_list: List[Tuple[int, str, int, Dict[str, int]]] = []
+        start_index = 0
+        for service in service_pattern:
+            if not service.is_super:
+                continue
+            subservice_count_table: Dict[str, int] = {}
+            for subservice in service.subservice_list:
+                subservice_count_table[subservice.name] = subservice_count_table.get(subservice.name, 0) + 1
+            self.slot_list.append((start_index, service.name, len(service.subservice_list), subservice_count_table))
+            start_index += len(service.subservice_list) + 1
+
+        # KMP failure function
+        self.failure_table = [0] * self.pattern_len
+        k = 0
+        for i in range(1, self.pattern_len):
+            while k > 0 and self.name_pattern[i] != self.name_pattern[k]:
+                k = self.failure_table[k - 1]
+            if self.name_pattern[i] == self.name_pattern[k]:
+                k += 1
+            self.failure_table[i] = k
+
+        self.window: deque = deque()
+        self.window_full = False
+        self.fail_num = 0
+        self.kmp_state = 0
+        # slot별 (window의 subservice 개수 - pattern의 subservice 개수) table과 0이 아닌 항목 수
+        self.slot_diff_list: List[Tuple[Dict[str, int], List[int]]] = []
+
+    def is_fail(self, event: SoPEvent) -> bool:
+        return event.event_type in self.FAIL_CHECK_EVENT_TYPE and event.error == SoPErrorType.FAIL
+
+    def update_slot_diff(self, slot_index: int, name: str, delta: int):
+        diff_table, nonzero_num = self.slot_diff_list[slot_index]
+        prev = diff_table.get(name, 0)
+        diff_table[name] = prev + delta
+        if prev == 0:
+            nonzero_num[0] += 1
+        elif prev + delta == 0:
+            nonzero_num[0] -= 1
+
+    def init_slot_diff(self):
+        self.slot_diff_list = []
+        for slot_index, (start_index, _, subservice_num, subservice_count_table) in enumerate(self.slot_list):
+            self.slot_diff_list.append(({name: -count for name, count in subservice_count_table.items()}, [len(subservice_count_table)]))
+            for i in range(start_index + 1, start_index + subservice_num + 1):
+                self.update_slot_diff(slot_index, self.window[i].service_element.name, 1)
+
+    def feed(self, event: SoPEvent) -> List[List[SoPEvent]]:
+        # 새 event로 완성된 window가 pattern과 일치하면 해당 execute cycle을 반환한다.
+        if self.pattern_len == 0:
+            return [[]]
+
+        self.window.append(event)
+        if self.is_fail(event):
+            self.fail_num += 1
+
+        slided = False
+        if len(self.window) > self.pattern_len:
+            old_event = self.window.popleft()
+            if self.is_fail(old_event):
+                self.fail_num -= 1
+            slided = True
+
+        if not self.is_super:
+            name = event.service_element.name
+            while self.kmp_state > 0 and name != self.name_pattern[self.kmp_state]:
+                self.kmp_state = self.failure_table[self.kmp_state - 1]
+            if name == self.name_pattern[self.kmp_state]:
+                self.kmp_state += 1
+            if self.kmp_state < self.pattern_len:
+                return []
+
+            self.kmp_state = self.failure_table[self.kmp_state - 1]
+            self.window_full = True
+            return [list(self.window)] if self.fail_num == 0 else []
+
+        if len(self.window) < self.pattern_len:
+            return []
+        if not self.window_full:
+            self.window_full = True
+            self.init_slot_diff()
+        elif slided:
+            # slot의 subservice 구간이 한 칸 이동한다.
+            for slot_index, (start_index, _, subservice_num, _) in enumerate(self.slot_list):
+                self.update_slot_diff(slot_index, self.window[start_index].service_element.name, -1)
+                self.update_slot_diff(slot_index, self.window[start_index + subservice_num].service_element.name, 1)
+
+        if self.fail_num:
+            return []
+        for (start_index, super_service_name, _, _), (_, nonzero_num) in zip(self.slot_list, self.slot_diff_list):
+            if nonzero_num[0] or self.window[start_index].service_element.name != super_service_name:
+                return []
+        return [list(self.window)]
+
+    def match_window(self, window: List[SoPEvent]) -> bool:
+        if any([self.is_fail(event) for event in window]):
+            return False
+        if not self.is_super:
+            return [event.service_element.name for event in window] == self.name_pattern
+
+        for start_index, super_service_name, subservice_num, subservice_count_table in self.slot_list:
+            slot = window[start_index:start_index + subservice_num + 1]
+            # NOTE: 기존 구현은 slot이 비어 있으면 IndexError가 발생했다. 일치하지 않는 것으로 처리한다.
+            if not slot or slot[0].service_element.name != super_service_name:
+                return False
+            subservice_count_table_in_window: Dict[str, int] = {}
+            for event in slot[1:]:
+                subservice_count_table_in_window[event.service_element.name] = subservice_count_table_in_window.get(event.service_element.name, 0) + 1
+            if subservice_count_table_in_window != subservice_count_table:
+                return False
+        return True
+
+    def finish(self) -> List[List[SoPEvent]]:
+        # event list의 끝에서 pattern 길이보다 짧게 잘린 window들을 확인한다.
+        window = list(self.window)
+        # window가 pattern 길이만큼 찬 경우 첫 window는 feed()에서 이미 확인했다.
+        start = 1 if len(window) == self.pattern_len else 0
+        return [window[i:] for i in range(start, len(window)) if self.match_window(window[i:])]
+
+    def match(self, execute_event_list: List[SoPEvent]) -> List[List[SoPEvent]]:
+        execute_cycle_list = []
+        for event in execute_event_list:
+            execute_cycle_list.extend(self.feed(event))
+        execute_cycle_list.extend(self.finish())
+        return execute_cycle_list
+
+
+class SoPEventStore:
+    '''
+    event log를 한번만 순회하여 element별, (element, event type)별, (middleware, service 이름)별 bucket으로 나눈다.
+    각 bucket은 timestamp 순으로 정렬되어 있으며 (timestamp가 같으면 event log 순서), 평가 단계들은 event log를 다시 filtering하지 않고 bucket을 읽는다.
+    '''
+
+    MIDDLEWARE_EVENT = {SoPEventType.MIDDLEWARE_RUN,
                         SoPEventType.MIDDLEWARE_KILL,
                         SoPEventType.THING_REGISTER,
                         SoPEventType.THING_UNREGISTER,
@@ -252,19 +408,19 @@ class SoPSimulationEvaluator:
                         SoPEventType.SUPER_FUNCTION_EXECUTE,
                         SoPEventType.SUPER_SCHEDULE,
                         SoPEventType.SUB_FUNCTION_EXECUTE,
-                        SoPEventType.SUB_SCHEDULE]
-    THING_EVENT = [SoPEventType.THING_REGISTER,
+                        SoPEventType.SUB_SCHEDULE}
+    THING_EVENT = {SoPEventType.THING_REGISTER,
                    SoPEventType.THING_UNREGISTER,
                    SoPEventType.THING_KILL,
                    SoPEventType.FUNCTION_EXECUTE,
                    SoPEventType.SUPER_FUNCTION_EXECUTE,
                    SoPEventType.SUPER_SCHEDULE,
-                   SoPEventType.SUB_FUNCTION_EXECUTE]
-    SERVICE_EVENT = [SoPEventType.FUNCTION_EXECUTE,
+                   SoPEventType.SUB_FUNCTION_EXECUTE}
+    SERVICE_EVENT = {SoPEventType.FUNCTION_EXECUTE,
                      SoPEventType.SUB_FUNCTION_EXECUTE,
                      SoPEventType.SUPER_FUNCTION_EXECUTE,
-                     SoPEventType.SUPER_SCHEDULE]
-    SCENARIO_EVENT = [SoPEventType.FUNCTION_EXECUTE,
+                     SoPEventType.SUPER_SCHEDULE}
+    SCENARIO_EVENT = {SoPEventType.FUNCTION_EXECUTE,
                       SoPEventType.SUB_FUNCTION_EXECUTE,
                       SoPEventType.SUPER_FUNCTION_EXECUTE,
                       SoPEventType.SUPER_SCHEDULE,
@@ -273,53 +429,131 @@ class SoPSimulationEvaluator:
                       SoPEventType.SCENARIO_RUN,
                       SoPEventType.SCENARIO_STOP,
                       SoPEventType.SCENARIO_UPDATE,
-                      SoPEventType.SCENARIO_DELETE]
+                      SoPEventType.SCENARIO_DELETE}
+
+    def __init__(self, event_log: List[SoPEvent], element_tree_index: SoPElementTreeIndex) -> None:
+        self.element_tree_index = element_tree_index
+
+        # key: id(element)
+        self.element_table: Dict[int, object] = {}
+        self.element_bucket_table: Dict[int, List[SoPEvent]] = {}
+        # key: (id(element), event type)
+        self.type_bucket_table: Dict[Tuple[int, SoPEventType], List[SoPEvent]] = {}
+        # key: (id(middleware), service name)
+        self.service_bucket_table: Dict[Tuple[int, str], List[SoPEvent]] = {}
+        # key: (id(element), event type set)
+        self.merge_cache: Dict[Tuple[int, frozenset], List[SoPEvent]] = {}
+
+        self.build(event_log)
+
+    def add(self, element: object, event: SoPEvent):
+        key = id(element)
+        bucket = self.element_bucket_table.get(key)
+        if bucket is None:
+            self.element_table[key] = element
+            bucket = self.element_bucket_table[key] = []
+        bucket.append(event)
+        self.type_bucket_table.setdefault((key, event.event_type), []).append(event)
+
+    def build(self, event_log: List[SoPEvent]):
+        # element는 event마다 다시 찾지 않도록 event에 기록된 element 객체 단위로 caching한다.
+        find_cache: Dict[int, object] = {}
+
+        def find(element: object) -> object:
+            key = id(element)
+            if key not in find_cache:
+                find_cache[key], _ = self.element_tree_index.find(element)
+            return find_cache[key]
+
+        for event in event_log:
+            event_type = event.event_type
+            if event_type in self.MIDDLEWARE_EVENT:
+                middleware = find(event.middleware_element)
+                self.add(middleware, event)
+                if event_type in self.SERVICE_EVENT:
+                    self.service_bucket_table.setdefault((id(middleware), event.service_element.name), []).append(event)
+            if event_type in self.THING_EVENT:
+                self.add(find(event.thing_element), event)
+            if event_type in self.SCENARIO_EVENT:
+                self.add(find(event.scenario_element), event)
+
+        # event log는 대부분 timestamp 순으로 쌓이므로 순서가 어긋난 bucket만 stable sort 한다.
+        for bucket_table in [self.element_bucket_table, self.type_bucket_table, self.service_bucket_table]:
+            for bucket in bucket_table.values():
+                if any(bucket[i].timestamp > bucket[i + 1].timestamp for i in range(len(bucket) - 1)):
+                    bucket.sort(key=lambda event: event.timestamp)
+
+    def get_element_list(self) -> List[object]:
+        return list(self.element_table.values())
+
+    def get(self, element: object, event_type: Union[SoPEventType, Iterable[SoPEventType]] = None) -> List[SoPEvent]:
+        if event_type is None:
+            return self.element_bucket_table.get(id(element), [])
+        if isinstance(event_type, SoPEventType):
+            return self.type_bucket_table.get((id(element), event_type), [])
+
+        # 여러 event type을 요청한 경우 element bucket의 순서를 유지하도록 filtering한 결과를 caching한다.
+        event_type_set = frozenset(event_type)
+        key = (id(element), event_type_set)
+        if key not in self.merge_cache:
+            self.merge_cache[key] = [event for event in self.element_bucket_table.get(id(element), []) if event.event_type in event_type_set]
+        return self.merge_cache[key]
+
+    def get_service_event_list(self, middleware: SoPMiddlewareElement, service_name: str) -> List[SoPEvent]:
+        return self.service_bucket_table.get((id(middleware), service_name), [])
+
+
+class SoPSimulationEvaluator:
 
-    def __init__(self, simulation_env: SoPMiddlewareElement, event_log: List[SoPEvent], simulation_duration: float, simulation_start_time: float) -> None:
+    MIDDLEWARE_EVENT = SoPEventStore.MIDDLEWARE_EVENT
+    THING_EVENT = SoPEventStore.THING_EVENT
+    SERVICE_EVENT = SoPEventStore.SERVICE_EVENT
+    SCENARIO_EVENT = SoPEventStore.SCENARIO_EVENT
+
+    def __init__(self, simulation_env: SoPMiddlewareElement, event_log: List[SoPEvent], simulation_duration: float, simulation_start_time: float,
+                 event_table: bool = False, online_evaluator: 'SoPOnlineEvaluator' = None) -> None:
         self.simulation_env = simulation_env
         self.simulation_duration = simulation_duration
         self.simulation_start_time = simulation_start_time
         self.event_log = event_log
+        self.element_tree_index = SoPElementTreeIndex(self.simulation_env)
+        self.event_store: SoPEventStore = None
+        # simulation 도중 누적된 scenario별 결과가 있으면 execute cycle을 다시 찾지 않고 사용한다.
+        self.online_evaluator = online_evaluator
+
+        # event_table이 활성화되면 집계값들을 columnar event table 위에서 vectorize하여 계산한다.
+        self.event_table: SoPEventTable = None
+        if event_table:
+            if SoPEventTable.is_available():
+                self.event_table = SoPEventTable(self.event_log)
+            else:
+                SOPTEST_LOG_DEBUG(
+                    f'numpy is not installed. Evaluate without event table', SoPTestLogLevel.WARN)
 
         self.classify_event_log()
 
     def classify_event_log(self):
-        for event in self.event_log:
-            if event.event_type in SoPSimulationEvaluator.MIDDLEWARE_EVENT:
-                middleware, _ = find_element_recursive(
-                    self.simulation_env, event.middleware_element)
-                middleware: SoPMiddlewareElement
-                middleware.event_log.append(event)
-            if event.event_type in SoPSimulationEvaluator.THING_EVENT:
-                thing, _ = find_element_recursive(
-                    self.simulation_env, event.thing_element)
-                thing: SoPThingElement
-                thing.event_log.append(event)
-            if event.event_type in SoPSimulationEvaluator.SCENARIO_EVENT:
-                scenario, _ = find_element_recursive(
-                    self.simulation_env, event.scenario_element)
-                scenario: SoPScenarioElement
-                scenario.event_log.append(event)
+        self.event_store = SoPEventStore(self.event_log, self.element_tree_index)
+
+        # element.event_log를 직접 읽는 곳을 위해 bucket을 그대로 채워둔다.
+        for element in self.event_store.get_element_list():
+            element.event_log.extend(self.event_store.get(element))
 
     def evaluate_service(self, target_middleware: SoPMiddlewareElement, target_service: SoPServiceElement) -> Tuple[str, str, int, float, float]:
 
-        def count_service_call(target_service: SoPServiceElement, event_log: List[SoPEvent]):
-            call_count = 0
-            event_log = [
-                event for event in event_log if event.event_type in SoPSimulationEvaluator.SERVICE_EVENT]
-            for event in event_log:
-                if event.service_element.name == target_service.name:
-                    call_count += 1
-            return call_count
-
-        def cal_service_whole_duration(target_service: SoPServiceElement, event_log: List[SoPEvent]):
-            whole_duration = 0
-            event_log = [
-                event for event in event_log if event.event_type in SoPSimulationEvaluator.SERVICE_EVENT]
-            for event in event_log:
-                if event.service_element.name == target_service.name:
-                    whole_duration += event.duration
-            return whole_duration
+        def count_service_call(target_service: SoPServiceElement, target_middleware: SoPMiddlewareElement):
+            if self.event_table:
+                service_code = self.event_table.find_code('service', target_service.name)
+                call_count, _ = self.event_table.service_usage(target_middleware, SoPSimulationEvaluator.SERVICE_EVENT)
+                return int(call_count[service_code]) if service_code >= 0 else 0
+            return len(self.event_store.get_service_event_list(target_middleware, target_service.name))
+
+        def cal_service_whole_duration(target_service: SoPServiceElement, target_middleware: SoPMiddlewareElement):
+            if self.event_table:
+                service_code = self.event_table.find_code('service', target_service.name)
+                _, whole_duration = self.event_table.service_usage(target_middleware, SoPSimulationEvaluator.SERVICE_EVENT)
+                return float(whole_duration[service_code]) if service_code >= 0 else 0
+            return sum([event.duration for event in self.event_store.get_service_event_list(target_middleware, target_service.name)])
 
         thing_name = ''
         service_name = ''
@@ -333,10 +567,10 @@ class SoPSimulationEvaluator:
                     thing_name = thing.name
                     service_name = service.name
                     call_count = count_service_call(
-                        service, target_middleware.event_log)
+                        service, target_middleware)
                     energy_consumption = service.energy * call_count
                     utilization = cal_service_whole_duration(
-                        service, target_middleware.event_log) / self.simulation_duration
+                        service, target_middleware) / self.simulation_duration
 
         return thing_name, service_name, call_count, energy_consumption, utilization
 
@@ -462,11 +696,77 @@ class SoPSimulationEvaluator:
 
         return execute_cycle_result
 
-    def evaluate_scenario(self, scenario: SoPScenarioElement) -> SoPScenarioResult:
+    def evaluate_execute_cycle_list(self, scenario: SoPScenarioElement, execute_cycle_list: List[List[SoPEvent]]) -> Tuple[List[SoPExecuteCycleResult], 'np.ndarray']:
+        # event table이 있으면 cycle별 (latency, energy, execute time, overhead) 행렬도 함께 반환한다.
+        if not self.event_table:
+            return [self.evaluate_execute_cycle(scenario, execute_cycle) for execute_cycle in execute_cycle_list], None
+        if not execute_cycle_list or len(set([len(execute_cycle) for execute_cycle in execute_cycle_list])) != 1:
+            execute_cycle_result_list = [self.evaluate_execute_cycle(scenario, execute_cycle) for execute_cycle in execute_cycle_list]
+            metric_matrix = np.array([[execute_cycle_result.cycle_latency, execute_cycle_result.cycle_energy, execute_cycle_result.avg_execute_time, execute_cycle_result.overhead]
+                                      for execute_cycle_result in execute_cycle_result_list], dtype=np.float64).reshape(-1, 4)
+            return execute_cycle_result_list, metric_matrix
+
+        # cycle x service 모양의 row index 행렬로 evaluate_execute_cycle과 같은 값을 한번에 계산한다.
+        event_table = self.event_table
+        cycle_num = len(execute_cycle_list)
+        cycle_size = len(execute_cycle_list[0])
+        row_matrix = event_table.rows(
+            [event for execute_cycle in execute_cycle_list for event in execute_cycle]).reshape(cycle_num, cycle_size)
+        service_matrix = event_table.service[row_matrix]
+        duration_matrix = event_table.duration[row_matrix]
+        cycle_energy = event_table.energy[row_matrix].sum(axis=1)
+
+        if not scenario.is_super():
+            cycle_pattern_check = ((service_matrix[:, 0] == event_table.find_code('service', scenario.service_list[0].name)) &
+                                   (service_matrix[:, -1] == event_table.find_code('service', scenario.service_list[-1].name)))
+            first_row = row_matrix[:, 0]
+            last_row = row_matrix[:, -1]
+            avg_execute_time = event_table.avg(duration_matrix, axis=1)
+            overhead = np.zeros(cycle_num)
+        else:
+            scenario_service_pattern = sorted([event_table.find_code('service', service.name)
+                                               for service in scenario.service_list[0].subservice_list + [scenario.service_list[0]]])
+            if len(scenario_service_pattern) == cycle_size:
+                cycle_pattern_check = np.all(np.sort(service_matrix, axis=1) == np.array(scenario_service_pattern), axis=1)
+            else:
+                cycle_pattern_check = np.zeros(cycle_num, dtype=bool)
+
+            event_type_matrix = event_table.event_type[row_matrix]
+            super_mask = event_type_matrix == event_table.event_type_code_table[SoPEventType.SUPER_FUNCTION_EXECUTE]
+            sub_mask = event_type_matrix == event_table.event_type_code_table[SoPEventType.SUB_FUNCTION_EXECUTE]
+            # super execute event가 없는 cycle은 evaluate_execute_cycle에서 처리한다.
+            cycle_pattern_check &= super_mask.any(axis=1)
+            index = np.arange(cycle_num)
+            first_row = row_matrix[index, np.argmax(super_mask, axis=1)]
+            last_row = row_matrix[index, cycle_size - 1 - np.argmax(super_mask[:, ::-1], axis=1)]
+            avg_execute_time = event_table.avg(np.where(super_mask, duration_matrix, 0), axis=1)
+
+        cycle_latency = event_table.timestamp[last_row] - event_table.timestamp[first_row] + event_table.duration[last_row]
+        if scenario.is_super():
+            overhead = cycle_latency - np.where(sub_mask, duration_matrix, 0).sum(axis=1)
+
+        # pattern이 맞지 않거나 period를 넘는 cycle은 error 판정과 log 출력을 위해 evaluate_execute_cycle을 그대로 사용한다.
+        vectorized_mask = cycle_pattern_check & ~(cycle_latency > scenario.period)
+        metric_matrix = np.stack([cycle_latency, cycle_energy, avg_execute_time, overhead], axis=1)
+        execute_cycle_result_list: List[SoPExecuteCycleResult] = []
+        for i, execute_cycle in enumerate(execute_cycle_list):
+            if not vectorized_mask[i]:
+                execute_cycle_result = self.evaluate_execute_cycle(scenario, execute_cycle)
+                execute_cycle_result_list.append(execute_cycle_result)
+                metric_matrix[i] = [execute_cycle_result.cycle_latency, execute_cycle_result.cycle_energy,
+                                    execute_cycle_result.avg_execute_time, execute_cycle_result.overhead]
+                continue
+            execute_cycle_result_list.append(SoPExecuteCycleResult(cycle_latency=float(cycle_latency[i]),
+                                                                   cycle_energy=float(cycle_energy[i]),
+                                                                   avg_execute_time=float(avg_execute_time[i]),
+                                                                   execute_cycle=execute_cycle,
+                                                                   overhead=float(overhead[i]),
+                                                                   error=SoPExecuteCycleErrorType.SUCCESS))
+        return execute_cycle_result_list, metric_matrix
 
-        # 리스트 execute_event_list 안에 다른 리스트 execute_pattern의 패턴을 찾아 리스트로 반환하는 함수
-        # 예를 들어 src_list가 [1, 2, 3, 1, 2, 1, 2, 3, 1]이고 execute_pattern가 [1, 2, 3]이면
-        # [[1, 2, 3], [1,2], [1, 2, 3], [1]]을 반환한다.
+    def evaluate_scenario(self, scenario: SoPScenarioElement) -> SoPScenarioResult:
+        if self.online_evaluator:
+            return self.online_evaluator.scenario_result(scenario)
 
         def find_execute_cycle(execute_event_list: List[SoPEvent], service_pattern: List[SoPServiceElement]) -> List[List[SoPEvent]]:
             '''
@@ -475,44 +775,7 @@ class SoPSimulationEvaluator:
             [[1, 2, 3], [1, 2, 3]]을 반환한다.
             첫번쨰 사이클과 마지막 사이클은 빼고 반환한다. 
             '''
-            result = []
-
-            for i in range(len(execute_event_list)):
-                if any([event.error == SoPErrorType.FAIL for event in [event for event in execute_event_list[i:i+len(service_pattern)] if event.event_type in [SoPEventType.SUPER_FUNCTION_EXECUTE, SoPEventType.FUNCTION_EXECUTE]]]):
-                    # 시나리오 cycle중 fail이 있는 경우 무시한다.
-                    continue
-                sliced_service_list = [
-                    event.service_element for event in execute_event_list[i:i+len(service_pattern)]]
-
-                if any([service.is_super for service in service_pattern]):
-                    super_service_pattern = [
-                        service for service in service_pattern if service.is_super]
-
-                    check_list = []
-
-                    super_service_num = len(super_service_pattern)
-                    start_index = 0
-                    for j in range(super_service_num):
-                        super_service_slot = sliced_service_list[start_index:start_index + len(
-                            super_service_pattern[j].subservice_list) + 1]
-                        super_service_name_check = (super_service_slot[0].name ==
-                                                    super_service_pattern[j].name)
-                        subservice_name_check = (sorted([service.name for service in super_service_slot[1:]]) ==
-                                                 sorted([service.name for service in super_service_pattern[j].subservice_list]))
-                        super_service_slot_check = super_service_name_check and subservice_name_check
-                        check_list.append(super_service_slot_check)
-                        start_index += len(
-                            super_service_pattern[j].subservice_list) + 1
-
-                    service_instance_name_check = all(check_list)
-                else:
-                    service_instance_name_check = ([service.name for service in sliced_service_list] == [
-                        service.name for service in service_pattern])
-
-                if service_instance_name_check:
-                    result.append(execute_event_list[i:i+len(service_pattern)])
-
-            return result[1:-1]
+            return SoPExecuteCycleMatcher(service_pattern).match(execute_event_list)[1:-1]
 
         def get_service_pattern_from_scenario(scenario: SoPScenarioElement):
             service_pattern = []
@@ -522,18 +785,16 @@ class SoPSimulationEvaluator:
                     service_pattern.append(subservice)
             return service_pattern
 
-        whole_execute_event_list: List[SoPEvent] = [
-            event for event in scenario.event_log if event.event_type in [SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUPER_FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE]]
-        schedule_event_list: List[SoPEvent] = [
-            event for event in scenario.event_log if event.event_type == SoPEventType.SUPER_SCHEDULE]
+        whole_execute_event_list: List[SoPEvent] = self.event_store.get(
+            scenario, [SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUPER_FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE])
+        schedule_event_list: List[SoPEvent] = self.event_store.get(
+            scenario, SoPEventType.SUPER_SCHEDULE)
 
         if not scenario.is_super():
-            event_type_list = [
-                event.event_type for event in whole_execute_event_list]
             if len(schedule_event_list) > 0:
                 raise Exception(
                     f'scenario {scenario.name} is super, but super schedule event is found')
-            if SoPEventType.SUPER_FUNCTION_EXECUTE in event_type_list or SoPEventType.SUB_FUNCTION_EXECUTE in event_type_list:
+            if self.event_store.get(scenario, SoPEventType.SUPER_FUNCTION_EXECUTE) or self.event_store.get(scenario, SoPEventType.SUB_FUNCTION_EXECUTE):
                 raise Exception(
                     f'scenario {scenario.name} is local, but subservice event is not found')
 
@@ -550,26 +811,27 @@ class SoPSimulationEvaluator:
         execute_cycle_list = find_execute_cycle(
             execute_event_list=whole_execute_event_list, service_pattern=service_pattern)
 
-        execute_cycle_result_list: List[SoPExecuteCycleResult] = []
-        for execute_cycle in execute_cycle_list[1:-1]:
-            execute_cycle_result = self.evaluate_execute_cycle(
-                scenario, execute_cycle)
-            execute_cycle_result_list.append(
-                execute_cycle_result)
+        execute_cycle_result_list, metric_matrix = self.evaluate_execute_cycle_list(
+            scenario, execute_cycle_list[1:-1])
+
+        if self.event_table:
+            avg_latency, avg_energy, avg_execute_time, avg_overhead = [float(value) for value in self.event_table.avg(metric_matrix, axis=0)]
+            avg_schedule_latency = self.event_table.avg(self.event_table.duration[self.event_table.rows(schedule_event_list)])
+        else:
+            avg_schedule_latency = avg([schedule_event.duration for schedule_event in schedule_event_list])
+            avg_latency = avg([execute_cycle_result.cycle_latency for execute_cycle_result in execute_cycle_result_list])
+            avg_energy = avg([execute_cycle_result.cycle_energy for execute_cycle_result in execute_cycle_result_list])
+            avg_execute_time = avg([execute_cycle_result.avg_execute_time for execute_cycle_result in execute_cycle_result_list])
+            avg_overhead = avg([execute_cycle_result.overhead for execute_cycle_result in execute_cycle_result_list])
 
         scenario_result = SoPScenarioResult(scenario_element=scenario,
                                             execute_cycle_result_list=execute_cycle_result_list,
                                             schedule_event_list=schedule_event_list,
-                                            avg_schedule_latency=avg(
-                                                [schedule_event.duration for schedule_event in schedule_event_list]),
-                                            avg_latency=avg(
-                                                [execute_cycle_result.cycle_latency for execute_cycle_result in execute_cycle_result_list]),
-                                            avg_energy=avg(
-                                                [execute_cycle_result.cycle_energy for execute_cycle_result in execute_cycle_result_list]),
-                                            avg_exeucte_time=avg(
-                                                [execute_cycle_result.avg_execute_time for execute_cycle_result in execute_cycle_result_list]),
-                                            avg_overhead=avg(
-                                                [execute_cycle_result.overhead for execute_cycle_result in execute_cycle_result_list]),
+                                            avg_schedule_latency=avg_schedule_latency,
+                                            avg_latency=avg_latency,
+                                            avg_energy=avg_energy,
+                                            avg_exeucte_time=avg_execute_time,
+                                            avg_overhead=avg_overhead,
                                             error=SoPScenarioErrorType.SUCCESS)
         return scenario_result
 
@@ -632,7 +894,16 @@ class SoPSimulationEvaluator:
                                    avg_execute_time=avg_execute_time,
                                    avg_latency=avg_latency,
                                    avg_energy=avg_energy,
-                                   avg_overhead=avg_overhead)
+                                   avg_overhead=avg_overhead,
+                                   execute_event_list=self.event_store.get(middleware, [SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE]),
+                                   execute_summary=self.evaluate_execute_summary(middleware))
+
+    def evaluate_execute_summary(self, middleware: SoPMiddlewareElement) -> Tuple[int, float]:
+        if self.online_evaluator:
+            return self.online_evaluator.execute_summary(middleware)
+        elif self.event_table:
+            return self.event_table.execute_summary(middleware, [SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE])
+        return None
 
     def evaluate_simulation(self) -> SoPSimulationResult:
 
@@ -749,19 +1020,19 @@ class SoPSimulationEvaluator:
         header = ['time', 'duration', 'event_type', 'level', 'requester_middleware', 'thing',
                   'service(delay)', 'application(period)', 'result', 'return_value', 'return_type']
         table = []
-        for event in target_middleware.event_log:
-            if event.event_type in [SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUPER_FUNCTION_EXECUTE] and not event.duration:
+        for event in self.event_store.get(target_middleware):
+            if event.event_type in {SoPEventType.FUNCTION_EXECUTE, SoPEventType.SUPER_FUNCTION_EXECUTE} and not event.duration:
                 continue
 
             if event.middleware_element:
-                middleware, _ = find_element_recursive(self.simulation_env,
-                                                       event.middleware_element)
+                middleware, _ = self.element_tree_index.find(
+                    event.middleware_element)
             elif event.thing_element:
-                _, middleware = find_element_recursive(
-                    self.simulation_env, event.thing_element)
+                _, middleware = self.element_tree_index.find(
+                    event.thing_element)
             elif event.scenario_element:
-                _, middleware = find_element_recursive(
-                    self.simulation_env, event.scenario_element)
+                _, middleware = self.element_tree_index.find(
+                    event.scenario_element)
 
             middleware: SoPMiddlewareElement
             requester_middleware = event.requester_middleware_name if event.service_element else None
@@ -799,7 +1070,7 @@ class SoPSimulationEvaluator:
         scenario_result_table = []
         count_result_table = []
 
-        acceptance_score = SoPAcceptanceScore(middleware_list)
+        acceptance_score = SoPAcceptanceScore(middleware_list, self.event_store)
 
         scenario_result_table.append([f'total',
                                       f'{simulation_result.get_avg_acceptance_ratio()[0] * 100:.3f}',
@@ -904,7 +1175,7 @@ class SoPSimulationEvaluator:
     def export_csv(self, simulation_result: SoPSimulationResult, label: str, args: dict):
         middleware_list: List[SoPMiddlewareElement] = get_middleware_list_recursive(
             self.simulation_env)
-        acceptance_score = SoPAcceptanceScore(middleware_list)
+        acceptance_score = SoPAcceptanceScore(middleware_list, self.event_store)
 
         if not args.filename:
             filename = f'result_{os.path.basename(os.path.dirname(args.config_path))}'
@@ -965,3 +1236,12 @@ class SoPSimulationEvaluator:
                  f'{simulation_result.total_scenario_cycle_num}',
                  f'{(simulation_result.total_execute_time / simulation_result.total_scenario_cycle_num if simulation_result.total_scenario_cycle_num != 0 else 0):0.2f}'] +
                 acceptance_score.acceptance_ratio_by_cumulative)
+
+    def export_event_table(self, label: str) -> str:
+        if not self.event_table:
+            return None
+
+        os.makedirs('result', exist_ok=True)
+        event_table_path = f'./result/event_table_{label.replace("/", "_")}.npz'
+        self.event_table.save(event_table_path)
+        return event_table_path
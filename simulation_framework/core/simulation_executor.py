@@ -28,6 +28,7 @@ class SoPSimulatorExecutor:
         self.simulation_config = simulation_data['config']
         self.simulation_env = SoPMiddlewareElement().load(
             simulation_data['component'])
+        self.element_tree_index = SoPElementTreeIndex(self.simulation_env)
 
         self.event_handler = SoPEventHandler(simulation_env=self.simulation_env,
                                              event_log=self.event_log,
@@ -35,11 +36,22 @@ class SoPSimulatorExecutor:
                                              mqtt_debug=self.mqtt_debug,
                                              middleware_debug=self.middleware_debug,
                                              running_time=self.simulation_config['running_time'],
-                                             download_logs=self.args.download_logs)
+                                             download_logs=self.args.download_logs,
+                                             worker_num=self.args.worker_num,
+                                             device_concurrency=self.args.device_concurrency,
+                                             ssh_transport_num=self.args.ssh_transport_num,
+                                             ssh_channel_num=self.args.ssh_channel_num,
+                                             thing_host=self.args.thing_host,
+                                             mqtt_async=self.args.mqtt_async,
+                                             online_evaluate=self.args.online_evaluate,
+                                             early_stop_tolerance=self.args.early_stop_tolerance,
+                                             early_stop_min_time=self.args.early_stop_min_time,
+                                             early_stop_max_time=self.args.early_stop_max_time)
         self.event_handler.update_middleware_thing_device_list()
         self.event_handler.init_ssh_client_list()
         self.event_handler.init_mqtt_client_list()
         self.event_handler.event_listener_start()
+        self.event_handler.event_scheduler.start()
 
         self.generate_middleware_file(
             self.simulation_env)
@@ -47,8 +59,8 @@ class SoPSimulatorExecutor:
         self.generate_scenario_file(self.simulation_env)
 
         self.simulation_event_timeline = [SoPEvent(event_type=SoPEventType.get(event['event_type']),
-                                                   element=find_element_by_name_recursive(
-            self.simulation_env, event['element'])[0],
+                                                   element=self.element_tree_index.find_by_name(
+            event['element'])[0],
             timestamp=event['timestamp'],
             duration=event['duration'],
             delay=event['delay'],
@@ -78,7 +90,7 @@ class SoPSimulatorExecutor:
         middleware_scenario_add_timeline_list = []
         for middleware in middleware_list:
             scenario_add_timeline = [
-                event for event in [event for event in whole_scenario_add_timeline if event.event_type == SoPEventType.SCENARIO_ADD] if find_element_recursive(self.simulation_env, event.element)[1].name == middleware.name]
+                event for event in [event for event in whole_scenario_add_timeline if event.event_type == SoPEventType.SCENARIO_ADD] if self.element_tree_index.parent(event.element).name == middleware.name]
             middleware_scenario_add_timeline_list.append(scenario_add_timeline)
 
         scenario_check_timeline_list = [event for event in whole_scenario_add_timeline if event.event_type in [
@@ -97,8 +109,8 @@ class SoPSimulatorExecutor:
         end_index = [event.event_type for event in self.simulation_event_timeline].index(
             SoPEventType.END)
         whole_simulation_timeline = self.simulation_event_timeline[start_index:end_index+1]
-        for event in whole_simulation_timeline:
-            self.event_handler.event_trigger(event)
+        self.event_handler.event_scheduler.schedule_list(whole_simulation_timeline)
+        self.event_handler.event_scheduler.join()
 
     @exception_wrapper
     def start(self):
@@ -118,9 +130,9 @@ class SoPSimulatorExecutor:
             simulation_env)
         for middleware in middleware_list:
             ssh_client = self.event_handler.find_ssh_client(middleware)
-            remote_home_dir = ssh_client.send_command('cd ~ && pwd')[0]
+            remote_home_dir = ssh_client.get_remote_home_dir()
             middleware.middleware_cfg_file(
-                self.simulation_env, remote_home_dir)
+                self.simulation_env, remote_home_dir, self.element_tree_index)
             middleware.mosquitto_conf_file()
             middleware.init_script_file(remote_home_dir)
 
@@ -143,7 +155,7 @@ class SoPSimulatorExecutor:
 
         for thing in thing_list:
             write_file(
-                thing.thing_file_path, thing.thing_code())
+                thing.thing_file_path, json.dumps(thing.thing_spec(), indent=4))
 
     def generate_scenario_file(self, simulation_env: SoPMiddlewareElement):
         scenario_list: List[SoPScenarioElement] = get_scenario_list_recursive(
@@ -154,19 +166,15 @@ class SoPSimulatorExecutor:
 
     def send_middleware_file(self, simulation_env: SoPMiddlewareElement):
 
-        def ssh_task(middleware: SoPMiddlewareElement):
-            ssh_client = self.event_handler.find_ssh_client(middleware)
-            user = middleware.device.user
-            ssh_client.send_command(
-                f'mkdir -p {home_dir_append(middleware.remote_middleware_config_path, user)}')
+        def ssh_task(ssh_client: SoPSSHClient, remote_dir_list: List[str]):
+            ssh_client.send_command_batch(
+                [f'mkdir -p {remote_dir}' for remote_dir in dict.fromkeys(remote_dir_list)])
 
             return True
 
         def send_task(middleware: SoPMiddlewareElement):
             ssh_client = self.event_handler.find_ssh_client(middleware)
             user = middleware.device.user
-            ssh_client.send_command(
-                f'mkdir -p {home_dir_append(middleware.remote_middleware_config_path, user)}')
             ssh_client.send_file(
                 os.path.abspath(middleware.middleware_cfg_file_path), home_dir_append(middleware.remote_middleware_cfg_file_path, user))
             ssh_client.send_file(
@@ -181,43 +189,60 @@ class SoPSimulatorExecutor:
         middleware_list: List[SoPMiddlewareElement] = get_middleware_list_recursive(
             simulation_env)
 
-        pool_map(ssh_task, middleware_list)
+        # device별로 필요한 폴더를 한번의 batch로 생성한 뒤 파일을 전송한다.
+        remote_dir_table: Dict[int, Tuple[SoPSSHClient, List[str]]] = {}
+        for middleware in middleware_list:
+            ssh_client = self.event_handler.find_ssh_client(middleware)
+            _, remote_dir_list = remote_dir_table.setdefault(id(ssh_client), (ssh_client, []))
+            remote_dir_list.append(home_dir_append(middleware.remote_middleware_config_path, middleware.device.user))
+
+        pool_map(ssh_task, list(remote_dir_table.values()))
         pool_map(send_task, middleware_list)
 
         return True
 
-    def send_thing_file(self, simulation_env: SoPMiddlewareElement):
+    def send_thing_file(self, simulation_env: SoPMiddlewareElement, chunk_size: int = 100):
+        # thing spec 파일과 thing_runner.py를 device별로 묶어 chunk_size개씩 하나의 tar stream으로 전송한다.
+        # 같은 host에 대한 동시 전송 수는 SoPSSHClient의 upload semaphore로 제한된다.
+        progress_lock = Lock()
+        sent_thing_num = 0
 
-        def ssh_task(thing: SoPThingElement):
-            ssh_client = self.event_handler.find_ssh_client(thing)
-            user = thing.device.user
-            ssh_client.send_command(
-                f'mkdir -p {home_dir_append(os.path.dirname(thing.remote_thing_file_path), user)}')
+        def send_task(ssh_client: SoPSSHClient, remote_root_path: str, file_table: Dict[str, str]):
+            nonlocal sent_thing_num
 
-            return True
-
-        def send_task(thing: SoPThingElement):
-            ssh_client = self.event_handler.find_ssh_client(thing)
-            user = thing.device.user
-            ssh_client.send_command(
-                f'mkdir -p {home_dir_append(os.path.dirname(thing.remote_thing_file_path), user)}')
-            try:
-                ssh_client.send_file(
-                    os.path.abspath(thing.thing_file_path), home_dir_append(thing.remote_thing_file_path, thing.device.user))
-            except OSError:
-                os.system(
-                    f'sshpass -p "{ssh_client.device.password}" scp -o StrictHostKeyChecking=no -P {ssh_client.device.ssh_port} {os.path.abspath(thing.thing_file_path)} {ssh_client.device.user}@{ssh_client.device.host}:{thing.remote_thing_file_path} > /dev/null 2>&1 &')
+            if not ssh_client.send_tar(file_table, remote_root_path):
+                # tar stream 전송에 실패한 경우 파일을 하나씩 전송한다.
+                for rel_path, local_path in file_table.items():
+                    ssh_client.send_file(local_path, os.path.join(remote_root_path, rel_path))
 
-            SOPTEST_LOG_DEBUG(
-                f'Send thing file {os.path.basename(thing.thing_file_path)}', SoPTestLogLevel.PASS)
+            with progress_lock:
+                sent_thing_num += len(file_table)
+                SOPTEST_LOG_DEBUG(
+                    f'Send thing file to {ssh_client.device.name} ({sent_thing_num}/{len(thing_list)})', SoPTestLogLevel.PASS, progress=sent_thing_num / len(thing_list))
 
             return True
 
         thing_list: List[SoPThingElement] = get_thing_list_recursive(
             simulation_env)
 
-        pool_map(ssh_task, thing_list)
-        pool_map(send_task, thing_list, proc=1)
+        # key: id(ssh_client), value: (ssh_client, {remote 파일 경로: local 파일 경로})
+        device_file_table: Dict[int, Tuple[SoPSSHClient, Dict[str, str]]] = {}
+        for thing in thing_list:
+            ssh_client = self.event_handler.find_ssh_client(thing)
+            _, file_table = device_file_table.setdefault(id(ssh_client), (ssh_client, {}))
+            file_table[home_dir_append(thing.remote_thing_file_path, thing.device.user)] = os.path.abspath(thing.thing_file_path)
+            file_table[home_dir_append(thing.remote_thing_runner_path(), thing.device.user)] = THING_RUNNER_FILE_PATH
+
+        send_task_arg_list = []
+        for ssh_client, file_table in device_file_table.values():
+            remote_root_path = os.path.commonpath([os.path.dirname(remote_path) for remote_path in file_table])
+            remote_path_list = list(file_table.keys())
+            for i in range(0, len(remote_path_list), chunk_size):
+                send_task_arg_list.append((ssh_client, remote_root_path,
+                                           {os.path.relpath(remote_path, remote_root_path): file_table[remote_path]
+                                            for remote_path in remote_path_list[i:i + chunk_size]}))
+
+        pool_map(send_task, send_task_arg_list)
 
         return True
 
@@ -260,8 +260,9 @@ class SoPSimulationGenerator:
             SoPEvent(delay=5, event_type=SoPEventType.DELAY).dict())
 
         # scenario add start
+        element_tree_index = SoPElementTreeIndex(self.simulation_env)
         scenario_add_timeline = [scenario.event(event_type=SoPEventType.SCENARIO_ADD,
-                                                middleware_element=find_element_recursive(self.simulation_env, scenario)[1]).dict() for scenario in scenario_list]
+                                                middleware_element=element_tree_index.parent(scenario)).dict() for scenario in scenario_list]
         event_timeline.extend(
             sorted(scenario_add_timeline, key=lambda x: x['timestamp']))
 
@@ -781,8 +782,8 @@ class SoPThingGenerator(SoPElementGenerator):
                                         is_parallel=is_parallel,
                                         alive_cycle=300,
                                         device=device,
-                                        thing_file_path=f'{simulation_folder_path}/thing/base_thing/{thing_name}.py',
-                                        remote_thing_file_path=f'{self.config.thing_config.remote_thing_folder_path}/base_thing/{thing_name}.py',
+                                        thing_file_path=f'{simulation_folder_path}/thing/base_thing/{thing_name}.json',
+                                        remote_thing_file_path=f'{self.config.thing_config.remote_thing_folder_path}/base_thing/{thing_name}.json',
                                         fail_rate=fail_rate)
                 SOPTEST_LOG_DEBUG(
                     f'generate thing: {thing.name} (level: {thing.level})', SoPTestLogLevel.PASS)
@@ -840,8 +841,8 @@ class SoPThingGenerator(SoPElementGenerator):
                                               is_parallel=True,
                                               alive_cycle=300,
                                               device=device,
-                                              thing_file_path=f'{simulation_folder_path}/thing/super_thing/{thing_name}.py',
-                                              remote_thing_file_path=f'{self.config.thing_config.remote_thing_folder_path}/super_thing/{thing_name}.py',
+                                              thing_file_path=f'{simulation_folder_path}/thing/super_thing/{thing_name}.json',
+                                              remote_thing_file_path=f'{self.config.thing_config.remote_thing_folder_path}/super_thing/{thing_name}.json',
                                               fail_rate=fail_rate)
                 SOPTEST_LOG_DEBUG(
                     f'generate super thing: {super_thing.name} (level: {super_thing.level})', SoPTestLogLevel.PASS)
@@ -2,28 +2,203 @@ from simulation_framework.core.elements import *
 
 import paramiko
 import stat
+import uuid
+import json
+import io
+import tarfile
+import hashlib
+from threading import Lock, Event, BoundedSemaphore
 
 
 def print_progress_status(transferred, toBeTransferred):
     print(f'Progress: {(transferred / toBeTransferred):.2%}', end='\r')
 
 
-class SoPSSHClient:
-    COMMAND_SENDING = 0
-    FILE_UPLOADING = 0
-    FILE_DOWNLOADING = 0
+class SoPCommandResult:
+    def __init__(self, command: str, exit_code: int = None, output: List[str] = []) -> None:
+        self.command = command
+        self.exit_code = exit_code
+        self.output = output
+
+    def success(self) -> bool:
+        return self.exit_code == 0
+
+
+class SoPHostFacts:
+    def __init__(self, home_dir: str = '', os: str = '', arch: str = '', ramdisk: bool = False, toolchain: str = '',
+                 fingerprint: str = '', probe_time: float = 0) -> None:
+        self.home_dir = home_dir
+        self.os = os
+        self.arch = arch
+        self.ramdisk = ramdisk
+        # c++ compiler와 cmake의 version. build cache의 key에 사용된다.
+        self.toolchain = toolchain
+        self.fingerprint = fingerprint
+        self.probe_time = probe_time
+
+    def dict(self) -> dict:
+        return dict(home_dir=self.home_dir, os=self.os, arch=self.arch, ramdisk=self.ramdisk, toolchain=self.toolchain,
+                    fingerprint=self.fingerprint, probe_time=self.probe_time)
+
+
+class SoPHostFactsCache:
+    '''
+    device의 home dir, OS, architecture, ramdisk 여부를 host와 SSH host key fingerprint 기준으로 파일에 저장한다.
+    ttl이 지났거나 fingerprint가 바뀐 경우 (재설치된 device 등) 다시 조회한다.
+    '''
+
+    CACHE_FILE_PATH = os.path.expanduser('~/.cache/sopiot_scheduling_framework/host_facts.json')
+    TTL = 60 * 60 * 24
+
+    lock = Lock()
+    host_facts_table: Dict[str, dict] = None
+
+    @classmethod
+    def load(cls) -> Dict[str, dict]:
+        if cls.host_facts_table is None:
+            try:
+                with open(cls.CACHE_FILE_PATH, 'r') as f:
+                    cls.host_facts_table = json.load(f)
+            except (OSError, ValueError):
+                cls.host_facts_table = {}
+        return cls.host_facts_table
+
+    @classmethod
+    def get(cls, key: str, fingerprint: str) -> SoPHostFacts:
+        with cls.lock:
+            host_facts = cls.load().get(key, None)
+        # 이전 schema로 저장되었거나 일부만 저장된 경우 cache miss로 처리한다.
+        if not isinstance(host_facts, dict) or set(host_facts.keys()) != set(SoPHostFacts().dict().keys()):
+            return None
+        if host_facts['fingerprint'] != fingerprint or time.time() - host_facts['probe_time'] > cls.TTL:
+            return None
+        return SoPHostFacts(**host_facts)
+
+    @classmethod
+    def put(cls, key: str, host_facts: SoPHostFacts):
+        with cls.lock:
+            cls.load()[key] = host_facts.dict()
+            try:
+                os.makedirs(os.path.dirname(cls.CACHE_FILE_PATH), exist_ok=True)
+                with open(cls.CACHE_FILE_PATH, 'w') as f:
+                    json.dump(cls.host_facts_table, f, indent=4)
+            except OSError as e:
+                print_error(e)
+
+
+class SoPFileManifest:
+    '''
+    파일의 상대 경로와 sha256 digest를 저장한다. 원격 폴더에는 MANIFEST_FILE_NAME으로 함께 저장되어,
+    다음 업로드 시 digest가 바뀐 파일만 전송하는 데 사용된다.
+    '''
+
+    MANIFEST_FILE_NAME = '.sop_manifest.json'
+
+    # key: (local_path, mtime, size), value: digest. 같은 파일을 middleware마다 다시 hash하지 않는다.
+    digest_cache: Dict[Tuple[str, float, int], str] = {}
+    digest_cache_lock = Lock()
+
+    def __init__(self, file_table: Dict[str, str] = None, digest_table: Dict[str, str] = None) -> None:
+        # key: 원격 폴더 기준 상대 경로, value: local 파일 경로
+        self.file_table: Dict[str, str] = file_table if file_table else {}
+        self.digest_table: Dict[str, str] = digest_table if digest_table else {}
+
+    @classmethod
+    def file_digest(cls, path: str) -> str:
+        file_stat = os.stat(path)
+        key = (os.path.abspath(path), file_stat.st_mtime, file_stat.st_size)
+        with cls.digest_cache_lock:
+            if key in cls.digest_cache:
+                return cls.digest_cache[key]
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(chunk)
+
+        with cls.digest_cache_lock:
+            cls.digest_cache[key] = sha256.hexdigest()
+        return cls.digest_cache[key]
+
+    @classmethod
+    def from_local(cls, local_dir: str = None, extra_file_table: Dict[str, str] = {}) -> 'SoPFileManifest':
+        file_table = {}
+        if local_dir:
+            for root, dirs, files in os.walk(local_dir):
+                for name in files:
+                    local_file_path = os.path.join(root, name)
+                    file_table[os.path.relpath(local_file_path, local_dir)] = local_file_path
+        file_table.update(extra_file_table)
+
+        return cls(file_table=file_table,
+                   digest_table={rel_path: cls.file_digest(local_path) for rel_path, local_path in file_table.items()})
+
+    @classmethod
+    def from_json(cls, json_string: str) -> 'SoPFileManifest':
+        try:
+            return cls(digest_table=json.loads(json_string))
+        except ValueError:
+            return cls()
+
+    def to_json(self) -> str:
+        return json.dumps(self.digest_table, indent=4, sort_keys=True)
+
+    def diff(self, remote_manifest: 'SoPFileManifest') -> Tuple[List[str], List[str]]:
+        changed_file_list = [rel_path for rel_path, digest in self.digest_table.items()
+                             if remote_manifest.digest_table.get(rel_path, None) != digest]
+        removed_file_list = [rel_path for rel_path in remote_manifest.digest_table
+                             if rel_path not in self.digest_table]
+        return changed_file_list, removed_file_list
 
-    def __init__(self, device: SoPDeviceElement, connect_timeout: float = 10) -> None:
+
+class SoPSSHClient:
+    '''
+    device 하나에 대해 transport_num개의 SSH 연결을 유지하고, command를 연결들에 번갈아 보낸다.
+    host별로 동시에 실행하는 command와 파일 전송의 수는 semaphore로 제한한다.
+    '''
+
+    # key: (host, 'command' | 'upload' | 'download')
+    HOST_SEMAPHORE_TABLE: Dict[Tuple[str, str], BoundedSemaphore] = {}
+    HOST_SEMAPHORE_LOCK = Lock()
+    # key: (host, remote_path). 같은 device의 middleware들이 같은 폴더를 동시에 sync하지 않도록 한다.
+    SYNC_LOCK_TABLE: Dict[Tuple[str, str], Lock] = {}
+
+    def __init__(self, device: SoPDeviceElement, connect_timeout: float = 10,
+                 transport_num: int = 2, channel_num: int = 8, file_transfer_num: int = 4, health_check_interval: float = 10) -> None:
         self._ssh_client = paramiko.SSHClient()
         self._sftp_client = None
+        self._ssh_client_list: List[paramiko.SSHClient] = []
+        self.transport_index = 0
+        self.transport_lock = Lock()
 
         self.device = device
         self.connected = False
         self.sftp_opened = False
         self.connect_timeout = connect_timeout
+        self.use_ssh_config = True
+
+        self.transport_num = transport_num
+        self.channel_num = channel_num
+        self.file_transfer_num = file_transfer_num
+
+        self.health_check_interval = health_check_interval
+        self.health_check_event = Event()
+        self.health_check_thread: SoPThread = None
+
+        # command를 보낸 시점부터 결과를 받기까지 걸린 시간
+        self.command_latency_stat = SoPLatencyStat()
+        self.host_facts: SoPHostFacts = None
 
         self.device.available_port_list = []
 
+    @classmethod
+    def host_semaphore(cls, host: str, kind: str, value: int) -> BoundedSemaphore:
+        with cls.HOST_SEMAPHORE_LOCK:
+            return cls.HOST_SEMAPHORE_TABLE.setdefault((host, kind), BoundedSemaphore(value))
+
+    def get_command_latency(self) -> dict:
+        return self.command_latency_stat.summary()
+
     def available_port(self):
         available_ports = list(range(10000, 65535))
 
@@ -132,39 +307,32 @@ class SoPSSHClient:
         return target_pid_list
 
     def send_command(self, command: Union[List[str], str], ignore_result: bool = False, background: bool = False) -> Union[bool, List[str]]:
-        while not SoPSSHClient.COMMAND_SENDING < 2:
-            time.sleep(THREAD_TIME_OUT)
-
-        SoPSSHClient.COMMAND_SENDING += 1
-
         if isinstance(command, str):
             command = [command]
         if not self.connected:
             self.connect()
 
-        try:
+        with self.host_semaphore(self.device.host, 'command', self.channel_num):
             for item in command:
                 if self.connected:
+                    ssh_client = self.get_ssh_client()
+                    start_time = time.perf_counter()
                     if background:
-                        transport = self._ssh_client.get_transport()
+                        transport = ssh_client.get_transport()
                         channel = transport.open_session()
                         channel.exec_command(item)
                     else:
                         try:
-                            stdin, stdout, stderr = self._ssh_client.exec_command(
+                            stdin, stdout, stderr = ssh_client.exec_command(
                                 item)
                         except Exception as e:
-                            # NOTE: `Secsh channel <int num> open FAILED: open failed: Connect failed` 에러가 발생하여 연결을 다시 수립하는 방식으로 해결
-                            # NOTE: 그러나 해당 방법이 제대로 된 해결법인지는 잘 모르겠음
-                            # NOTE: 반복적으로 send_command가 실행되면 생기는 것으로 보이나 while문으로 똑같은 명령을 반복했을 때는 문제가 생기지 않고 run_middleware를
-                            # NOTE: 반복적으로 실행하면 문제가 생김
+                            # NOTE: `Secsh channel <int num> open FAILED: open failed: Connect failed` 에러가 발생하면 해당 transport만 다시 연결한다.
                             # NOTE: -> mosquitto, middelware를 실행시킬때 백그라운드로 안 시켜서 ssh 세션을 계속 유지하는 것이 문제였다.
 
                             SOPTEST_LOG_DEBUG(
                                 f'Send_command error: {e}', SoPTestLogLevel.FAIL)
-                            self.disconnect()
-                            self.connect()
-                            stdin, stdout, stderr = self._ssh_client.exec_command(
+                            ssh_client = self.reconnect_transport(ssh_client)
+                            stdin, stdout, stderr = ssh_client.exec_command(
                                 item)
                     # SOPTEST_LOG_DEBUG(f'command execute -> {item}', SoPTestLogLevel.PASS)
                     if ignore_result:
@@ -175,7 +343,7 @@ class SoPSSHClient:
                             stdin.flush()
 
                         stdout_result: List[str] = stdout.readlines()
-                        # self.disconnect()
+                        self.command_latency_stat.add(time.perf_counter() - start_time)
                         return [line.strip() for line in stdout_result]
                 else:
                     result = os.popen(item)
@@ -184,30 +352,227 @@ class SoPSSHClient:
                         return True
                     else:
                         return result.read().split('\n')
-        finally:
-            SoPSSHClient.COMMAND_SENDING -= 1
 
-    def send_file(self, local_path: str, remote_path: str):
-        while not SoPSSHClient.FILE_UPLOADING < 10:
-            time.sleep(THREAD_TIME_OUT)
+    def send_command_batch(self, command_list: List[str], stop_on_error: bool = False) -> List[SoPCommandResult]:
+        # 여러 command를 하나의 script로 묶어 한번의 exec로 실행한다.
+        # 각 command는 subshell에서 실행되며, 출력 사이에 marker를 넣어 command별 출력과 exit code를 구분한다.
+        marker = f'__SOP_BATCH_{uuid.uuid4().hex}__'
+        script_line_list = []
+        for i, command in enumerate(command_list):
+            script_line_list.append(f'echo "{marker}:BEGIN:{i}"')
+            script_line_list.append(f'( {command} ); __sop_exit_code=$?')
+            script_line_list.append(f'echo "{marker}:END:{i}:$__sop_exit_code"')
+            if stop_on_error:
+                script_line_list.append(f'[ $__sop_exit_code -eq 0 ] || exit $__sop_exit_code')
+
+        result_list = [SoPCommandResult(command) for command in command_list]
+        output_list: List[str] = []
+        for line in self.send_command('\n'.join(script_line_list)):
+            if line.startswith(f'{marker}:BEGIN:'):
+                output_list = []
+            elif f'{marker}:END:' in line:
+                # command의 출력이 개행으로 끝나지 않으면 END marker가 마지막 출력과 같은 줄에 붙는다.
+                output, end = line.split(f'{marker}:END:')
+                if output:
+                    output_list.append(output)
+                index, exit_code = end.split(':')
+                result_list[int(index)].exit_code = int(exit_code)
+                result_list[int(index)].output = output_list
+                output_list = []
+            else:
+                output_list.append(line)
 
-        SoPSSHClient.FILE_UPLOADING += 1
+        return result_list
 
+    def get_host_facts_key(self) -> str:
+        return f'{self.device.user}@{self.device.host}:{self.device.ssh_port}'
+
+    def get_host_fingerprint(self) -> str:
+        if not self.connected:
+            return 'local'
+
+        transport = self._ssh_client.get_transport()
+        return transport.get_remote_server_key().get_fingerprint().hex()
+
+    def get_host_facts(self, refresh: bool = False) -> SoPHostFacts:
+        if self.host_facts and not refresh:
+            return self.host_facts
+
+        if not self.connected:
+            self.connect()
+
+        fingerprint = self.get_host_fingerprint()
+        host_facts = SoPHostFactsCache.get(self.get_host_facts_key(), fingerprint) if not refresh else None
+        if not host_facts:
+            # 필요한 정보를 한번의 batch로 조회한다.
+            home_dir_result, os_result, arch_result, ramdisk_result, toolchain_result = self.send_command_batch(['cd ~ && pwd',
+                                                                                                                'lsb_release -a 2>/dev/null',
+                                                                                                                'uname -m',
+                                                                                                                'ls /mnt/ramdisk > /dev/null 2>&1',
+                                                                                                                'c++ --version 2>/dev/null | head -n 1; cmake --version 2>/dev/null | head -n 1'])
+            os_line_list = [line for line in os_result.output if line.startswith('Description')]
+            host_facts = SoPHostFacts(home_dir=home_dir_result.output[0],
+                                      os=os_line_list[0].split('\t')[1].strip() if os_line_list else '',
+                                      arch=arch_result.output[0] if arch_result.output else '',
+                                      ramdisk=ramdisk_result.success(),
+                                      toolchain=' / '.join([line for line in toolchain_result.output if line]),
+                                      fingerprint=fingerprint,
+                                      probe_time=time.time())
+            SoPHostFactsCache.put(self.get_host_facts_key(), host_facts)
+
+        self.host_facts = host_facts
+        self.device.host_facts = host_facts
+        return host_facts
+
+    def update_host_facts(self, **kwargs):
+        host_facts = self.get_host_facts()
+        for key, value in kwargs.items():
+            setattr(host_facts, key, value)
+        SoPHostFactsCache.put(self.get_host_facts_key(), host_facts)
+
+    def get_remote_home_dir(self) -> str:
+        return self.get_host_facts().home_dir
+
+    def send_file(self, local_path: str, remote_path: str):
         if not self.sftp_opened:
             self.open_sftp()
 
         SOPTEST_LOG_DEBUG(
             f'Send files: {local_path} -> {remote_path}', SoPTestLogLevel.PASS)
-        try:
-            self._sftp_client.put(local_path, remote_path,
-                                  callback=print_progress_status)
+        with self.host_semaphore(self.device.host, 'upload', self.file_transfer_num):
+            try:
+                self._sftp_client.put(local_path, remote_path,
+                                      callback=print_progress_status)
+                return True
+            except KeyboardInterrupt:
+                return False
+            except Exception as e:
+                print_error(e)
+
+    def send_tar(self, file_table: Dict[str, Union[str, bytes]], remote_path: str) -> bool:
+        # 여러 파일을 하나의 tar stream으로 묶어 한번의 exec로 원격 폴더에 풀어놓는다.
+        # file_table의 value는 local 파일 경로 또는 파일 내용(bytes)이다.
+        # 원격의 build tree에서 make가 바뀐 파일을 다시 build하도록, local 파일의 mtime 대신 전송 시각을 mtime으로 한다.
+        tar_buffer = io.BytesIO()
+        send_time = time.time()
+        with tarfile.open(fileobj=tar_buffer, mode='w:gz') as tar:
+            for rel_path, content in file_table.items():
+                if isinstance(content, bytes):
+                    tar_info = tarfile.TarInfo(rel_path)
+                    tar_info.size = len(content)
+                    tar_info.mtime = send_time
+                    tar.addfile(tar_info, io.BytesIO(content))
+                else:
+                    tar_info = tar.gettarinfo(content, arcname=rel_path)
+                    tar_info.mtime = send_time
+                    with open(content, 'rb') as f:
+                        tar.addfile(tar_info, f)
+        tar_data = tar_buffer.getvalue()
+
+        if not self.connected:
+            os.makedirs(remote_path, exist_ok=True)
+            with tarfile.open(fileobj=io.BytesIO(tar_data), mode='r:gz') as tar:
+                tar.extractall(remote_path)
             return True
-        except KeyboardInterrupt:
+
+        with self.host_semaphore(self.device.host, 'upload', self.file_transfer_num):
+            stdin, stdout, stderr = self.get_ssh_client().exec_command(
+                f'mkdir -p {remote_path} && tar xzmf - -C {remote_path}')
+            stdin.write(tar_data)
+            stdin.flush()
+            stdin.channel.shutdown_write()
+            exit_code = stdout.channel.recv_exit_status()
+
+        if exit_code:
+            SOPTEST_LOG_DEBUG(
+                f'Extract tar stream to {remote_path} of {self.device.name} failed: {"".join(stderr.readlines()).strip()}', SoPTestLogLevel.FAIL)
             return False
-        except Exception as e:
-            print_error(e)
-        finally:
-            SoPSSHClient.FILE_UPLOADING -= 1
+        return True
+
+    def sync_dir(self, local_path: str, remote_path: str, extra_file_table: Dict[str, str] = {}, force: bool = False) -> List[str]:
+        # local 폴더 (+ extra_file_table의 파일)와 원격 폴더의 manifest를 비교하여 바뀐 파일만 전송하고,
+        # local에서 사라진 파일은 원격에서도 삭제한다. 전송한 파일의 상대 경로 목록을 반환한다.
+        # force인 경우 manifest를 사용하지 않고 build cache를 제외한 원격 폴더를 지운 뒤 전체를 전송한다.
+        with SoPSSHClient.HOST_SEMAPHORE_LOCK:
+            sync_lock = SoPSSHClient.SYNC_LOCK_TABLE.setdefault((self.device.host, remote_path), Lock())
+
+        with sync_lock:
+            return self._sync_dir(local_path, remote_path, extra_file_table, force)
+
+    def _sync_dir(self, local_path: str, remote_path: str, extra_file_table: Dict[str, str] = {}, force: bool = False) -> List[str]:
+        local_manifest = SoPFileManifest.from_local(local_path, extra_file_table)
+        remote_manifest_path = f'{remote_path}/{SoPFileManifest.MANIFEST_FILE_NAME}'
+        if force:
+            self.send_command_batch([f'mkdir -p {remote_path} && find {remote_path} -mindepth 1 -maxdepth 1 ! -name .build_cache -exec rm -rf {{}} +'])
+            remote_manifest = SoPFileManifest()
+        else:
+            manifest_result, size_result = self.send_command_batch([f'cat {remote_manifest_path} 2>/dev/null',
+                                                                    f'cd {remote_path} 2>/dev/null && find . -type f -printf "%s %P\\n"'])
+            remote_manifest = SoPFileManifest.from_json('\n'.join(manifest_result.output))
+
+            # manifest는 남아있지만 원격 파일이 지워졌거나 크기가 다른 경우 (직접 수정한 경우 등) 다시 전송한다.
+            remote_size_table: Dict[str, int] = {}
+            for line in size_result.output:
+                size, _, rel_path = line.partition(' ')
+                if size.isdigit():
+                    remote_size_table[rel_path] = int(size)
+            for rel_path in list(remote_manifest.digest_table):
+                local_file_path = local_manifest.file_table.get(rel_path)
+                if local_file_path and remote_size_table.get(rel_path) != os.path.getsize(local_file_path):
+                    remote_manifest.digest_table.pop(rel_path)
+
+        changed_file_list, removed_file_list = local_manifest.diff(remote_manifest)
+        if removed_file_list:
+            self.send_command_batch([f'rm -f {remote_path}/{rel_path}' for rel_path in removed_file_list])
+
+        if changed_file_list or removed_file_list:
+            file_table: Dict[str, Union[str, bytes]] = {rel_path: local_manifest.file_table[rel_path] for rel_path in changed_file_list}
+            file_table[SoPFileManifest.MANIFEST_FILE_NAME] = local_manifest.to_json().encode()
+            if not self.send_tar(file_table, remote_path):
+                # 중간에 실패한 경우 다음 sync에서 전체를 다시 전송하도록 manifest를 지운다.
+                self.send_command(f'rm -f {remote_manifest_path}')
+                raise Exception(f'Sync {local_path} to {self.device.name}:{remote_path} failed')
+
+        SOPTEST_LOG_DEBUG(
+            f'Sync {local_path} -> {self.device.name}:{remote_path}. changed: {len(changed_file_list)}, removed: {len(removed_file_list)}, unchanged: {len(local_manifest.digest_table) - len(changed_file_list)}', SoPTestLogLevel.PASS)
+        return changed_file_list
+
+    def build_cache_path(self, remote_path: str, build_key: str, artifact: str) -> str:
+        return f'{remote_path}/.build_cache/{build_key}/{os.path.basename(artifact)}'
+
+    def has_build_cache(self, remote_path: str, build_key: str, artifact: str) -> bool:
+        return self.send_command_batch([f'test -f {self.build_cache_path(remote_path, build_key, artifact)}'])[0].success()
+
+    def put_build_cache(self, remote_path: str, build_key: str, artifact: str, data: bytes) -> bool:
+        return self.send_tar({f'.build_cache/{build_key}/{os.path.basename(artifact)}': data}, remote_path)
+
+    def read_remote_file(self, remote_path: str) -> bytes:
+        if not self.connected:
+            with open(remote_path, 'rb') as f:
+                return f.read()
+
+        if not self.sftp_opened:
+            self.open_sftp()
+        with self.host_semaphore(self.device.host, 'download', self.file_transfer_num):
+            with self._sftp_client.open(remote_path, 'rb') as f:
+                return f.read()
+
+    def build_with_cache(self, remote_path: str, build_key: str, build_command: str, artifact: str, cache_size: int = 8) -> Tuple[bool, bool]:
+        # remote_path/.build_cache/<build_key>에 build 결과물을 보관한다.
+        # 같은 key로 build된 적이 있으면 build 없이 artifact를 cache의 파일로 symlink만 바꾼다.
+        # build 전에 symlink를 지워, linker가 symlink를 따라가 cache의 파일을 덮어쓰지 않도록 한다.
+        # build_command의 결과물은 내용 기준의 key로 저장되므로, make의 timestamp 비교에 의존하지 않고 전체를 다시 build해야 한다. (e.g. make -B)
+        # 반환값은 (성공 여부, cache hit 여부)이다.
+        cache_dir = f'.build_cache/{build_key}'
+        cached_artifact = f'{cache_dir}/{os.path.basename(artifact)}'
+        build_script = (f'cd {remote_path}; '
+                        f'if [ -f {cached_artifact} ]; then echo BUILD_CACHE_HIT; '
+                        f'else rm -f {artifact}; {build_command} && mkdir -p {cache_dir} && cp {artifact} {cached_artifact}.tmp && mv {cached_artifact}.tmp {cached_artifact}; fi && '
+                        f'ln -sfn $(pwd)/{cached_artifact} {artifact} && touch {cache_dir} && '
+                        f'(ls -1t .build_cache | tail -n +{cache_size + 1} | xargs -r -I{{}} rm -rf .build_cache/{{}})')
+        build_result = self.send_command_batch([build_script])[0]
+
+        return build_result.success(), 'BUILD_CACHE_HIT' in build_result.output
 
     # local_path와 remote_path를 받아서 재귀적으로 폴더를 전송하는 함수
     def send_dir(self, local_path: str, remote_path: str):
@@ -232,11 +597,6 @@ class SoPSSHClient:
                     pass
 
     def get_file(self, remote_path: str, local_path: str, ext_filter: str = ''):
-        while not SoPSSHClient.FILE_DOWNLOADING < 20:
-            time.sleep(THREAD_TIME_OUT)
-
-        SoPSSHClient.FILE_DOWNLOADING += 1
-
         if not self.sftp_opened:
             self.open_sftp()
 
@@ -244,16 +604,15 @@ class SoPSSHClient:
         if remote_path.split('.')[-1] == ext_filter:
             SOPTEST_LOG_DEBUG(
                 f'Download file: {local_path} <- {remote_path}')
-            try:
-                self._sftp_client.get(remote_path, local_path,
-                                      callback=print_progress_status)
-                return True
-            except KeyboardInterrupt:
-                return False
-            except Exception as e:
-                print_error(e)
-            finally:
-                SoPSSHClient.FILE_DOWNLOADING -= 1
+            with self.host_semaphore(self.device.host, 'download', self.file_transfer_num):
+                try:
+                    self._sftp_client.get(remote_path, local_path,
+                                          callback=print_progress_status)
+                    return True
+                except KeyboardInterrupt:
+                    return False
+                except Exception as e:
+                    print_error(e)
         else:
             SOPTEST_LOG_DEBUG(
                 f'{remote_path} is not {ext_filter} file. Skip download...', SoPTestLogLevel.WARN)
@@ -331,7 +690,26 @@ class SoPSSHClient:
             ssh_cfg['hostname'] = self.device.host
             return False
 
+    def connect_transport(self, ssh_client: paramiko.SSHClient, use_ssh_config: bool = True) -> paramiko.SSHClient:
+        ssh_client.set_missing_host_key_policy(
+            paramiko.AutoAddPolicy())
+        ssh_cfg = self.get_ssh_config(use_ssh_config=use_ssh_config)
+
+        if ssh_cfg:
+            ssh_client.connect(
+                **ssh_cfg, timeout=self.connect_timeout)
+        elif self.device.host and self.device.ssh_port and self.device.user and self.device.password:
+            ssh_client.connect(hostname=self.device.host, port=self.device.ssh_port,
+                               username=self.device.user, password=self.device.password, timeout=self.connect_timeout)
+        else:
+            raise SOPTEST_LOG_DEBUG(
+                'Please set the user, host, port, password or locate .ssh/config before connect to ssh host', SoPTestLogLevel.FAIL)
+
+        return ssh_client
+
     def connect(self, use_ssh_config: bool = True, retry: int = 5) -> paramiko.SSHClient:
+        self.use_ssh_config = use_ssh_config
+
         while retry:
             try:
                 if self.connected:
@@ -339,24 +717,24 @@ class SoPSSHClient:
                                       SoPTestLogLevel.WARN)
                     return self._ssh_client
 
-                self._ssh_client.set_missing_host_key_policy(
-                    paramiko.AutoAddPolicy())
-                ssh_cfg = self.get_ssh_config(use_ssh_config=use_ssh_config)
+                self.connect_transport(self._ssh_client, use_ssh_config=use_ssh_config)
+                self._ssh_client_list = [self._ssh_client]
 
-                if ssh_cfg:
-                    self._ssh_client.connect(
-                        **ssh_cfg, timeout=self.connect_timeout)
-                elif self.device.host and self.device.ssh_port and self.device.user and self.device.password:
-                    self._ssh_client.connect(hostname=self.device.host, port=self.device.ssh_port,
-                                             username=self.device.user, password=self.device.password, timeout=self.connect_timeout)
-                else:
-                    raise SOPTEST_LOG_DEBUG(
-                        'Please set the user, host, port, password or locate .ssh/config before connect to ssh host', SoPTestLogLevel.FAIL)
+                # 추가 transport는 연결에 실패해도 기본 transport로 동작한다.
+                for _ in range(self.transport_num - 1):
+                    try:
+                        self._ssh_client_list.append(self.connect_transport(
+                            paramiko.SSHClient(), use_ssh_config=use_ssh_config))
+                    except Exception as e:
+                        SOPTEST_LOG_DEBUG(
+                            f'Extra SSH transport to device {self.device.name} failed: {e}', SoPTestLogLevel.WARN)
+                        break
 
                 SOPTEST_LOG_DEBUG(
-                    f'SSH Connect success to device {self.device.name}.', SoPTestLogLevel.PASS)
+                    f'SSH Connect success to device {self.device.name}. transport: {len(self._ssh_client_list)}', SoPTestLogLevel.PASS)
 
                 self.connected = True
+                self.start_health_check()
 
                 return self._ssh_client
             except Exception as e:
@@ -365,12 +743,66 @@ class SoPSSHClient:
                 time.sleep(1)
 
     def disconnect(self):
+        self.health_check_event.set()
         if self.connected:
-            self._ssh_client.close()
+            self.close_sftp()
+            for ssh_client in self._ssh_client_list:
+                ssh_client.close()
             self.connected = False
 
         return True
 
+    def get_ssh_client(self) -> paramiko.SSHClient:
+        with self.transport_lock:
+            self.transport_index = (self.transport_index + 1) % len(self._ssh_client_list)
+            return self._ssh_client_list[self.transport_index]
+
+    def reconnect_transport(self, ssh_client: paramiko.SSHClient) -> paramiko.SSHClient:
+        # 끊어진 transport 하나만 새로 연결하여 교체한다. 다른 transport의 channel은 영향을 받지 않는다.
+        ssh_client.close()
+        new_ssh_client = self.connect_transport(paramiko.SSHClient(), use_ssh_config=self.use_ssh_config)
+
+        with self.transport_lock:
+            for i, item in enumerate(self._ssh_client_list):
+                if item is ssh_client:
+                    self._ssh_client_list[i] = new_ssh_client
+                    break
+            if ssh_client is self._ssh_client:
+                self._ssh_client = new_ssh_client
+                self._sftp_client = None
+                self.sftp_opened = False
+
+        SOPTEST_LOG_DEBUG(
+            f'SSH transport to device {self.device.name} reconnected.', SoPTestLogLevel.WARN)
+        return new_ssh_client
+
+    def start_health_check(self):
+        if self.health_check_thread or not self.health_check_interval:
+            return
+
+        self.health_check_event.clear()
+        self.health_check_thread = SoPThread(
+            name=f'ssh_health_check_{self.device.name}', target=self.health_check)
+        self.health_check_thread.start()
+
+    def health_check(self):
+        while not self.health_check_event.wait(self.health_check_interval):
+            with self.transport_lock:
+                ssh_client_list = list(self._ssh_client_list)
+
+            for ssh_client in ssh_client_list:
+                try:
+                    transport = ssh_client.get_transport()
+                    if transport and transport.is_active():
+                        transport.send_ignore()
+                    else:
+                        self.reconnect_transport(ssh_client)
+                except Exception as e:
+                    SOPTEST_LOG_DEBUG(
+                        f'SSH health check of device {self.device.name} failed: {e}', SoPTestLogLevel.WARN)
+
+        self.health_check_thread = None
+
     def open_sftp(self):
         if not self.connected:
             self.connect()
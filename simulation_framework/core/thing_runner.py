@@ -0,0 +1,290 @@
+from big_thing_py.big_thing import *
+from big_thing_py.super_thing import *
+
+import json
+import time
+import random
+import argparse
+import threading
+import resource
+
+# thing_runner.py는 simulation framework 없이 원격 device에서 단독으로 실행된다.
+# 각 thing은 SoPThingElement.thing_spec()으로 생성된 spec 파일을 읽어 같은 동작을 수행한다.
+# --host_mode로 실행하면 하나의 process가 control fifo로 전달되는 명령에 따라 여러 thing을 thread로 실행한다.
+
+
+def rename_func(func: Callable, name: str) -> Callable:
+    # SoPService는 func.__name__을, SoPSuperThing.req()는 호출한 frame의 co_name을 service 이름으로 사용한다.
+    func.__code__ = func.__code__.replace(co_name=name)
+    func.__name__ = name
+    func.__qualname__ = name
+    return func
+
+
+def make_function(service_spec: dict, fail_rate: float, thing_state: dict) -> Callable:
+    # thing_state는 thing마다 생성된다. host mode에서는 여러 thing이 같은 이름의 service를 가질 수 있다.
+    name = service_spec['name']
+    execute_time = service_spec['execute_time']
+    energy = service_spec['energy']
+    thing_state['service_fail_flag'][name] = False
+
+    def function() -> str:
+        SOPLOG_DEBUG(f'function {name} run... return {service_spec["return_value"]}')
+
+        if thing_state['start_time'] == 0:
+            thing_state['start_time'] = get_current_time()
+
+        if random.uniform(0, 1) < fail_rate or thing_state['service_fail_flag'][name]:
+            thing_state['service_fail_flag'][name] = True
+            raise Exception('fail error')
+
+        time.sleep(execute_time)
+        return f'execute_time: {execute_time:.3f}, energy: {int(energy)}'
+
+    return rename_func(function, name)
+
+
+def make_super_function(service_spec: dict) -> Callable:
+    name = service_spec['name']
+
+    def super_function(self: SoPSuperThing, key) -> str:
+        SOPLOG_DEBUG(f'super function {name} run...')
+        results = []
+        for subrequest in service_spec['subrequest_list']:
+            results += [self.req(key, subfunction_name=subrequest['subfunction_name'], tag_list=subrequest['tag_list'], arg_list=(),
+                                 service_type=SoPServiceType.FUNCTION, policy=SoPPolicy[subrequest['policy']])]
+
+        execute_time_sum = 0
+        energy_sum = 0
+        if results:
+            for result in results:
+                for subresult in result:
+                    if subresult['return_value'] is None:
+                        continue
+                    execute_time = float(subresult['return_value'].split(",")[0].split(": ")[1])
+                    energy = int(subresult['return_value'].split(",")[1].split(": ")[1])
+                    execute_time_sum += execute_time
+                    energy_sum += energy
+
+            return f"execute_time: {execute_time_sum}, energy: {energy_sum}"
+        else:
+            raise Exception('super execute fail...')
+
+    return rename_func(super_function, name)
+
+
+class SoPSpecSuperThing(SoPSuperThing):
+
+    def __init__(self, thing_spec: dict, name: str, alive_cycle: float, ip: str, port: int, refresh_cycle: float, retry_register: bool, log_dir: str = './log'):
+        function_list = []
+        for service_spec in thing_spec['service_list']:
+            super_function = make_super_function(service_spec)
+            # req()가 self를 통해 호출되도록 instance에 bound method로 등록한다.
+            setattr(self, service_spec['name'], super_function.__get__(self))
+            function_list.append(SoPSuperFunction(func=getattr(self, service_spec['name']), return_type=SoPType.STRING,
+                                                  tag_list=[SoPTag(tag) for tag in service_spec['tag_list']], arg_list=[],
+                                                  exec_time=service_spec['execute_time'], timeout=600, energy=service_spec['energy']))
+
+        super().__init__(name=name, service_list=function_list, alive_cycle=alive_cycle, is_super=True, is_parallel=thing_spec['is_parallel'],
+                         ip=ip, port=port, ssl_ca_path=None, ssl_enable=None, log_name=os.path.join(log_dir, f'{thing_spec["name"]}.log'), log_mode=SoPPrintMode.ABBR,
+                         append_mac_address=False, refresh_cycle=refresh_cycle, retry_register=retry_register)
+
+
+def generate_thing(thing_spec: dict, args) -> SoPBigThing:
+    if thing_spec['is_super']:
+        return SoPSpecSuperThing(thing_spec, name=args.name, alive_cycle=args.alive_cycle, ip=args.host, port=args.port,
+                                 refresh_cycle=args.refresh_cycle, retry_register=args.retry_register, log_dir=args.log_dir)
+
+    thing_state = dict(start_time=0, service_fail_flag={})
+    function_list = [SoPFunction(func=make_function(service_spec, thing_spec['fail_rate'], thing_state), return_type=SoPType.STRING,
+                                 tag_list=[SoPTag(tag) for tag in service_spec['tag_list']], arg_list=[],
+                                 exec_time=service_spec['execute_time'], timeout=600, energy=service_spec['energy'])
+                     for service_spec in thing_spec['service_list']]
+    return SoPBigThing(name=args.name, service_list=function_list,
+                       alive_cycle=args.alive_cycle, is_super=False, is_parallel=thing_spec['is_parallel'], ip=args.host, port=args.port,
+                       ssl_ca_path=None, ssl_enable=None, append_mac_address=False, log_name=os.path.join(args.log_dir, f'{thing_spec["name"]}.log'), log_mode=SoPPrintMode.ABBR,
+                       retry_register=args.retry_register)
+
+
+class SoPThingHost:
+    '''
+    device별로 하나만 실행되어 여러 thing을 각각의 thread에서 실행하는 process.
+    control fifo로 한 줄씩 명령을 받는다.
+        RUN <name> <spec_path> <host> <port> <alive_cycle>
+        KILL <name>         unregister 없이 MQTT 연결을 끊는다. (kill -9와 같은 효과)
+        UNREGISTER <name>   unregister 후 종료한다. (kill -2와 같은 효과)
+        STATUS              thing별 resource 사용량을 status 파일에 기록한다.
+        EXIT
+    '''
+
+    CLOCK_TICK = os.sysconf('SC_CLK_TCK')
+
+    def __init__(self, fifo_path: str, status_path: str, refresh_cycle: float = 60) -> None:
+        self.fifo_path = fifo_path
+        self.status_path = status_path
+        self.refresh_cycle = refresh_cycle
+
+        self.lock = threading.Lock()
+        # key: thing name
+        self.thing_table: Dict[str, SoPBigThing] = {}
+        self.thread_table: Dict[str, threading.Thread] = {}
+        self.start_time_table: Dict[str, float] = {}
+
+    def run_thing(self, name: str, spec_path: str, host: str, port: int, alive_cycle: float):
+        with open(spec_path, 'r') as f:
+            thing_spec = json.load(f)
+        # 단독으로 실행될 때와 같이 thing의 log는 spec 파일이 있는 폴더의 log 폴더에 저장한다.
+        args = argparse.Namespace(name=name, host=host, port=port, alive_cycle=alive_cycle,
+                                  refresh_cycle=self.refresh_cycle, retry_register=True,
+                                  log_dir=os.path.join(os.path.dirname(os.path.abspath(spec_path)), 'log'))
+
+        def task():
+            thing = generate_thing(thing_spec, args)
+            with self.lock:
+                self.thing_table[name] = thing
+            thing.setup(avahi_enable=False)
+            thing.run()
+
+        thread = threading.Thread(target=task, name=f'thing_host_{name}', daemon=True)
+        with self.lock:
+            self.thread_table[name] = thread
+            self.start_time_table[name] = time.time()
+        thread.start()
+
+    def stop_thing(self, name: str, unregister: bool):
+        with self.lock:
+            thing = self.thing_table.pop(name, None)
+            self.thread_table.pop(name, None)
+            self.start_time_table.pop(name, None)
+        if not thing:
+            return False
+
+        if unregister:
+            return thing.wrapup()
+
+        thing._g_exit.set()
+        thing._g_comm_exit.set()
+        try:
+            thing._mqtt_client.loop_stop()
+            thing._mqtt_client.socket().close()
+        except Exception as e:
+            print_error(e)
+        return True
+
+    def thread_cpu_time(self, native_id: int) -> float:
+        try:
+            with open(f'/proc/self/task/{native_id}/stat', 'r') as f:
+                stat = f.read().rsplit(')', 1)[1].split()
+            # utime, stime (clock tick)
+            return (int(stat[11]) + int(stat[12])) / self.CLOCK_TICK
+        except (OSError, IndexError, ValueError):
+            return 0
+
+    def status(self) -> dict:
+        thing_status_list = []
+        with self.lock:
+            for name, thread in self.thread_table.items():
+                thing = self.thing_table.get(name)
+                # thing이 생성한 thread들의 CPU 시간을 합산한다.
+                thread_list = [thread]
+                if thing:
+                    thread_list += [sop_thread._thread for sop_thread in thing._comm_thread_list + thing._thread_list]
+                    if getattr(thing._mqtt_client, '_thread', None):
+                        thread_list.append(thing._mqtt_client._thread)
+                alive_thread_list = [thread for thread in thread_list if thread.is_alive() and thread.native_id]
+                thing_status_list.append(dict(name=name,
+                                              alive=thread.is_alive(),
+                                              registered=bool(thing and thing._registered),
+                                              thread_num=len(alive_thread_list),
+                                              cpu_time=sum([self.thread_cpu_time(thread.native_id) for thread in alive_thread_list]),
+                                              uptime=time.time() - self.start_time_table[name]))
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return dict(pid=os.getpid(),
+                    max_rss=usage.ru_maxrss,
+                    cpu_time=usage.ru_utime + usage.ru_stime,
+                    thread_num=threading.active_count(),
+                    thing_list=thing_status_list)
+
+    def handle(self, line: str) -> bool:
+        command = line.split()
+        if not command:
+            return True
+
+        if command[0] == 'RUN' and len(command) == 6:
+            self.run_thing(command[1], command[2], command[3], int(command[4]), float(command[5]))
+        elif command[0] == 'KILL' and len(command) == 2:
+            threading.Thread(target=self.stop_thing, args=(command[1], False), daemon=True).start()
+        elif command[0] == 'UNREGISTER' and len(command) == 2:
+            threading.Thread(target=self.stop_thing, args=(command[1], True), daemon=True).start()
+        elif command[0] == 'STATUS':
+            # 읽는 쪽이 쓰다 만 파일을 읽지 않도록 rename으로 교체한다.
+            with open(f'{self.status_path}.tmp', 'w') as f:
+                json.dump(self.status(), f)
+            os.replace(f'{self.status_path}.tmp', self.status_path)
+        elif command[0] == 'EXIT':
+            return False
+        else:
+            print(f'Unknown command: {line.strip()}')
+
+        return True
+
+    def serve(self):
+        if not os.path.exists(self.fifo_path):
+            os.mkfifo(self.fifo_path)
+
+        while True:
+            # 모든 writer가 닫으면 EOF가 되므로 다시 연다.
+            with open(self.fifo_path, 'r') as fifo:
+                for line in fifo:
+                    if not self.handle(line):
+                        return
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spec", '-f', action='store', type=str,
+                        required=False, default=None, help="thing spec file path")
+    parser.add_argument("--host_mode", action='store_true',
+                        required=False, help="run as thing host process")
+    parser.add_argument("--fifo", action='store', type=str,
+                        required=False, default='./thing_host.fifo', help="thing host control fifo path")
+    parser.add_argument("--status", action='store', type=str,
+                        required=False, default='./thing_host_status.json', help="thing host status file path")
+    parser.add_argument("--name", '-n', action='store', type=str,
+                        required=False, default=None, help="thing name")
+    parser.add_argument("--host", '-ip', action='store', type=str,
+                        required=False, default='localhost', help="host name")
+    parser.add_argument("--port", '-p', action='store', type=int,
+                        required=False, default=1883, help="port")
+    parser.add_argument("--alive_cycle", '-ac', action='store', type=float,
+                        required=False, default=60, help="alive cycle")
+    parser.add_argument("--refresh_cycle", '-rc', action='store', type=float,
+                        required=False, default=60, help="refresh cycle")
+    parser.add_argument("--retry_register", action='store_true',
+                        required=False, help="retry register feature enable")
+    parser.add_argument("--log_dir", action='store', type=str,
+                        required=False, default='./log', help="thing log directory")
+    args, unknown = parser.parse_known_args()
+
+    return args
+
+
+def main():
+    args = arg_parse()
+    if args.host_mode:
+        SoPThingHost(args.fifo, args.status, args.refresh_cycle).serve()
+        return
+
+    with open(args.spec, 'r') as f:
+        thing_spec = json.load(f)
+    if not args.name:
+        args.name = thing_spec['name']
+
+    thing = generate_thing(thing_spec, args)
+    thing.setup(avahi_enable=False)
+    thing.run()
+
+
+if __name__ == '__main__':
+    main()
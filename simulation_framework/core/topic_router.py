@@ -0,0 +1,149 @@
+from simulation_framework.utils import *
+
+from collections import deque
+from threading import Lock
+from concurrent.futures import Future, CancelledError, TimeoutError as FutureTimeoutError, as_completed
+
+
+def topic_match(filter_list: List[str], topic_list: List[str]) -> bool:
+    # MQTT topic filter 규칙: '+'는 한 단계, '#'는 마지막에 위치하며 0개 이상의 단계와 일치한다.
+    for i, segment in enumerate(filter_list):
+        if segment == '#':
+            return True
+        if i >= len(topic_list):
+            return False
+        if segment != '+' and segment != topic_list[i]:
+            return False
+
+    return len(filter_list) == len(topic_list)
+
+
+def topic_cover(filter_list: List[str], target_filter_list: List[str]) -> bool:
+    # target topic filter와 일치하는 모든 topic이 filter와도 일치하는지 확인한다.
+    for i, segment in enumerate(filter_list):
+        if segment == '#':
+            return True
+        if i >= len(target_filter_list) or target_filter_list[i] == '#':
+            return False
+        if segment != '+' and segment != target_filter_list[i]:
+            return False
+
+    return len(filter_list) == len(target_filter_list)
+
+
+class SoPTopicRouter:
+    '''
+    topic의 prefix를 segment 단위의 trie로 관리하여, 수신한 topic에 해당하는 handler를 찾는다.
+    탐색 비용은 등록된 protocol의 개수가 아닌 topic의 깊이에만 비례한다.
+    '''
+
+    # trie의 각 node는 {segment: child node} 형태의 dict이며, handler는 HANDLER_KEY에 저장된다.
+    HANDLER_KEY = None
+
+    def __init__(self) -> None:
+        self.root: dict = {}
+        self.prefix_list: List[str] = []
+
+    def register(self, prefix: Union[SoPProtocolType, str], handler: Callable) -> bool:
+        if not isinstance(prefix, str):
+            prefix = prefix.get_prefix()
+
+        node = self.root
+        for segment in prefix.split('/'):
+            node = node.setdefault(segment, {})
+
+        # NOTE: 같은 prefix를 가진 protocol이 여러개인 경우 (e.g. ME_RESULT_ADD_SCENARIO, ME_RESULT_UPDATE_SCENARIO)
+        # 기존 if/elif chain과 동일하게 먼저 등록된 handler를 사용한다.
+        if self.HANDLER_KEY in node:
+            return False
+
+        node[self.HANDLER_KEY] = handler
+        self.prefix_list.append(prefix)
+        return True
+
+    def route(self, topic_list: List[str]) -> Callable:
+        handler_key = self.HANDLER_KEY
+        node = self.root
+        handler = None
+        for segment in topic_list:
+            node = node.get(segment)
+            if node is None:
+                break
+            handler = node.get(handler_key, handler)
+
+        return handler
+
+
+class SoPExpectTable:
+    '''
+    expect()를 호출한 쪽이 기다리는 topic filter를 element별로 등록하고 Future를 돌려받는다.
+    메시지가 수신되면 먼저 등록된 waiter부터 filter와 비교하여 일치하는 Future 하나를 완료시킨다.
+    기다리는 waiter가 없는 메시지는 expect()가 나중에 호출되는 경우를 위해 element별로 buffer_size개까지 보관한다.
+    '''
+
+    def __init__(self, buffer_size: int = 256) -> None:
+        self.buffer_size = buffer_size
+        self.lock = Lock()
+
+        # key: id(element)
+        self.waiter_table: Dict[int, List[Tuple[List[str], Future]]] = {}
+        self.buffer_table: Dict[int, deque] = {}
+
+    def expect(self, element: object, target_topic: str = None) -> Future:
+        future = Future()
+        filter_list = target_topic.split('/') if target_topic else None
+
+        with self.lock:
+            buffer = self.buffer_table.get(id(element))
+            if buffer:
+                for msg in buffer:
+                    if filter_list is None or topic_match(filter_list, msg.topic.split('/')):
+                        buffer.remove(msg)
+                        future.set_result(msg)
+                        return future
+
+            self.waiter_table.setdefault(id(element), []).append((filter_list, future))
+
+        return future
+
+    def resolve(self, element: object, msg: mqtt.MQTTMessage) -> bool:
+        topic_list = msg.topic.split('/')
+        target_future = None
+
+        with self.lock:
+            waiter_list = self.waiter_table.get(id(element), [])
+            for i, (filter_list, future) in enumerate(waiter_list):
+                if filter_list is None or topic_match(filter_list, topic_list):
+                    target_future = future
+                    del waiter_list[i]
+                    break
+            else:
+                self.buffer_table.setdefault(id(element), deque(maxlen=self.buffer_size)).append(msg)
+                return False
+
+        target_future.set_result(msg)
+        return True
+
+    def cancel(self, element: object, future: Future) -> bool:
+        with self.lock:
+            waiter_list = self.waiter_table.get(id(element), [])
+            for i, (_, waiter_future) in enumerate(waiter_list):
+                if waiter_future is future:
+                    del waiter_list[i]
+                    break
+            else:
+                return False
+
+        return future.cancel()
+
+    def cancel_all(self):
+        with self.lock:
+            future_list = [future for waiter_list in self.waiter_table.values() for _, future in waiter_list]
+            self.waiter_table.clear()
+
+        for future in future_list:
+            future.cancel()
+
+    def get_waiter_num(self) -> int:
+        with self.lock:
+            return sum([len(waiter_list) for waiter_list in self.waiter_table.values()])
@@ -0,0 +1,125 @@
+from simulation_framework.core.elements import *
+
+from collections import deque
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, Future
+
+
+class SoPWorkerTask:
+    def __init__(self, func: Callable, args: tuple, device_key: tuple = None, task_type: str = None) -> None:
+        self.func = func
+        self.args = args
+        self.device_key = device_key
+        self.task_type = task_type
+        self.future = Future()
+
+
+class SoPWorkerPool:
+    '''
+    event handler들이 공유하는 크기가 제한된 thread pool.
+    같은 device에 대해서는 동시에 device_concurrency개의 task만 실행하며, 초과한 task는 device별 대기열에서 기다린다.
+    '''
+
+    def __init__(self, worker_num: int = 64, device_concurrency: int = 8) -> None:
+        self.worker_num = worker_num
+        self.device_concurrency = device_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=worker_num, thread_name_prefix='event_worker')
+
+        self.lock = Lock()
+        self.device_running_table: Dict[tuple, int] = {}
+        self.device_waiting_table: Dict[tuple, deque] = {}
+
+        # metric
+        self.pending_task_num = 0
+        self.active_worker_num = 0
+        self.task_latency_table: Dict[str, SoPLatencyStat] = {}
+
+    def submit(self, func: Callable, *args, device_key: tuple = None, task_type: str = None) -> Future:
+        task = SoPWorkerTask(func, args, device_key, task_type if task_type else func.__name__)
+
+        with self.lock:
+            self.pending_task_num += 1
+            if device_key is not None and self.device_running_table.get(device_key, 0) >= self.device_concurrency:
+                self.device_waiting_table.setdefault(device_key, deque()).append(task)
+                return task.future
+            if device_key is not None:
+                self.device_running_table[device_key] = self.device_running_table.get(device_key, 0) + 1
+
+        self.executor.submit(self.run_task, task)
+        return task.future
+
+    def run_task(self, task: SoPWorkerTask):
+        with self.lock:
+            self.pending_task_num -= 1
+            self.active_worker_num += 1
+
+        start_time = time.perf_counter()
+        try:
+            task.future.set_result(task.func(*task.args))
+        except Exception as e:
+            print_error(e)
+            task.future.set_exception(e)
+        finally:
+            latency = time.perf_counter() - start_time
+            next_task = None
+            with self.lock:
+                self.active_worker_num -= 1
+                self.task_latency_table.setdefault(task.task_type, SoPLatencyStat()).add(latency)
+                if task.device_key is not None:
+                    waiting_task_queue = self.device_waiting_table.get(task.device_key)
+                    if waiting_task_queue:
+                        # device의 실행 slot을 대기 중인 다음 task에게 넘긴다.
+                        next_task = waiting_task_queue.popleft()
+                    else:
+                        self.device_running_table[task.device_key] -= 1
+
+            if next_task:
+                self.executor.submit(self.run_task, next_task)
+
+    def shutdown(self, wait: bool = False):
+        self.executor.shutdown(wait=wait)
+
+    def get_queue_depth(self) -> int:
+        return self.pending_task_num
+
+    def get_active_worker_num(self) -> int:
+        return self.active_worker_num
+
+    def get_task_latency(self) -> Dict[str, dict]:
+        with self.lock:
+            return {task_type: latency_stat.summary() for task_type, latency_stat in self.task_latency_table.items()}
+
+
+class SoPRetryPolicy:
+    '''
+    실패한 작업을 재귀 호출 대신 최대 max_retry번, 지수적으로 증가하는 backoff 간격으로 재시도한다.
+    '''
+
+    def __init__(self, max_retry: int = 3, backoff: float = 1.0, backoff_factor: float = 2.0, max_backoff: float = 10.0) -> None:
+        self.max_retry = max_retry
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    def run(self, func: Callable[[], bool], on_fail: Callable[[], Any] = None, label: str = '') -> bool:
+        backoff = self.backoff
+        for retry in range(self.max_retry + 1):
+            try:
+                if func():
+                    return True
+            except Exception as e:
+                print_error(e)
+
+            if on_fail:
+                on_fail()
+            if retry == self.max_retry:
+                break
+
+            SOPTEST_LOG_DEBUG(
+                f'{label} failed. retry {retry + 1}/{self.max_retry} after {backoff:.1f} sec', SoPTestLogLevel.WARN)
+            time.sleep(backoff)
+            backoff = min(backoff * self.backoff_factor, self.max_backoff)
+
+        SOPTEST_LOG_DEBUG(
+            f'{label} failed after {self.max_retry} retries', SoPTestLogLevel.FAIL)
+        return False
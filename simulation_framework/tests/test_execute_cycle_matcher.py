@@ -0,0 +1,138 @@
+from simulation_framework.core.simulation_evaluator import *
+
+import pytest
+
+
+def old_find_execute_cycle(execute_event_list: List[SoPEvent], service_pattern: List[SoPServiceElement]) -> List[List[SoPEvent]]:
+    # SoPExecuteCycleMatcher 이전의 sliding window 구현 (첫번째, 마지막 사이클을 빼기 전)
+    result = []
+
+    for i in range(len(execute_event_list)):
+        if any([event.error == SoPErrorType.FAIL for event in [event for event in execute_event_list[i:i+len(service_pattern)] if event.event_type in [SoPEventType.SUPER_FUNCTION_EXECUTE, SoPEventType.FUNCTION_EXECUTE]]]):
+            continue
+        sliced_service_list = [
+            event.service_element for event in execute_event_list[i:i+len(service_pattern)]]
+
+        if any([service.is_super for service in service_pattern]):
+            super_service_pattern = [
+                service for service in service_pattern if service.is_super]
+
+            check_list = []
+
+            super_service_num = len(super_service_pattern)
+            start_index = 0
+            for j in range(super_service_num):
+                super_service_slot = sliced_service_list[start_index:start_index + len(
+                    super_service_pattern[j].subservice_list) + 1]
+                super_service_name_check = (super_service_slot[0].name ==
+                                            super_service_pattern[j].name)
+                subservice_name_check = (sorted([service.name for service in super_service_slot[1:]]) ==
+                                         sorted([service.name for service in super_service_pattern[j].subservice_list]))
+                super_service_slot_check = super_service_name_check and subservice_name_check
+                check_list.append(super_service_slot_check)
+                start_index += len(
+                    super_service_pattern[j].subservice_list) + 1
+
+            service_instance_name_check = all(check_list)
+        else:
+            service_instance_name_check = ([service.name for service in sliced_service_list] == [
+                service.name for service in service_pattern])
+
+        if service_instance_name_check:
+            result.append(execute_event_list[i:i+len(service_pattern)])
+
+    return result
+
+
+def get_service_pattern(service_list: List[SoPServiceElement]) -> List[SoPServiceElement]:
+    service_pattern = []
+    for service in service_list:
+        service_pattern.append(service)
+        service_pattern.extend(service.subservice_list)
+    return service_pattern
+
+
+def generate_case(rand: random.Random, event_num: int) -> Tuple[List[SoPServiceElement], List[SoPEvent]]:
+    # 겹치는 cycle이 자주 생기도록 작은 이름 집합을 사용하고, 정상 cycle 사이에 잡음 event를 섞는다.
+    name_list = ['a', 'b', 'c', 'd']
+    if rand.random() < 0.5:
+        service_list = [SoPServiceElement(name=rand.choice(name_list)) for _ in range(rand.randint(1, 5))]
+        execute_type_list = [SoPEventType.FUNCTION_EXECUTE]
+    else:
+        service_list = [SoPServiceElement(name=f's{i}', is_super=True,
+                                          subservice_list=[SoPServiceElement(name=rand.choice(name_list)) for _ in range(rand.randint(1, 4))])
+                        for i in range(rand.randint(1, 2))]
+        execute_type_list = [SoPEventType.SUPER_FUNCTION_EXECUTE, SoPEventType.SUB_FUNCTION_EXECUTE]
+    service_pattern = get_service_pattern(service_list)
+
+    event_list = []
+    while len(event_list) < event_num:
+        if rand.random() < 0.6:
+            cycle = list(service_pattern)
+            if rand.random() < 0.3:
+                rand.shuffle(cycle)
+        else:
+            cycle = [rand.choice(service_pattern + [SoPServiceElement(name=rand.choice(name_list))]) for _ in range(rand.randint(1, 3))]
+        for service in cycle:
+            event_type = SoPEventType.SUPER_FUNCTION_EXECUTE if service.is_super else rand.choice(execute_type_list)
+            error = rand.choice([SoPErrorType.NO_ERROR] * 8 + [SoPErrorType.FAIL, None])
+            event_list.append(SoPEvent(event_type=event_type, service_element=service, timestamp=len(event_list), duration=1, error=error))
+    return service_pattern, event_list[:event_num]
+
+
+def cycle_id_list(cycle_list: List[List[SoPEvent]]) -> List[List[int]]:
+    return [[id(event) for event in cycle] for cycle in cycle_list]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_matcher_equivalence(seed: int):
+    # 기존 구현이 IndexError를 내는 경우 (super service가 여러개이고 끝부분 slot이 빈 경우)는 비교하지 않는다.
+    rand = random.Random(seed)
+    case_num = 0
+    for _ in range(1000):
+        service_pattern, event_list = generate_case(rand, rand.randint(0, 40))
+        try:
+            expected = old_find_execute_cycle(event_list, service_pattern)
+        except IndexError:
+            continue
+        actual = SoPExecuteCycleMatcher(service_pattern).match(event_list)
+        assert cycle_id_list(actual) == cycle_id_list(expected), \
+            f'pattern: {[service.name for service in service_pattern]}, events: {[event.service_element.name for event in event_list]}'
+        case_num += 1
+
+    assert case_num > 0
+
+
+def test_matcher_feed_equals_match():
+    # event를 하나씩 feed한 결과는 한번에 match한 결과와 같아야 한다.
+    rand = random.Random(0)
+    for _ in range(200):
+        service_pattern, event_list = generate_case(rand, rand.randint(0, 40))
+        matcher = SoPExecuteCycleMatcher(service_pattern)
+        fed = []
+        for event in event_list:
+            fed.extend(matcher.feed(event))
+        fed.extend(matcher.finish())
+        assert cycle_id_list(fed) == cycle_id_list(SoPExecuteCycleMatcher(service_pattern).match(event_list))
+
+
+@pytest.mark.parametrize('is_super', [False, True])
+def test_matcher_long_log(is_super: bool):
+    rand = random.Random(0)
+    if is_super:
+        service_list = [SoPServiceElement(name='s0', is_super=True, subservice_list=[SoPServiceElement(name=f'f{i}') for i in range(4)])]
+    else:
+        service_list = [SoPServiceElement(name=f'f{i}') for i in range(5)]
+    service_pattern = get_service_pattern(service_list)
+
+    event_list = []
+    while len(event_list) < 20000:
+        for service in service_pattern:
+            event_type = SoPEventType.SUPER_FUNCTION_EXECUTE if service.is_super else (
+                SoPEventType.SUB_FUNCTION_EXECUTE if is_super else SoPEventType.FUNCTION_EXECUTE)
+            error = SoPErrorType.FAIL if rand.random() < 0.01 else SoPErrorType.NO_ERROR
+            event_list.append(SoPEvent(event_type=event_type, service_element=service, timestamp=len(event_list), duration=1, error=error))
+
+    actual = SoPExecuteCycleMatcher(service_pattern).match(event_list)
+    assert actual
+    assert cycle_id_list(actual) == cycle_id_list(old_find_execute_cycle(event_list, service_pattern))
@@ -0,0 +1,36 @@
+from simulation_framework.utils import *
+
+
+def test_latency_stat_small():
+    # reservoir에 모든 값이 들어가는 경우 latency_summary와 같다.
+    rand = random.Random(0)
+    value_list = [rand.expovariate(1) for _ in range(1000)]
+    latency_stat = SoPLatencyStat()
+    for value in value_list:
+        latency_stat.add(value)
+
+    expected = latency_summary(value_list)
+    actual = latency_stat.summary()
+    assert actual['count'] == expected['count']
+    assert actual['max'] == expected['max']
+    assert actual['p99'] == expected['p99']
+    assert abs(actual['avg'] - expected['avg']) < 1e-9
+
+
+def test_latency_stat_bounded():
+    rand = random.Random(1)
+    latency_stat = SoPLatencyStat(reservoir_size=1000)
+    value_list = [rand.uniform(0, 1) for _ in range(100000)]
+    for value in value_list:
+        latency_stat.add(value)
+
+    summary = latency_stat.summary()
+    assert len(latency_stat.reservoir) == 1000
+    assert summary['count'] == len(value_list)
+    assert summary['max'] == max(value_list)
+    assert abs(summary['avg'] - sum(value_list) / len(value_list)) < 1e-9
+    assert abs(summary['p99'] - 0.99) < 0.02
+
+
+def test_latency_stat_empty():
+    assert SoPLatencyStat().summary() == dict(avg=0, p99=0, max=0, count=0)
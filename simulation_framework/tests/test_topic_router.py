@@ -0,0 +1,69 @@
+from simulation_framework.core.event_handler import *
+
+import pytest
+
+
+def make_event_handler() -> Tuple[SoPEventHandler, List[Tuple[str, str]]]:
+    # handler를 호출 기록만 남기는 함수로 바꾼 뒤 router를 다시 만든다.
+    event_handler = SoPEventHandler(simulation_env=SoPMiddlewareElement(name='root'))
+    call_list = []
+
+    def recorder(handler_name: str):
+        def handler(msg: mqtt.MQTTMessage, topic_list: List[str], payload: dict, timestamp: float):
+            call_list.append((handler_name, '/'.join(topic_list)))
+        return handler
+
+    for _, handler_name in SoPEventHandler.TOPIC_HANDLER_TABLE:
+        setattr(event_handler, handler_name, recorder(handler_name))
+    event_handler.topic_router = event_handler.init_topic_router()
+    return event_handler, call_list
+
+
+def old_dispatch(topic: str) -> str:
+    # 기존 if/elif chain과 같이 prefix가 topic에 포함된 첫번째 protocol의 handler를 선택한다.
+    for protocol, handler_name in SoPEventHandler.TOPIC_HANDLER_TABLE:
+        prefix = protocol if isinstance(protocol, str) else protocol.get_prefix()
+        if prefix in topic:
+            return handler_name
+    return None
+
+
+def real_topic_list() -> List[str]:
+    topic_list = []
+    for protocol, _ in SoPEventHandler.TOPIC_HANDLER_TABLE:
+        prefix = protocol if isinstance(protocol, str) else protocol.get_prefix()
+        topic_list.append(prefix)
+        topic_list.append(f'{prefix}/function_1/thing_1/middleware_1/requester_1')
+    return topic_list
+
+
+def test_on_recv_message_dispatch():
+    event_handler, call_list = make_event_handler()
+
+    for topic in real_topic_list():
+        event_handler.on_recv_message(encode_MQTT_message(topic, '{}'), recv_time=time.perf_counter())
+        handler_name, recv_topic = call_list[-1]
+        assert handler_name == old_dispatch(topic)
+        assert recv_topic == topic
+
+    assert len(call_list) == len(real_topic_list())
+    assert event_handler.listener_lag_stat.count == len(call_list)
+
+
+def test_on_recv_message_unknown_topic():
+    event_handler, call_list = make_event_handler()
+
+    with pytest.raises(Exception):
+        event_handler.on_recv_message(encode_MQTT_message('UNKNOWN/TOPIC', '{}'))
+    assert not call_list
+
+
+def test_route_longest_prefix():
+    router = SoPTopicRouter()
+    assert router.register('A/B', 'ab')
+    assert router.register('A', 'a')
+    assert not router.register('A/B', 'other')
+
+    assert router.route(['A', 'B', 'C']) == 'ab'
+    assert router.route(['A', 'C']) == 'a'
+    assert router.route(['B']) is None
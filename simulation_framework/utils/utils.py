@@ -270,9 +270,6 @@ def find_element_recursive(middleware: object, element: object, key: Callable =
                 child_middleware, element)
             if result:
                 return result[0], result[1]
-            else:
-                inner(
-                    child_middleware, element)
 
     result = inner(middleware, element)
     if result:
@@ -301,8 +298,6 @@ def find_element_by_name_recursive(middleware: object, element_name: str):
             result = inner(child_middleware, element_name)
             if result:
                 return result[0], result[1]
-            else:
-                inner(child_middleware, element_name)
 
     result = inner(middleware, element_name)
     if result:
@@ -311,6 +306,76 @@ def find_element_by_name_recursive(middleware: object, element_name: str):
         return None, None
 
 
+class SoPElementTreeIndex:
+    '''
+    middleware tree를 한번만 순회하여 name -> element, element -> parent, depth, subtree 범위를 미리 계산한다.
+    find_element_recursive, find_element_by_name_recursive와 같은 결과를 O(1)로 반환한다.
+    '''
+
+    def __init__(self, root: object) -> None:
+        self.root = root
+        self.build()
+
+    def build(self):
+        # key: id(element)
+        self.element_table: Dict[int, object] = {}
+        self.parent_table: Dict[int, object] = {}
+        self.depth_table: Dict[int, int] = {}
+        self.subtree_range_table: Dict[int, Tuple[int, int]] = {}
+        self.order_table: Dict[int, int] = {}
+
+        # key: name
+        self.name_table: Dict[str, Tuple[object, object]] = {}
+
+        self.add(self.root, None, 0)
+        self.name_table[self.root.name] = (self.root, None)
+        self.build_recursive(self.root, 0)
+
+    def add(self, element: object, parent: object, depth: int):
+        self.element_table[id(element)] = element
+        self.parent_table[id(element)] = parent
+        self.depth_table[id(element)] = depth
+
+    def build_recursive(self, middleware: object, depth: int):
+        # subtree 범위는 DFS 방문 순서의 [start, end) 구간으로 표현한다.
+        start = len(self.order_table)
+        self.order_table[id(middleware)] = start
+
+        # find_element_by_name_recursive의 탐색 순서와 같게 직속 element를 먼저 등록한 후 child middleware로 내려간다.
+        for element in middleware.thing_list + middleware.scenario_list + middleware.child_middleware_list:
+            self.add(element, middleware, depth + 1)
+            self.name_table.setdefault(element.name, (element, middleware))
+        for element in middleware.thing_list + middleware.scenario_list:
+            self.order_table[id(element)] = len(self.order_table)
+        for child_middleware in middleware.child_middleware_list:
+            self.build_recursive(child_middleware, depth + 1)
+
+        self.subtree_range_table[id(middleware)] = (start, len(self.order_table))
+
+    def __contains__(self, element: object) -> bool:
+        return id(element) in self.element_table
+
+    def find(self, element: object) -> Tuple[object, object]:
+        if element not in self:
+            return None, None
+        return element, self.parent_table[id(element)]
+
+    def find_by_name(self, element_name: str) -> Tuple[object, object]:
+        return self.name_table.get(element_name, (None, None))
+
+    def parent(self, element: object) -> object:
+        return self.parent_table.get(id(element), None)
+
+    def depth(self, element: object) -> int:
+        return self.depth_table.get(id(element), None)
+
+    def is_in_subtree(self, element: object, middleware: object) -> bool:
+        if element not in self or id(middleware) not in self.subtree_range_table:
+            return False
+        start, end = self.subtree_range_table[id(middleware)]
+        return start <= self.order_table[id(element)] < end
+
+
 def append_indent(code: str, indent: int = 1, remove_tab: bool = True):
     code_lines = code.split('\n')
     tabs = '    ' * indent
@@ -350,6 +415,55 @@ def avg(src: List[Union[int, float]]) -> float:
     return sum(non_zero_value_list) / len(non_zero_value_list) if len(non_zero_value_list) > 0 else 0
 
 
+def latency_summary(src: List[Union[int, float]]) -> dict:
+    value_list = sorted(src)
+    if not value_list:
+        return dict(avg=0, p99=0, max=0, count=0)
+
+    return dict(avg=sum(value_list) / len(value_list),
+                p99=value_list[min(int(len(value_list) * 0.99), len(value_list) - 1)],
+                max=value_list[-1],
+                count=len(value_list))
+
+
+class SoPLatencyStat:
+    '''
+    latency_summary와 같은 값을 값 전체를 보관하지 않고 누적한다.
+    count, 합, max는 정확하며, p99는 최대 reservoir_size개를 균등하게 sampling한 reservoir에서 구한다.
+    '''
+
+    def __init__(self, reservoir_size: int = 4096) -> None:
+        self.reservoir_size = reservoir_size
+        self.lock = Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.reservoir: List[float] = []
+        self.random = random.Random(0)
+
+    def add(self, value: float):
+        with self.lock:
+            self.count += 1
+            self.total += value
+            self.max = value if self.count == 1 else max(self.max, value)
+            if len(self.reservoir) < self.reservoir_size:
+                self.reservoir.append(value)
+            else:
+                i = self.random.randrange(self.count)
+                if i < self.reservoir_size:
+                    self.reservoir[i] = value
+
+    def summary(self) -> dict:
+        with self.lock:
+            if not self.count:
+                return dict(avg=0, p99=0, max=0, count=0)
+            reservoir = sorted(self.reservoir)
+            return dict(avg=self.total / self.count,
+                        p99=reservoir[min(int(len(reservoir) * 0.99), len(reservoir) - 1)],
+                        max=self.max,
+                        count=self.count)
+
+
 def pool_map(func: Callable, args: List[Tuple], proc: int = 10) -> List[Any]:
     thread_list: List[SoPThread] = []
     for arg_chuck in [args[i:i+proc] for i in range(0, len(args), proc)]: